@@ -0,0 +1,270 @@
+"""Daily sales rollups for the admin analytics endpoint.
+
+``db.order_rollups`` holds one document per UTC day, dimension and key:
+the day's totals ("total"), and its figures per product, phone brand and
+phone model. Each carries orders, units, revenue and cancelled counts;
+like the stats counters, revenue leaves out cancelled orders.
+
+Rollups are maintained in one of two ways:
+
+* inline: order writes ``$inc`` the affected documents (record_order,
+  record_status_change), so they are current at once. The order write has
+  already happened by then, so a failed update is logged, not raised, and
+  left for a rebuild;
+* batch: run_batch rebuilds the day of every order updated since the stored
+  watermark (an order never changes day), then moves the watermark forward. Rebuilding a day
+  recomputes it from the orders of that day, so running it again, or in
+  several workers, is harmless.
+
+Range queries read at most a few documents per day and key, then group them
+into days, weeks or months in Python.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("total", "product", "brand", "model")
+GRANULARITIES = ("day", "week", "month")
+METRICS = ("orders", "units", "revenue", "cancelled")
+
+# Only the fields rollups are computed from
+ORDER_PROJECTION = {
+    "_id": 0, "status": 1, "total": 1, "created_at": 1,
+    "items.product_id": 1, "items.product_name": 1, "items.quantity": 1, "items.price": 1,
+    "items.phone_brand": 1, "items.phone_model": 1,
+}
+
+RowKey = Tuple[str, str]
+
+
+def day_start(moment: Union[datetime, str]) -> datetime:
+    """UTC midnight of the day a timestamp falls on; legacy ISO strings and naive times are UTC"""
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    moment = moment.astimezone(timezone.utc)
+    return datetime.combine(moment.date(), time(), tzinfo=timezone.utc)
+
+
+def period_start(day: date, granularity: str) -> date:
+    """First day of the day/week (Monday)/month bucket containing day"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def order_rows(order: Dict, status: Optional[str] = None) -> Dict[RowKey, Dict]:
+    """Rollup figures an order contributes, per (dimension, key), as if it had status"""
+    cancelled = (status or order["status"]) == "cancelado"
+    items = order.get("items") or []
+    rows = {("total", ""): {
+        "label": "Total",
+        "orders": 1,
+        "units": sum(item["quantity"] for item in items),
+        "revenue": 0.0 if cancelled else order["total"],
+        "cancelled": int(cancelled),
+    }}
+    for item in items:
+        keys = [(("product", item["product_id"]), item["product_name"])]
+        brand, model = item.get("phone_brand"), item.get("phone_model")
+        if brand:
+            keys.append((("brand", brand), brand))
+            if model:
+                keys.append((("model", f"{brand}|{model}"), f"{brand} {model}"))
+        for key, label in keys:
+            row = rows.setdefault(key, {"label": label, "orders": 1, "units": 0, "revenue": 0.0, "cancelled": int(cancelled)})
+            row["units"] += item["quantity"]
+            if not cancelled:
+                row["revenue"] += item["price"] * item["quantity"]
+    return rows
+
+
+def rollup_id(day: datetime, dimension: str, key: str) -> str:
+    return f"{day.strftime('%Y-%m-%d')}|{dimension}|{key}"
+
+
+class SalesRollups:
+    """Maintains and queries the daily rollup documents"""
+
+    def __init__(self, orders, rollups, state, settle: timedelta = timedelta(seconds=60), reader=None):
+        self.orders = orders
+        self.rollups = rollups
+        self.state = state
+        # Where query() reads rollups from, e.g. the same collection with a
+        # secondary read preference; writes always go to rollups
+        self.reader = reader if reader is not None else rollups
+        # Batch runs stop this far behind now, so writes stamped with an
+        # earlier updated_at but committed a little later are not skipped
+        self.settle = settle
+
+    async def apply(self, day: datetime, deltas: Dict[RowKey, Dict]) -> None:
+        await self.write(rollup_updates(day, deltas))
+
+    async def write(self, operations: List[UpdateOne]) -> None:
+        if operations:
+            await self.rollups.bulk_write(operations, ordered=False)
+
+    async def record_order(self, order: Dict) -> None:
+        """Add a newly created order to its day's rollups"""
+        try:
+            await self.apply(day_start(order["created_at"]), order_rows(order))
+        except Exception as e:
+            # The order is already stored; a rebuild of its day repairs the rollups
+            logger.exception(f"Order rollups not updated for new order {order.get('order_id')}: {e}")
+
+    async def record_status_change(self, order: Dict, new_status: str) -> None:
+        """Adjust rollups for a status change; order holds its previous status"""
+        await self.record_status_changes([order], new_status)
+
+    async def record_status_changes(self, orders: Iterable[Dict], new_status: str) -> None:
+        """record_status_change for many orders, merged per day and key into one write.
+
+        The status change is already stored when this runs, so failures are
+        logged rather than raised; rebuilding the affected days repairs them.
+        """
+        orders = list(orders)
+        try:
+            days: Dict[datetime, Dict[RowKey, Dict]] = {}
+            for order in orders:
+                deltas = days.setdefault(day_start(order["created_at"]), {})
+                before = order_rows(order)
+                for key, row in order_rows(order, new_status).items():
+                    delta = deltas.setdefault(key, {"label": row["label"], **dict.fromkeys(METRICS, 0)})
+                    for metric in METRICS:
+                        delta[metric] += row[metric] - before[key][metric]
+            await self.write([operation for day, deltas in days.items() for operation in rollup_updates(day, deltas)])
+        except Exception as e:
+            order_ids = [order.get("order_id") for order in orders]
+            logger.exception(f"Order rollups not updated for status {new_status} of {order_ids}: {e}")
+
+    async def rebuild_days(self, days: Iterable[datetime]) -> int:
+        """Recompute the rollups of the given UTC days from their orders"""
+        rebuilt = 0
+        for day in sorted(set(days)):
+            totals: Dict[RowKey, Dict] = {}
+            next_day = day + timedelta(days=1)
+            # Orders not yet converted by scripts/migrate_dates.py hold ISO strings
+            query = {"$or": [
+                {"created_at": {"$gte": day, "$lt": next_day}},
+                {"created_at": {"$gte": day.date().isoformat(), "$lt": next_day.date().isoformat()}}
+            ]}
+            async for order in self.orders.find(query, ORDER_PROJECTION).batch_size(500):
+                for key, row in order_rows(order).items():
+                    total = totals.setdefault(key, dict.fromkeys(METRICS, 0))
+                    total["label"] = row["label"]
+                    for metric in METRICS:
+                        total[metric] += row[metric]
+
+            operations = []
+            ids = []
+            for (dimension, key), row in totals.items():
+                ids.append(rollup_id(day, dimension, key))
+                operations.append(ReplaceOne(
+                    {"_id": ids[-1]},
+                    {"day": day, "dimension": dimension, "key": key, **row},
+                    upsert=True
+                ))
+            # Keys with no orders left that day (e.g. an order's items were edited)
+            operations.append(DeleteMany({"day": day, "_id": {"$nin": ids}}))
+            await self.rollups.bulk_write(operations, ordered=True)
+            rebuilt += 1
+        return rebuilt
+
+    async def run_batch(self, full: bool = False) -> Dict:
+        """Rebuild the days touched since the watermark; full rebuilds every day"""
+        state = await self.state.find_one({"_id": "order_rollups"}) or {}
+        watermark = None if full else state.get("watermark")
+        until = datetime.now(timezone.utc) - self.settle
+
+        query = {}
+        if not full:
+            query["updated_at"] = {"$lte": until}
+            if watermark is not None:
+                query["updated_at"]["$gt"] = watermark
+        days = set()
+        async for order in self.orders.find(query, {"_id": 0, "created_at": 1}).batch_size(1000):
+            days.add(day_start(order["created_at"]))
+        if full:
+            await self.rollups.delete_many({"day": {"$nin": list(days)}})
+
+        rebuilt = await self.rebuild_days(days)
+        await self.state.update_one(
+            {"_id": "order_rollups"},
+            {"$set": {"watermark": until, "last_run_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        logger.info(f"Order rollups: {rebuilt} days rebuilt up to {until.isoformat()}")
+        return {"days": rebuilt, "watermark": until}
+
+    async def run(self, interval: float) -> None:
+        """Run batches forever, interval seconds apart"""
+        while True:
+            try:
+                await self.run_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Order rollup batch failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def query(self, start: date, end: date, granularity: str, dimension: str, limit: Optional[int] = None) -> Dict:
+        """Figures per period and key between start and end (inclusive)"""
+        first = datetime.combine(start, time(), tzinfo=timezone.utc)
+        after = datetime.combine(end, time(), tzinfo=timezone.utc) + timedelta(days=1)
+        cursor = self.reader.find(
+            {"dimension": dimension, "day": {"$gte": first, "$lt": after}},
+            {"_id": 0, "day": 1, "key": 1, "label": 1, **dict.fromkeys(METRICS, 1)}
+        )
+
+        series: Dict[Tuple[date, str], Dict] = {}
+        totals: Dict[str, Dict] = {}
+        async for rollup in cursor:
+            period = period_start(rollup["day"].astimezone(timezone.utc).date(), granularity)
+            for bucket in (
+                series.setdefault((period, rollup["key"]), {"period": period, **empty_row(rollup)}),
+                totals.setdefault(rollup["key"], empty_row(rollup)),
+            ):
+                for metric in METRICS:
+                    bucket[metric] += rollup.get(metric, 0)
+
+        ranked = sorted(totals.values(), key=lambda row: (-row["revenue"], -row["units"], row["key"]))
+        if limit:
+            ranked = ranked[:limit]
+        kept = {row["key"] for row in ranked}
+        points = sorted(
+            (point for (_, key), point in series.items() if key in kept),
+            key=lambda point: (point["period"], -point["revenue"], point["key"])
+        )
+        return {"series": points, "totals": ranked}
+
+
+def rollup_updates(day: datetime, deltas: Dict[RowKey, Dict]) -> List[UpdateOne]:
+    """Upserts adding deltas to the day's rollup documents"""
+    operations = []
+    for (dimension, key), row in deltas.items():
+        if not any(row[metric] for metric in METRICS):
+            continue
+        # Zero increments too, so every document carries every metric
+        increments = {metric: row[metric] for metric in METRICS}
+        operations.append(UpdateOne(
+            {"_id": rollup_id(day, dimension, key)},
+            {
+                "$inc": increments,
+                "$set": {"label": row["label"]},
+                "$setOnInsert": {"day": day, "dimension": dimension, "key": key},
+            },
+            upsert=True
+        ))
+    return operations
+
+
+def empty_row(rollup: Dict) -> Dict:
+    return {"key": rollup["key"], "label": rollup.get("label") or rollup["key"], **dict.fromkeys(METRICS, 0)}
@@ -0,0 +1,6 @@
+"""Local load-testing harness for the API.
+
+``harness`` drives concurrent virtual users against the FastAPI app and
+collects per-endpoint latency, throughput and memory; ``scenarios`` seeds a
+database and defines the request mixes. Run it with scripts/benchmark.py.
+"""
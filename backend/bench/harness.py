@@ -0,0 +1,268 @@
+"""Virtual users, per-endpoint statistics and baselines."""
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+
+
+def peak_rss() -> int:
+    """Highest resident set size of this process so far, in bytes"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return maxrss if os.uname().sysname == "Darwin" else maxrss * 1024
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values) + 0.5 - 1e-9))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class EndpointStats:
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+    bytes: int = 0
+
+    def record(self, elapsed: float, status: int, size: int, ok: bool) -> None:
+        self.latencies.append(elapsed)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes += size
+        if not ok:
+            self.errors += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            "count": count,
+            "errors": self.errors,
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "avg_bytes": round(self.bytes / count) if count else 0,
+        }
+
+
+class RequestFailed(Exception):
+    """A scenario step got an unexpected status; the scenario stops there"""
+
+
+class VirtualUser:
+    """One simulated client: its own headers, ETag cache and random stream"""
+
+    def __init__(self, index: int, client: httpx.AsyncClient, stats: Dict[str, EndpointStats], seed: int = 0):
+        self.index = index
+        self.client = client
+        self.stats = stats
+        self.rng = random.Random(seed * 100003 + index)
+        self.headers: Dict[str, str] = {}
+        self.etags: Dict[str, Tuple[str, httpx.Response]] = {}
+        self.state: Dict[str, Any] = {}
+
+    async def request(
+        self,
+        label: str,
+        method: str,
+        url: str,
+        expect: Tuple[int, ...] = (200,),
+        conditional: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send one request and record it under label (the route template)"""
+        headers = {**self.headers, **kwargs.pop("headers", {})}
+        cache_key = f"{url}?{kwargs.get('params')}"
+        cached = self.etags.get(cache_key) if conditional else None
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.stats.setdefault(label, EndpointStats()).record(time.perf_counter() - started, 0, 0, ok=False)
+            raise RequestFailed(f"{label}: connection error")
+        elapsed = time.perf_counter() - started
+
+        ok = response.status_code in expect or (cached is not None and response.status_code == 304)
+        self.stats.setdefault(label, EndpointStats()).record(elapsed, response.status_code, len(response.content), ok)
+        if not ok:
+            raise RequestFailed(f"{label}: HTTP {response.status_code}")
+
+        if response.status_code == 304:
+            return cached[1]
+        if conditional and "etag" in response.headers:
+            self.etags[cache_key] = (response.headers["etag"], response)
+        return response
+
+
+Scenario = Callable[[VirtualUser], Awaitable[None]]
+
+
+class LoadRunner:
+    """Runs `users` virtual users for `duration` seconds, each looping over a weighted scenario mix"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        mix: Dict[Scenario, int],
+        users: int = 20,
+        duration: float = 30.0,
+        seed: int = 0,
+        setup: Optional[Callable[[VirtualUser], Awaitable[None]]] = None,
+    ):
+        self.client = client
+        self.scenarios = list(mix)
+        self.weights = [mix[scenario] for scenario in self.scenarios]
+        self.users = users
+        self.duration = duration
+        self.seed = seed
+        self.setup = setup
+        self.stats: Dict[str, EndpointStats] = {}
+        self.scenario_failures: Dict[str, int] = {}
+        self.elapsed = 0.0
+
+    async def _user(self, index: int, deadline: float) -> None:
+        user = VirtualUser(index, self.client, self.stats, self.seed)
+        if self.setup is not None:
+            await self.setup(user)
+        while time.perf_counter() < deadline:
+            scenario = user.rng.choices(self.scenarios, self.weights)[0]
+            try:
+                await scenario(user)
+            except RequestFailed:
+                name = scenario.__name__
+                self.scenario_failures[name] = self.scenario_failures.get(name, 0) + 1
+
+    async def run(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        deadline = started + self.duration
+        await asyncio.gather(*(self._user(index, deadline) for index in range(self.users)))
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        total = EndpointStats()
+        for stats in self.stats.values():
+            total.latencies.extend(stats.latencies)
+            total.errors += stats.errors
+            total.bytes += stats.bytes
+            for status, count in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + count
+        return {
+            "elapsed_s": round(self.elapsed, 2),
+            "endpoints": {label: self.stats[label].summary(self.elapsed) for label in sorted(self.stats)},
+            "total": total.summary(self.elapsed),
+            "scenario_failures": dict(self.scenario_failures),
+            # Process-wide (app and clients share this process), so not per endpoint
+            "peak_rss_mb": round(peak_rss() / 2 ** 20, 1),
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    header = f"{'endpoint':<44}{'count':>7}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}"
+    lines = [header, "-" * len(header)]
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for label, row in rows:
+        lines.append(
+            f"{label[:43]:<44}{row['count']:>7}{row['errors']:>5}{row['p50_ms']:>9.2f}"
+            f"{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['throughput_rps']:>9.1f}"
+        )
+    if "peak_rss_mb" in report:
+        lines.append(f"peak RSS of the benchmark process: {report['peak_rss_mb']} MB")
+    if report.get("scenario_failures"):
+        lines.append(f"scenario failures: {report['scenario_failures']}")
+    return "\n".join(lines)
+
+
+# ==================== BASELINES ====================
+
+def git_revision() -> Optional[str]:
+    """Short hash of HEAD, with a -dirty suffix for uncommitted changes"""
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{revision}-dirty" if dirty else revision
+
+
+def baseline_path(name: str) -> Path:
+    path = Path(name)
+    if path.suffix == ".json" or path.parent != Path("."):
+        return path
+    return BASELINES_DIR / f"{name}.json"
+
+
+def save_baseline(report: Dict[str, Any], config: Dict[str, Any], name: Optional[str] = None) -> Path:
+    revision = git_revision()
+    path = baseline_path(name or revision or "baseline")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "revision": revision,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": config,
+        **report,
+    }, indent=2))
+    return path
+
+
+def load_baseline(name: str) -> Dict[str, Any]:
+    return json.loads(baseline_path(name).read_text())
+
+
+def compare_to_baseline(
+    report: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.25,
+    min_delta_ms: float = 1.0,
+) -> Tuple[List[str], List[str]]:
+    """Lines describing every endpoint's change, and the subset that regressed.
+
+    An endpoint regresses when its p95 grows by more than `tolerance` (and by at
+    least min_delta_ms, to ignore noise on sub-millisecond routes), its
+    throughput drops by more than `tolerance`, or it returns errors the
+    baseline did not have.
+    """
+    lines: List[str] = []
+    regressions: List[str] = []
+    for label, row in report["endpoints"].items():
+        base = baseline["endpoints"].get(label)
+        if base is None:
+            lines.append(f"{label}: new endpoint")
+            continue
+        problems = []
+        p95_delta = row["p95_ms"] - base["p95_ms"]
+        if p95_delta > min_delta_ms and row["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"p95 {base['p95_ms']} -> {row['p95_ms']} ms")
+        if base["throughput_rps"] and row["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append(f"throughput {base['throughput_rps']} -> {row['throughput_rps']} req/s")
+        if row["errors"] and not base["errors"]:
+            problems.append(f"{row['errors']} errors")
+        change = f"p95 {base['p95_ms']} -> {row['p95_ms']} ms, {base['throughput_rps']} -> {row['throughput_rps']} req/s"
+        if problems:
+            regressions.append(f"{label}: {', '.join(problems)}")
+            lines.append(f"REGRESSION {label}: {change}")
+        else:
+            lines.append(f"ok         {label}: {change}")
+    return lines, regressions
@@ -0,0 +1,246 @@
+"""Seed data and request mixes for the load tests.
+
+Every scenario is one user journey; labels are route templates so latencies
+of the same endpoint are grouped however its URL is filled in.
+"""
+import io
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import httpx
+from PIL import Image
+
+from bench.harness import Scenario, VirtualUser
+
+# Statuses an order goes through in order; cancellation can happen at any point
+STATUS_FLOW = ["pendiente", "confirmado", "en_proceso", "enviado", "entregado"]
+
+CUSTOMER = {
+    "customer_phone": "5550000000",
+    "shipping_address": "Av. Principal 123, San Antonio",
+    "payment_method": "transferencia",
+}
+
+
+@dataclass
+class Fixture:
+    """What the scenarios need to know about the seeded database"""
+    brand_ids: List[str] = field(default_factory=list)
+    product_ids: List[str] = field(default_factory=list)
+    images: List[bytes] = field(default_factory=list)
+    admin_token: str = ""
+
+
+def make_image(rng: random.Random, side: int) -> bytes:
+    """PNG with a noisy gradient, so it compresses like a photo rather than a flat fill"""
+    image = Image.new("RGB", (side, side))
+    image.putdata([
+        ((x * 255 // side + rng.randrange(48)) % 256, (y * 255 // side + rng.randrange(48)) % 256, rng.randrange(256))
+        for y in range(side) for x in range(side)
+    ])
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def sample_order(rng: random.Random, n: int, products: List[Dict], created_at: datetime) -> Dict:
+    """A stored order document as the API writes it, with a realistic status_history"""
+    items = []
+    for product in rng.sample(products, k=min(len(products), rng.randint(1, 3))):
+        image_id = f"img_{rng.getrandbits(48):012x}"
+        items.append({
+            "product_id": product["product_id"],
+            "product_name": product["name"],
+            "quantity": rng.randint(1, 3),
+            "price": product["price"],
+            "phone_brand": "Samsung",
+            "phone_model": "Galaxy S24",
+            "custom_image_id": image_id,
+            "preview_image_id": image_id,
+            "custom_image_url": f"/api/upload/image/{image_id}",
+            "preview_image_url": f"/api/upload/image/{image_id}",
+        })
+    subtotal = sum(item["price"] * item["quantity"] for item in items)
+
+    steps = STATUS_FLOW[:rng.randint(1, len(STATUS_FLOW))]
+    if rng.random() < 0.1:
+        steps.append("cancelado")
+    history = [
+        {
+            "status": status,
+            "timestamp": created_at + timedelta(hours=6 * step),
+            "notes": "Pedido creado" if step == 0 else f"Estado actualizado a {status}",
+        }
+        for step, status in enumerate(steps)
+    ]
+    updated_at = created_at + timedelta(hours=6 * (len(steps) - 1))
+
+    return {
+        "order_id": f"ORD-{created_at.strftime('%Y%m%d')}-{n:06X}",
+        "user_id": None,
+        "items": items,
+        "customer_name": f"Cliente {n}",
+        "customer_email": f"cliente{n}@bench.example.com",
+        "customer_phone": CUSTOMER["customer_phone"],
+        "customer_whatsapp": CUSTOMER["customer_phone"] if rng.random() < 0.5 else None,
+        "shipping_address": CUSTOMER["shipping_address"],
+        "payment_method": rng.choice(["transferencia", "recoger_tienda"]),
+        "notes": None,
+        "subtotal": subtotal,
+        "total": subtotal,
+        "status": steps[-1],
+        "status_history": history,
+        "design_approved": len(steps) > 2,
+        "design_proposal_sent": len(steps) > 1,
+        "stock_reserved": steps[-1] != "cancelado",
+        "admin_notes": None,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
+
+def fake_auth_transport() -> httpx.MockTransport:
+    """Stands in for the auth provider: every session id is a valid login"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        # "<customer>-<nonce>": returning customers log in again with fresh tokens
+        session_id = request.headers["X-Session-ID"]
+        customer = session_id.rsplit("-", 1)[0]
+        return httpx.Response(200, json={
+            "email": f"{customer}@bench.example.com",
+            "name": f"Cliente {customer}",
+            "picture": None,
+            "session_token": f"token-{session_id}",
+        })
+    return httpx.MockTransport(handler)
+
+
+async def seed_database(server, orders: int = 2000, image_side: int = 320, seed: int = 0) -> Fixture:
+    """Catalog from /api/seed plus an admin, unlimited stock and `orders` historical orders"""
+    rng = random.Random(seed)
+    fixture = Fixture()
+
+    await server.seed_data()
+    await server.db.products.update_many({}, {"$set": {"stock": 10 ** 9}})
+    server.catalog_cache.clear()
+    fixture.brand_ids = [brand["brand_id"] for brand in await server.db.phone_brands.find({}, {"brand_id": 1}).to_list(100)]
+    products = await server.db.products.find({"is_active": True}, {"_id": 0}).to_list(100)
+    fixture.product_ids = [product["product_id"] for product in products]
+
+    fixture.admin_token = f"admin-{uuid.uuid4().hex}"
+    await server.db.users.insert_one({
+        "user_id": "user_bench_admin",
+        "email": "admin@bench.example.com",
+        "name": "Admin",
+        "role": "admin",
+        "created_at": datetime.now(timezone.utc),
+    })
+    await server.db.user_sessions.insert_one({
+        "user_id": "user_bench_admin",
+        "session_token": fixture.admin_token,
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=1),
+    })
+
+    now = datetime.now(timezone.utc)
+    history = [
+        sample_order(rng, n, products, now - timedelta(minutes=rng.randrange(60 * 24 * 90)))
+        for n in range(orders)
+    ]
+    for order in history:
+        order["search_terms"] = server.order_search_terms(order)
+    if history:
+        await server.db.orders.insert_many(history)
+    if server.STATS_MODE == "counters":
+        await server.rebuild_order_counters()
+
+    fixture.images = [make_image(rng, image_side) for _ in range(4)]
+    return fixture
+
+
+# ==================== SCENARIOS ====================
+
+def fixture_of(user: VirtualUser) -> Fixture:
+    return user.state["fixture"]
+
+
+async def browse_catalog(user: VirtualUser) -> None:
+    fixture = fixture_of(user)
+    await user.request("GET /api/phone-brands", "GET", "/api/phone-brands", conditional=True)
+    await user.request(
+        "GET /api/phone-models", "GET", "/api/phone-models",
+        params={"brand_id": user.rng.choice(fixture.brand_ids)}, conditional=True
+    )
+    await user.request("GET /api/products", "GET", "/api/products", conditional=True)
+    await user.request(
+        "GET /api/products/{product_id}", "GET", f"/api/products/{user.rng.choice(fixture.product_ids)}"
+    )
+
+
+async def login(user: VirtualUser) -> None:
+    session_id = f"vu{user.index}_{user.rng.randrange(50)}-{uuid.uuid4().hex}"
+    await user.request("POST /api/auth/session", "POST", "/api/auth/session", json={"session_id": session_id})
+    user.headers["Authorization"] = f"Bearer token-{session_id}"
+    await user.request("GET /api/auth/me", "GET", "/api/auth/me")
+    await user.request("GET /api/orders (customer)", "GET", "/api/orders", params={"limit": 20})
+
+
+async def checkout(user: VirtualUser) -> None:
+    fixture = fixture_of(user)
+    upload = await user.request(
+        "POST /api/upload/image", "POST", "/api/upload/image",
+        files={"file": ("diseño.png", user.rng.choice(fixture.images), "image/png")},
+        headers={"Idempotency-Key": uuid.uuid4().hex}
+    )
+    image = upload.json()
+    await user.request("GET /api/upload/image/{image_id}?size=thumb", "GET", image["url"], params={"size": "thumb"})
+
+    order = await user.request(
+        "POST /api/orders", "POST", "/api/orders",
+        json={
+            "items": [{
+                "product_id": user.rng.choice(fixture.product_ids),
+                "product_name": "Funda",
+                "quantity": user.rng.randint(1, 2),
+                "price": 0,
+                "custom_image_id": image["image_id"],
+                "preview_image_id": image["image_id"],
+            }],
+            "customer_name": f"Cliente {user.index}",
+            "customer_email": f"vu{user.index}@bench.example.com",
+            **CUSTOMER,
+        },
+        headers={"Idempotency-Key": uuid.uuid4().hex}
+    )
+    await user.request("GET /api/orders/track/{order_id}", "GET", f"/api/orders/track/{order.json()['order_id']}")
+
+
+async def admin_dashboard(user: VirtualUser) -> None:
+    headers = {"Authorization": f"Bearer {fixture_of(user).admin_token}"}
+    page = await user.request(
+        "GET /api/orders?view=summary", "GET", "/api/orders",
+        params={"view": "summary", "limit": 50}, headers=headers
+    )
+    if page.headers.get("X-Next-Cursor"):
+        await user.request(
+            "GET /api/orders?view=summary&cursor", "GET", "/api/orders",
+            params={"view": "summary", "limit": 50, "cursor": page.headers["X-Next-Cursor"], "include_total": "false"},
+            headers=headers
+        )
+    await user.request("GET /api/admin/stats", "GET", "/api/admin/stats", headers=headers)
+    await user.request(
+        "GET /api/admin/orders/search", "GET", "/api/admin/orders/search",
+        params={"q": f"cliente {user.rng.randrange(10, 99)}", "limit": 20}, headers=headers
+    )
+    await user.request("GET /api/admin/notifications", "GET", "/api/admin/notifications", params={"limit": 50}, headers=headers)
+
+
+# Scenario -> relative weight
+MIXES: Dict[str, Dict[Scenario, int]] = {
+    "default": {browse_catalog: 60, login: 10, checkout: 15, admin_dashboard: 15},
+    "catalog": {browse_catalog: 1},
+    "login": {login: 1},
+    "checkout": {checkout: 1},
+    "admin": {admin_dashboard: 1},
+}
@@ -0,0 +1,145 @@
+"""CSV and NDJSON streams for the bulk import and export endpoints.
+
+Exports are written while the Mongo cursor is read: encode_rows turns an
+async iterator of documents into chunks of text of about CHUNK_ROWS rows each,
+so memory use does not grow with the number of documents. Imports go the
+other way: decode_rows splits a streamed request body into records as the
+bytes arrive and yields them one at a time, with their 1-based row number
+(the CSV header is not counted) for error reports.
+
+CSV cells are plain text: empty cells are left out of the decoded row (so
+model defaults apply), booleans are written as true/false and dates in ISO
+8601, which the pydantic models parse back. NDJSON keeps the JSON types.
+"""
+import codecs
+import csv
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+
+from responses import dump_json
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+# Documents encoded per chunk handed to the response
+CHUNK_ROWS = 200
+# Bound on one imported record, so a body without line breaks cannot fill memory
+MAX_RECORD_BYTES = 1024 * 1024
+
+
+class RecordTooLarge(Exception):
+    """An imported record is longer than MAX_RECORD_BYTES"""
+
+
+def csv_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return dump_json(value).decode()
+    return str(value)
+
+
+async def encode_rows(
+    documents: AsyncIterator[Dict], fmt: str, fields: Optional[Sequence[str]] = None
+) -> AsyncIterator[bytes]:
+    """Serialize documents as CSV (with a header of fields) or NDJSON, chunk by chunk"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(fields)
+        rows = 0
+        async for document in documents:
+            writer.writerow([csv_cell(document.get(field)) for field in fields])
+            rows += 1
+            if rows % CHUNK_ROWS == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+        return
+
+    chunk: List[bytes] = []
+    async for document in documents:
+        if fields is not None:
+            document = {field: document.get(field) for field in fields}
+        chunk.append(dump_json(document))
+        if len(chunk) == CHUNK_ROWS:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+
+async def records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[str]:
+    """Complete records of a streamed body: lines, or CSV rows whose quoted cells may span lines"""
+    # Incremental, so characters split between chunks decode whole; drops a BOM
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        start = 0
+        record_start = 0
+        while True:
+            end = pending.find("\n", start)
+            if end == -1:
+                break
+            start = end + 1
+            record = pending[record_start:start]
+            # A newline inside a quoted CSV cell leaves an odd number of quotes
+            if fmt == "csv" and record.count('"') % 2:
+                continue
+            record_start = start
+            if record.strip():
+                yield record
+        pending = pending[record_start:]
+        if len(pending) > MAX_RECORD_BYTES:
+            raise RecordTooLarge()
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending
+
+
+async def decode_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """(row number, dict) for each record of a CSV or NDJSON body.
+
+    Records that cannot be parsed yield a ValueError in place of the dict,
+    so the caller can report them and carry on.
+    """
+    header = None
+    number = 0
+    async for record in records(chunks, fmt):
+        if fmt == "csv":
+            try:
+                cells = next(csv.reader([record]))
+            except csv.Error as e:
+                cells = e
+            if header is None:
+                if isinstance(cells, csv.Error):
+                    raise ValueError(f"Encabezado CSV inválido: {cells}")
+                header = [name.strip() for name in cells]
+                continue
+            number += 1
+            if isinstance(cells, csv.Error):
+                yield number, ValueError(f"CSV inválido: {cells}")
+            elif len(cells) > len(header):
+                yield number, ValueError("La fila tiene más columnas que el encabezado")
+            else:
+                yield number, {name: cell for name, cell in zip(header, cells) if cell != ""}
+        else:
+            number += 1
+            try:
+                row = orjson.loads(record)
+            except orjson.JSONDecodeError as e:
+                yield number, ValueError(f"JSON inválido: {e}")
+                continue
+            if isinstance(row, dict):
+                yield number, row
+            else:
+                yield number, ValueError("Cada línea debe ser un objeto JSON")
@@ -0,0 +1,128 @@
+"""Small in-process caches shared by the API handlers.
+
+Everything here lives in a single worker's memory and is only touched from the
+event loop, so no locking is needed. Entries expire after a TTL, which also
+bounds how stale another worker's copy can get.
+"""
+import hashlib
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a time-to-live"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        value, expires = entry
+        if expires <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Drop every entry for which predicate(key, value) is true"""
+        keys = [key for key, (value, _) in self._data.items() if predicate(key, value)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag derived from a serialized response body"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class CachedBody(NamedTuple):
+    """Pre-serialized response body with its strong ETag"""
+    body: bytes
+    etag: str
+
+
+class CatalogCache:
+    """Serialized catalog responses, invalidated per collection.
+
+    Each collection carries a version number that every write bumps. A body
+    is only stored if the version did not change while it was being loaded,
+    so a response computed before a write can never be cached after it.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.versions: Dict[str, int] = defaultdict(int)
+        self.changed_at: Dict[str, float] = {}
+        self.cleared_at = float("-inf")
+
+    def version(self, collection: str) -> int:
+        return self.versions[collection]
+
+    def get(self, collection: str, key: Hashable) -> Optional[CachedBody]:
+        return self.entries.get((collection, key))
+
+    def set(self, collection: str, key: Hashable, body: bytes, version: int) -> CachedBody:
+        cached = CachedBody(body, body_etag(body))
+        if version == self.versions[collection]:
+            self.entries.set((collection, key), cached)
+        return cached
+
+    def invalidate(self, collection: str) -> None:
+        self.versions[collection] += 1
+        self.changed_at[collection] = time.monotonic()
+        self.entries.invalidate_where(lambda key, value: key[0] == collection)
+
+    def clear(self) -> None:
+        for collection in list(self.versions):
+            self.versions[collection] += 1
+        self.cleared_at = time.monotonic()
+        self.entries.clear()
+
+    def changed_within(self, collection: str, seconds: float) -> bool:
+        """Whether collection was invalidated (or the cache cleared) in the last seconds"""
+        changed_at = max(self.changed_at.get(collection, float("-inf")), self.cleared_at)
+        return time.monotonic() - changed_at < seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.entries.stats(), "versions": dict(self.versions)}
@@ -0,0 +1,200 @@
+"""Negotiated gzip/brotli response compression.
+
+Only textual content types are compressed, so image bytes (already
+compressed) and event streams pass through untouched. Bodies smaller than
+minimum_size are sent as-is. Brotli is used when the ``brotli`` package is
+installed and the client prefers it, gzip otherwise.
+"""
+import gzip
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "image/svg+xml")
+# Streamed to the client as produced; compressing would buffer events
+UNCOMPRESSIBLE_TYPES = ("text/event-stream",)
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """{"gzip": 1.0, "br": 0.5, ...} from an Accept-Encoding header"""
+    encodings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[coding.strip().lower()] = quality
+    return encodings
+
+
+def choose_encoding(header: str) -> Optional[str]:
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    candidates = [("br", 2)] if brotli is not None else []
+    candidates.append(("gzip", 1))
+    best = max(
+        ((accepted.get(coding, wildcard), preference, coding) for coding, preference in candidates),
+        default=None,
+    )
+    return best[2] if best and best[0] > 0 else None
+
+
+class Compressor:
+    """Incremental compressor for one response body"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress_body(data: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing textual responses the client accepts"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        await self.app(scope, receive, CompressingSender(send, choose_encoding(accept), self))
+
+
+class CompressingSender:
+    """Wraps send for one response and decides on compression at its first body chunk"""
+
+    def __init__(self, send, encoding: Optional[str], middleware: CompressionMiddleware):
+        self.send = send
+        self.encoding = encoding
+        self.middleware = middleware
+        self.start_message: Optional[dict] = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+        if self.compressor is not None:
+            await self.send_compressed(message)
+            return
+
+        # First body chunk: decide now
+        headers = self.start_message.setdefault("headers", [])
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.compressible(headers):
+            await self.start_passthrough(message)
+            return
+        add_header(headers, b"vary", b"Accept-Encoding")
+        length = header_value(headers, b"content-length")
+        size = len(body) if not more_body else int(length) if length and length.isdigit() else None
+        if self.encoding is None or (size is not None and size < self.middleware.minimum_size):
+            await self.start_passthrough(message)
+            return
+
+        set_header(headers, b"content-encoding", self.encoding.encode())
+        etag = header_value(headers, b"etag")
+        if etag and not etag.startswith("W/"):
+            # The compressed bytes differ from the identity representation
+            set_header(headers, b"etag", f"W/{etag}".encode())
+
+        if not more_body:
+            compressed = compress_body(body, self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+            set_header(headers, b"content-length", str(len(compressed)).encode())
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        remove_header(headers, b"content-length")
+        self.compressor = Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+        await self.send(self.start_message)
+        await self.send_compressed(message)
+
+    def compressible(self, headers: List[Tuple[bytes, bytes]]) -> bool:
+        if self.start_message["status"] in (204, 304) or self.start_message["status"] < 200:
+            return False
+        if header_value(headers, b"content-encoding"):
+            return False
+        content_type = (header_value(headers, b"content-type") or "").lower()
+        if content_type.startswith(UNCOMPRESSIBLE_TYPES):
+            return False
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def start_passthrough(self, message):
+        self.passthrough = True
+        await self.send(self.start_message)
+        await self.send(message)
+
+    async def send_compressed(self, message):
+        more_body = message.get("more_body", False)
+        data = self.compressor.compress(message.get("body", b""))
+        if not more_body:
+            data += self.compressor.flush()
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+
+def header_value(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+def remove_header(headers: List[Tuple[bytes, bytes]], name: bytes) -> None:
+    headers[:] = [(key, value) for key, value in headers if key.lower() != name]
+
+
+def set_header(headers: List[Tuple[bytes, bytes]], name: bytes, value: bytes) -> None:
+    remove_header(headers, name)
+    headers.append((name, value))
+
+
+def add_header(headers: List[Tuple[bytes, bytes]], name: bytes, value: bytes) -> None:
+    """Append a token to a comma-separated header such as Vary"""
+    existing = header_value(headers, name)
+    if existing is None:
+        headers.append((name, value))
+    elif value.decode("latin-1").lower() not in existing.lower():
+        set_header(headers, name, f"{existing}, {value.decode('latin-1')}".encode("latin-1"))
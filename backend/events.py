@@ -0,0 +1,195 @@
+"""Order event pub/sub behind the server-sent event streams.
+
+Order writes publish small events (type, order_id, status, timestamp) and
+viewers subscribe to one order or to the admin feed of every order. The
+default backend only reaches subscribers of this process; with a collection
+configured, publish() inserts the event into it and each worker's watch()
+fans out what the change stream reports, so viewers on any worker see the
+writes of all of them (needs a replica set).
+
+Every worker remembers the last events it dispatched. A client reconnecting
+with Last-Event-ID gets the ones it missed, or a "resync" event telling it to
+refetch when that id is no longer known. Subscribers that fall too far behind
+are closed the same way rather than buffering without bound.
+"""
+import asyncio
+import logging
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOPIC = "admin"
+_CLOSED = object()
+
+
+def order_topic(order_id: str) -> str:
+    return f"order:{order_id}"
+
+
+class TooManySubscribers(Exception):
+    """The broker already holds max_subscribers open streams"""
+
+
+class Subscription:
+    """Queue of events for one connected viewer"""
+
+    def __init__(self, topics: List[str], queue_size: int):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size + 1)
+        self.queue_size = queue_size
+        self.closed = False
+
+    def push(self, event: Dict) -> None:
+        if self.closed:
+            return
+        if self.queue.qsize() >= self.queue_size:
+            self.close(resync=True)
+            return
+        self.queue.put_nowait(event)
+
+    def close(self, resync: bool = False) -> None:
+        """Stop the stream; with resync the client is told to refetch first"""
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if resync:
+            self.queue.put_nowait(resync_event())
+        self.queue.put_nowait(_CLOSED)
+
+    async def events(self, heartbeat: float) -> AsyncIterator[Optional[Dict]]:
+        """Yield events as they arrive, None every heartbeat seconds of silence"""
+        while True:
+            getter = asyncio.ensure_future(self.queue.get())
+            try:
+                done, _ = await asyncio.wait([getter], timeout=heartbeat)
+            finally:
+                getter.cancel()
+            if not done:
+                yield None
+                continue
+            event = getter.result()
+            if event is _CLOSED:
+                return
+            yield event
+
+
+def resync_event() -> Dict:
+    return {"id": None, "type": "resync", "timestamp": datetime.now(timezone.utc)}
+
+
+class OrderEventBroker:
+    """Fans order events out to the subscribers of their order and the admin feed"""
+
+    def __init__(self, collection=None, history: int = 500, queue_size: int = 100, max_subscribers: int = 1000):
+        self.collection = collection
+        self.history: deque = deque(maxlen=history)
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self.count = 0
+
+    def subscribe(self, topics: List[str], last_event_id: Optional[str] = None) -> Subscription:
+        if self.count >= self.max_subscribers:
+            raise TooManySubscribers()
+        subscription = Subscription(topics, self.queue_size)
+        for topic in topics:
+            self.subscribers[topic].add(subscription)
+        self.count += 1
+        if last_event_id:
+            missed = self.since(last_event_id)
+            if missed is None:
+                subscription.push(resync_event())
+            for event in missed or []:
+                if set(event_topics(event)) & set(topics):
+                    subscription.push(event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        removed = False
+        for topic in subscription.topics:
+            subscribers = self.subscribers.get(topic)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                removed = True
+                if not subscribers:
+                    del self.subscribers[topic]
+        if removed:
+            self.count -= 1
+
+    def since(self, event_id: str) -> Optional[List[Dict]]:
+        """Events dispatched after event_id, or None if it is not remembered"""
+        events = list(self.history)
+        for index in range(len(events) - 1, -1, -1):
+            if events[index]["id"] == event_id:
+                return events[index + 1:]
+        return None
+
+    async def publish(self, event_type: str, order_id: str, status: Optional[str] = None) -> Dict:
+        event = {
+            "id": uuid.uuid4().hex,
+            "type": event_type,
+            "order_id": order_id,
+            "status": status,
+            "timestamp": datetime.now(timezone.utc),
+        }
+        if self.collection is None:
+            self.dispatch(event)
+        else:
+            # Delivered by every worker's watch(), this one included
+            await self.collection.insert_one({"_id": event["id"], **event})
+        return event
+
+    def changed_within(self, order_id: str, seconds: float) -> bool:
+        """Whether an event of order_id was dispatched in the last seconds"""
+        since = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+        for event in reversed(self.history):
+            if event["timestamp"] < since:
+                return False
+            if event["order_id"] == order_id:
+                return True
+        return False
+
+    def dispatch(self, event: Dict) -> None:
+        self.history.append(event)
+        delivered = set()
+        for topic in event_topics(event):
+            for subscription in list(self.subscribers.get(topic, ())):
+                if id(subscription) not in delivered:
+                    delivered.add(id(subscription))
+                    subscription.push(event)
+
+    def close_all(self, resync: bool = False) -> None:
+        for subscribers in list(self.subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close(resync=resync)
+
+    async def watch(self) -> None:
+        """Dispatch events inserted by any worker (change stream backend)"""
+        delay = 1
+        while True:
+            try:
+                async with self.collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+                    delay = 1
+                    async for change in stream:
+                        event = change["fullDocument"]
+                        event.pop("_id", None)
+                        self.dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Order event change stream interrupted, retrying in {delay}s: {e}")
+                # Events published meanwhile are lost to this worker; make its viewers refetch
+                self.history.clear()
+                self.close_all(resync=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+
+def event_topics(event: Dict) -> Iterable[str]:
+    return (order_topic(event["order_id"]), ADMIN_TOPIC)
@@ -0,0 +1,79 @@
+"""Idempotency-Key support for retried POST requests.
+
+The first request with a key claims it in the ``idempotency_keys`` collection
+(unique _id, TTL index on expires_at) and stores its response once done.
+Retries with the same key get the stored response back instead of repeating
+the writes and notifications.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+
+class IdempotencyInProgress(Exception):
+    """The original request with this key has not finished yet"""
+
+
+class IdempotencyMismatch(Exception):
+    """The key was already used for a different request"""
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class IdempotencyStore:
+    """Claims keys and keeps the responses of completed requests"""
+
+    def __init__(self, collection, ttl: timedelta = timedelta(hours=24), lease: timedelta = timedelta(minutes=2)):
+        self.collection = collection
+        self.ttl = ttl
+        # A claim older than this belongs to a crashed request and may be taken over
+        self.lease = lease
+
+    @staticmethod
+    def record_id(scope: str, owner: Optional[str], key: str) -> str:
+        return fingerprint(f"{scope}\x00{owner or ''}\x00{key}".encode("utf-8"))
+
+    async def begin(self, record_id: str, request_fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Claim the key; returns the stored response if the request already completed"""
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.insert_one({
+                "_id": record_id,
+                "status": "in_progress",
+                "fingerprint": request_fingerprint,
+                "created_at": now,
+                "expires_at": now + self.ttl,
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        record = await self.collection.find_one({"_id": record_id})
+        if record is None:
+            # Expired or abandoned in between; claim it again
+            return await self.begin(record_id, request_fingerprint)
+        if request_fingerprint and record.get("fingerprint") and record["fingerprint"] != request_fingerprint:
+            raise IdempotencyMismatch()
+        if record["status"] != "completed":
+            claimed_at = record["created_at"]
+            if claimed_at.tzinfo is None:
+                claimed_at = claimed_at.replace(tzinfo=timezone.utc)
+            if claimed_at + self.lease > now:
+                raise IdempotencyInProgress()
+            await self.collection.delete_one({"_id": record_id, "status": "in_progress", "created_at": record["created_at"]})
+            return await self.begin(record_id, request_fingerprint)
+        return record["response"]
+
+    async def complete(self, record_id: str, status_code: int, body: Any) -> None:
+        await self.collection.update_one(
+            {"_id": record_id},
+            {"$set": {"status": "completed", "response": {"status_code": status_code, "body": body}}}
+        )
+
+    async def abandon(self, record_id: str) -> None:
+        """Release the key so the client can retry after an unexpected failure"""
+        await self.collection.delete_one({"_id": record_id, "status": "in_progress"})
@@ -0,0 +1,143 @@
+"""Thumbnails and previews generated from uploaded images.
+
+Resizing is CPU bound, so it runs in a process pool instead of the event loop.
+Every derivative is stored in the image store like any other blob and indexed
+in the ``image_derivatives`` collection by (source digest, size, format).
+"""
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from image_store import ImageStore
+
+# Longest side in pixels for each named size
+DERIVATIVE_SIZES = {
+    "thumb": 256,
+    "medium": 1024,
+}
+
+DERIVATIVE_FORMATS = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+# Refuse decompression bombs well before they can exhaust a worker's memory
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+
+def render_derivative(data: bytes, max_side: int, fmt: str) -> bytes:
+    """Resize image bytes to fit max_side and encode them as fmt"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.seek(0)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        if fmt == "jpeg":
+            if image.mode in ("RGBA", "LA", "P"):
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            elif image.mode != "RGB":
+                image = image.convert("RGB")
+            options = {"quality": 82, "optimize": True, "progressive": True}
+        else:
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            options = {"quality": 80, "method": 4}
+
+        output = io.BytesIO()
+        image.save(output, format=fmt.upper(), **options)
+        return output.getvalue()
+
+
+class DerivativeError(Exception):
+    """Raised when a derivative cannot be generated from the source image"""
+
+
+class DerivativeCache:
+    """Generates derivatives on first request and serves them from the store afterwards"""
+
+    def __init__(self, collection, store: ImageStore, workers: Optional[int] = None):
+        self.collection = collection
+        self.store = store
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Concurrent requests for the same derivative share one render
+        self._pending: Dict[Tuple[str, str, str], asyncio.Future] = {}
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def get(self, digest: str, size: str, fmt: str) -> Dict:
+        """Return the derivative record for (digest, size, fmt), rendering it if needed"""
+        key = (digest, size, fmt)
+        record = await self.collection.find_one(
+            {"source": digest, "size": size, "format": fmt}, {"_id": 0}
+        )
+        if record and await self.store.exists(record["sha256"]):
+            return record
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The request rendering it went away; render it here instead
+                return await self.get(digest, size, fmt)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            record = await self._render(digest, size, fmt)
+            future.set_result(record)
+            return record
+        except asyncio.CancelledError:
+            # Wake the waiters, or they would wait on this future forever
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    async def _render(self, digest: str, size: str, fmt: str) -> Dict:
+        source = await self.store.read(digest)
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(
+                self.executor, render_derivative, source, DERIVATIVE_SIZES[size], fmt
+            )
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            raise DerivativeError(str(exc)) from exc
+
+        record = {
+            "source": digest,
+            "size": size,
+            "format": fmt,
+            "sha256": await self.store.save(data),
+            "content_type": DERIVATIVE_FORMATS[fmt],
+            "length": len(data),
+        }
+        await self.collection.update_one(
+            {"source": digest, "size": size, "format": fmt},
+            {"$set": record},
+            upsert=True
+        )
+        return record
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
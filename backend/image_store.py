@@ -0,0 +1,221 @@
+"""Content-addressed storage for uploaded images.
+
+Images are stored once as raw bytes keyed by their SHA-256 digest, so identical
+uploads share a single blob. Metadata (image_id, filename, content type...) stays
+in the ``uploaded_images`` collection and only references the digest.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import IO, AsyncIterator, Optional
+
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+
+CHUNK_SIZE = 256 * 1024
+
+# Leading bytes of the image formats we accept, checked instead of the client's content type
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def sha256_hex(data: bytes) -> str:
+    """Return the hex SHA-256 digest of data"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect the image content type from its magic bytes"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class ImageNotFound(Exception):
+    """Raised when streaming a digest the store does not hold"""
+
+
+class ImageTooLarge(Exception):
+    """Raised when an upload grows past its size limit"""
+
+
+class ImageUpload:
+    """Upload being received in chunks: hashed, size-bounded and spooled to disk"""
+
+    HEAD_SIZE = 16
+
+    def __init__(self, max_size: int, spool_size: int = CHUNK_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.head = b""
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        self._hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise ImageTooLarge()
+        if len(self.head) < self.HEAD_SIZE:
+            self.head += data[:self.HEAD_SIZE - len(self.head)]
+        self._hash.update(data)
+        self.file.write(data)
+
+    @property
+    def digest(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def content_type(self) -> Optional[str]:
+        return sniff_image_type(self.head)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ImageStore(ABC):
+    """Base class for image blob backends"""
+
+    @abstractmethod
+    async def exists(self, digest: str) -> bool:
+        """Whether a blob with this digest is stored"""
+
+    @abstractmethod
+    async def write_file(self, digest: str, source: IO[bytes]) -> None:
+        """Store the contents of source under digest"""
+
+    @abstractmethod
+    def stream(self, digest: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Read a blob in chunks; raises ImageNotFound if it is not stored"""
+
+    @abstractmethod
+    async def delete(self, digest: str) -> None:
+        """Remove a blob; missing blobs are ignored"""
+
+    async def write(self, digest: str, data: bytes) -> None:
+        await self.write_file(digest, io.BytesIO(data))
+
+    async def save(self, data: bytes) -> str:
+        """Store data if it is not stored yet and return its digest"""
+        digest = sha256_hex(data)
+        if not await self.exists(digest):
+            await self.write(digest, data)
+        return digest
+
+    async def save_upload(self, upload: ImageUpload) -> str:
+        """Store a received upload if it is not stored yet and return its digest"""
+        digest = upload.digest
+        if not await self.exists(digest):
+            upload.file.seek(0)
+            await self.write_file(digest, upload.file)
+        return digest
+
+    async def read(self, digest: str) -> bytes:
+        """Read a whole blob into memory (only for small derived work)"""
+        return b"".join([chunk async for chunk in self.stream(digest)])
+
+
+class LocalImageStore(ImageStore):
+    """Stores blobs on the local filesystem under root/ab/cd/<digest>"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    async def exists(self, digest: str) -> bool:
+        return await asyncio.to_thread(self._path(digest).is_file)
+
+    def _write_sync(self, digest: str, source: IO[bytes]) -> None:
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so readers never see partial blobs
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                shutil.copyfileobj(source, tmp, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def write_file(self, digest: str, source: IO[bytes]) -> None:
+        await asyncio.to_thread(self._write_sync, digest, source)
+
+    async def stream(self, digest: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        try:
+            f = await asyncio.to_thread(open, self._path(digest), "rb")
+        except FileNotFoundError:
+            raise ImageNotFound(digest)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+    async def delete(self, digest: str) -> None:
+        path = self._path(digest)
+        if await asyncio.to_thread(path.is_file):
+            await asyncio.to_thread(path.unlink)
+
+
+class GridFSImageStore(ImageStore):
+    """Stores blobs in a GridFS bucket using the digest as file _id"""
+
+    def __init__(self, database: AsyncIOMotorDatabase, bucket_name: str = "image_blobs"):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)
+        self.files = database[f"{bucket_name}.files"]
+
+    async def exists(self, digest: str) -> bool:
+        return await self.files.find_one({"_id": digest}, {"_id": 1}) is not None
+
+    async def write_file(self, digest: str, source: IO[bytes]) -> None:
+        try:
+            await self.bucket.upload_from_stream_with_id(
+                digest, digest, source, chunk_size_bytes=CHUNK_SIZE
+            )
+        except DuplicateKeyError:
+            # A concurrent upload of the same image won the race
+            pass
+
+    async def stream(self, digest: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        try:
+            grid_out = await self.bucket.open_download_stream(digest)
+        except NoFile:
+            raise ImageNotFound(digest)
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    async def delete(self, digest: str) -> None:
+        if await self.exists(digest):
+            await self.bucket.delete(digest)
+
+
+def create_image_store(database: AsyncIOMotorDatabase, backend: str, path: Optional[str] = None) -> ImageStore:
+    """Build the configured image store ("gridfs" or "local")"""
+    if backend == "local":
+        return LocalImageStore(Path(path) if path else Path(__file__).parent / "uploads")
+    if backend == "gridfs":
+        return GridFSImageStore(database)
+    raise ValueError(f"Unknown image store backend: {backend}")
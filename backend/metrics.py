@@ -0,0 +1,259 @@
+"""Request and MongoDB instrumentation exposed in Prometheus text format.
+
+MetricsMiddleware times every HTTP request per route template and records
+status codes and response sizes. MongoCommandTimer is a pymongo command
+listener; Motor runs commands in executor threads with a copy of the caller's
+context, so the listener can attribute each command's time to the request
+that issued it through the ``request_db_stats`` context variable.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+LabelValues = Tuple[str, ...]
+
+
+def format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for values, total in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(self.labels, values)} {format_value(total)}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (+Inf last), sum]
+        self.series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1][0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for values, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                bucket_label = f'le="{le}"'
+                yield f"{self.name}_bucket{format_labels(self.labels, values, bucket_label)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, values)} {format_value(total[0])}"
+            yield f"{self.name}_count{format_labels(self.labels, values)} {cumulative}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...], collect: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        for values, value in sorted(self.collect().items()):
+            yield f"{self.name}{format_labels(self.labels, values)} {format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+# ==================== REQUEST / DB ATTRIBUTION ====================
+
+class RequestDbStats:
+    """Mongo commands issued while serving one request"""
+
+    def __init__(self):
+        self.commands: List[Tuple[str, str, float]] = []
+
+    def add(self, command: str, collection: str, seconds: float) -> None:
+        self.commands.append((command, collection, seconds))
+
+    @property
+    def round_trips(self) -> int:
+        return len(self.commands)
+
+    @property
+    def seconds(self) -> float:
+        return sum(seconds for _, _, seconds in self.commands)
+
+    def breakdown(self) -> str:
+        """e.g. "find users 1.2ms, aggregate orders 40.3ms" """
+        return ", ".join(f"{command} {collection} {seconds * 1000:.1f}ms" for command, collection, seconds in self.commands)
+
+
+request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times every MongoDB command, globally and for the request that issued it"""
+
+    def __init__(self, metrics: "AppMetrics"):
+        self.metrics = metrics
+        self._collections: Dict[Tuple[int, object], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._collections[(event.request_id, event.connection_id)] = collection if isinstance(collection, str) else ""
+
+    def _finished(self, event, outcome: str) -> None:
+        collection = self._collections.pop((event.request_id, event.connection_id), "")
+        seconds = event.duration_micros / 1_000_000
+        self.metrics.mongo_duration.observe(seconds, event.command_name, collection)
+        if outcome != "ok":
+            self.metrics.mongo_failures.inc(event.command_name, collection)
+        stats = request_db_stats.get()
+        if stats is not None:
+            stats.add(event.command_name, collection, seconds)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event, "error")
+
+
+class AppMetrics:
+    """The application's metrics and their registry"""
+
+    def __init__(self):
+        self.registry = Registry()
+        self.request_duration = self.registry.register(Histogram(
+            "labcel_http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+        ))
+        self.requests = self.registry.register(Counter(
+            "labcel_http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")
+        ))
+        self.response_size = self.registry.register(Histogram(
+            "labcel_http_response_size_bytes", "Response body size by route template", ("method", "route"), SIZE_BUCKETS
+        ))
+        self.request_db_duration = self.registry.register(Histogram(
+            "labcel_http_request_db_seconds", "MongoDB time spent per request", ("method", "route")
+        ))
+        self.request_db_round_trips = self.registry.register(Histogram(
+            "labcel_http_request_db_round_trips", "MongoDB commands issued per request", ("method", "route"), COUNT_BUCKETS
+        ))
+        self.mongo_duration = self.registry.register(Histogram(
+            "labcel_mongo_command_duration_seconds", "MongoDB command latency", ("command", "collection")
+        ))
+        self.mongo_failures = self.registry.register(Counter(
+            "labcel_mongo_command_failures_total", "Failed MongoDB commands", ("command", "collection")
+        ))
+
+    def add_gauge(self, name: str, documentation: str, labels: Tuple[str, ...], collect: Callable[[], Dict[LabelValues, float]]) -> None:
+        self.registry.register(Gauge(name, documentation, labels, collect))
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are neither buffered nor cut short"""
+
+    def __init__(self, app, metrics: AppMetrics, slow_request_ms: float = 0, logger: Optional[logging.Logger] = None):
+        self.app = app
+        self.metrics = metrics
+        self.slow_request_ms = slow_request_ms
+        self.logger = logger or logging.getLogger(__name__)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestDbStats()
+        token = request_db_stats.set(stats)
+        status = 500
+        size = 0
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_db_stats.reset(token)
+            self.record(scope, status, size, elapsed, stats)
+
+    def record(self, scope, status: int, size: int, elapsed: float, stats: RequestDbStats) -> None:
+        method = scope["method"]
+        # Route templates keep label cardinality bounded; unmatched paths share one label
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        self.metrics.request_duration.observe(elapsed, method, route)
+        self.metrics.requests.inc(method, route, str(status))
+        self.metrics.response_size.observe(size, method, route)
+        self.metrics.request_db_duration.observe(stats.seconds, method, route)
+        self.metrics.request_db_round_trips.observe(stats.round_trips, method, route)
+
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+            self.logger.warning(
+                f"Slow request {method} {scope['path']} ({route}) {elapsed * 1000:.0f}ms status={status} "
+                f"bytes={size} db={stats.round_trips} commands/{stats.seconds * 1000:.1f}ms [{stats.breakdown()}]"
+            )
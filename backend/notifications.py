@@ -0,0 +1,214 @@
+"""Notification outbox delivery.
+
+Handlers only insert notifications with ``status="pending"`` into
+``db.notifications``. A NotificationWorker claims due notifications in
+batches, delivers them through the adapter of their channel and records the
+outcome: ``sent``, back to ``pending`` with exponential backoff, or ``failed``
+(dead-lettered) once max_attempts is exhausted. Claims carry a lease, so work
+held by a crashed worker is picked up again once the lease expires.
+"""
+import asyncio
+import logging
+import random
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+    """Delivery failed but may succeed if retried"""
+
+
+class PermanentDeliveryError(DeliveryError):
+    """Delivery can never succeed (bad address...); dead-letter right away"""
+
+
+class ChannelAdapter(ABC):
+    """Delivers notifications of one channel (email, whatsapp)"""
+
+    @abstractmethod
+    async def send(self, notification: Dict) -> None:
+        """Deliver one notification; raise DeliveryError to retry, PermanentDeliveryError to give up"""
+
+
+class LogAdapter(ChannelAdapter):
+    """Logs deliveries instead of sending them, until a provider is configured"""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+
+    async def send(self, notification: Dict) -> None:
+        recipient = notification.get("recipient_email") or notification.get("recipient_whatsapp")
+        logger.info(f"{self.channel} notification {notification['notification_id']} sent to {recipient}")
+
+
+class FakeAdapter(ChannelAdapter):
+    """Records deliveries in memory; fail_times makes the first N sends fail"""
+
+    def __init__(self, fail_times: int = 0, permanent: bool = False):
+        self.sent: List[Dict] = []
+        self.fail_times = fail_times
+        self.permanent = permanent
+        self.calls = 0
+
+    async def send(self, notification: Dict) -> None:
+        self.calls += 1
+        if self.calls <= self.fail_times:
+            error = PermanentDeliveryError if self.permanent else DeliveryError
+            raise error(f"simulated failure {self.calls}")
+        self.sent.append(notification)
+
+
+def create_adapters(kind: str = "log") -> Dict[str, ChannelAdapter]:
+    """Channel adapters by name ("log" or "fake")"""
+    if kind == "fake":
+        return {"email": FakeAdapter(), "whatsapp": FakeAdapter()}
+    if kind == "log":
+        return {"email": LogAdapter("email"), "whatsapp": LogAdapter("whatsapp")}
+    raise ValueError(f"Unknown notification adapter: {kind}")
+
+
+class NotificationWorker:
+    """Claims pending notifications from the outbox and delivers them"""
+
+    def __init__(
+        self,
+        collection,
+        adapters: Dict[str, ChannelAdapter],
+        concurrency: int = 4,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        base_delay: float = 5.0,
+        max_delay: float = 3600.0,
+        lease: float = 60.0,
+        poll_interval: float = 2.0,
+    ):
+        self.collection = collection
+        self.adapters = adapters
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.worker_id = f"worker_{uuid.uuid4().hex[:8]}"
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self) -> None:
+        """Process the outbox now instead of waiting for the next poll"""
+        self._wakeup.set()
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before retry number `attempts`, with jitter"""
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    async def claim(self) -> List[Dict]:
+        """Atomically take a batch of due notifications for this worker"""
+        now = datetime.now(timezone.utc)
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "processing", "locked_until": {"$lte": now}},
+        ]}
+        candidates = await self.collection.find(due, {"_id": 1}).sort("next_attempt_at", 1).limit(self.batch_size).to_list(self.batch_size)
+        if not candidates:
+            return []
+
+        lock_id = uuid.uuid4().hex
+        # Re-check the due condition so a notification claimed concurrently is skipped
+        await self.collection.update_many(
+            {"$and": [{"_id": {"$in": [doc["_id"] for doc in candidates]}}, due]},
+            {
+                "$set": {
+                    "status": "processing",
+                    "lock_id": lock_id,
+                    "locked_by": self.worker_id,
+                    "locked_until": now + timedelta(seconds=self.lease),
+                },
+                "$inc": {"attempts": 1},
+            }
+        )
+        return await self.collection.find({"lock_id": lock_id}).to_list(self.batch_size)
+
+    async def deliver(self, notification: Dict) -> None:
+        """Send one claimed notification and record the result"""
+        async with self._semaphore:
+            now = datetime.now(timezone.utc)
+            adapter = self.adapters.get(notification.get("channel"))
+            try:
+                if adapter is None:
+                    raise PermanentDeliveryError(f"No adapter for channel {notification.get('channel')}")
+                await adapter.send(notification)
+            except Exception as e:
+                attempts = notification.get("attempts", 1)
+                permanent = isinstance(e, PermanentDeliveryError)
+                if permanent or attempts >= self.max_attempts:
+                    update = {"status": "failed", "last_error": str(e), "failed_at": now}
+                    logger.error(f"Notification {notification.get('notification_id')} dead-lettered after {attempts} attempts: {e}")
+                else:
+                    update = {
+                        "status": "pending",
+                        "last_error": str(e),
+                        "next_attempt_at": now + timedelta(seconds=self.backoff(attempts)),
+                    }
+                    logger.warning(f"Notification {notification.get('notification_id')} failed (attempt {attempts}): {e}")
+            else:
+                update = {"status": "sent", "sent_at": now}
+
+            await self.collection.update_one(
+                {"_id": notification["_id"], "lock_id": notification["lock_id"]},
+                {"$set": update, "$unset": {"lock_id": "", "locked_by": "", "locked_until": ""}}
+            )
+
+    async def process_batch(self) -> int:
+        """Claim and deliver one batch; returns how many were processed"""
+        batch = await self.claim()
+        await asyncio.gather(*(self.deliver(notification) for notification in batch))
+        return len(batch)
+
+    async def drain(self) -> int:
+        """Process batches until nothing is due"""
+        total = 0
+        while True:
+            processed = await self.process_batch()
+            if not processed:
+                return total
+            total += processed
+
+    async def run(self) -> None:
+        logger.info(f"Notification worker {self.worker_id} started (concurrency {self.concurrency})")
+        while True:
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Notification worker error: {e}")
+                processed = 0
+            if processed:
+                continue
+            # asyncio.wait, unlike wait_for on 3.11, never turns a cancellation
+            # that races the timeout into a TimeoutError
+            wakeup = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait([wakeup], timeout=self.poll_interval)
+            finally:
+                wakeup.cancel()
+            self._wakeup.clear()
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
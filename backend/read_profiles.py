@@ -0,0 +1,120 @@
+"""Read profiles: how read-heavy endpoints query MongoDB.
+
+A profile bundles a read preference, a read concern and a maxTimeMS budget:
+
+* strong reads the primary with "majority" read concern, so it never returns
+  a write that could still be rolled back, with no time limit by default;
+* eventual prefers secondaries (at most max_staleness seconds behind, when
+  set) with "local" read concern, and gives up after max_time_ms, so reads
+  can be spread over replicas. Without secondaries it reads the primary,
+  which makes it safe to enable before replicas are added;
+* reporting reads like eventual but with its own, longer budget, for
+  aggregations over many orders (admin stats) that would not fit in the
+  few seconds an interactive read gets.
+
+Handlers do not pick profiles themselves: they read through a route
+("catalog", "tracking", ...) and the configuration maps each route to a
+profile. Writes always go through the plain database.
+"""
+from typing import Any, Dict, NamedTuple, Optional
+
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+
+class ReadProfile(NamedTuple):
+    read_preference: Any
+    read_concern: ReadConcern
+    max_time_ms: Optional[int]
+
+
+def build_profiles(
+    eventual_max_time_ms: Optional[int] = None,
+    eventual_max_staleness: Optional[int] = None,
+    strong_max_time_ms: Optional[int] = None,
+    reporting_max_time_ms: Optional[int] = None,
+) -> Dict[str, ReadProfile]:
+    """The strong, eventual and reporting profiles; max_staleness must be >= 90s when set (a MongoDB limit)"""
+    secondary_preferred = SecondaryPreferred(max_staleness=eventual_max_staleness or -1)
+    return {
+        "strong": ReadProfile(Primary(), ReadConcern("majority"), strong_max_time_ms),
+        "eventual": ReadProfile(secondary_preferred, ReadConcern("local"), eventual_max_time_ms),
+        "reporting": ReadProfile(secondary_preferred, ReadConcern("local"), reporting_max_time_ms),
+    }
+
+
+class ProfiledCollection:
+    """Motor collection whose reads carry the profile's maxTimeMS; other attributes pass through"""
+
+    def __init__(self, collection, max_time_ms: Optional[int]):
+        self.collection = collection
+        self.max_time_ms = max_time_ms
+
+    def find(self, *args, **kwargs):
+        cursor = self.collection.find(*args, **kwargs)
+        return cursor.max_time_ms(self.max_time_ms) if self.max_time_ms else cursor
+
+    async def find_one(self, *args, **kwargs) -> Optional[Dict]:
+        if self.max_time_ms:
+            kwargs.setdefault("max_time_ms", self.max_time_ms)
+        return await self.collection.find_one(*args, **kwargs)
+
+    def aggregate(self, pipeline, **kwargs):
+        if self.max_time_ms:
+            kwargs.setdefault("maxTimeMS", self.max_time_ms)
+        return self.collection.aggregate(pipeline, **kwargs)
+
+    async def count_documents(self, filter, **kwargs) -> int:
+        if self.max_time_ms:
+            kwargs.setdefault("maxTimeMS", self.max_time_ms)
+        return await self.collection.count_documents(filter, **kwargs)
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        if self.max_time_ms:
+            kwargs.setdefault("maxTimeMS", self.max_time_ms)
+        return await self.collection.estimated_document_count(**kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.collection, name)
+
+
+class ProfiledDatabase:
+    """The database as seen through one profile: db.<collection> gives a ProfiledCollection"""
+
+    def __init__(self, database, profile: ReadProfile):
+        self.profile = profile
+        self.database = database.client.get_database(
+            database.name,
+            read_preference=profile.read_preference,
+            read_concern=profile.read_concern,
+        )
+        self.collections: Dict[str, ProfiledCollection] = {}
+
+    def __getitem__(self, name: str) -> ProfiledCollection:
+        collection = self.collections.get(name)
+        if collection is None:
+            collection = self.collections[name] = ProfiledCollection(self.database[name], self.profile.max_time_ms)
+        return collection
+
+    def __getattr__(self, name: str) -> ProfiledCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class ReadProfiles:
+    """Routes of reads mapped to profiles; unknown routes read strong"""
+
+    def __init__(self, database, profiles: Dict[str, ReadProfile], routes: Dict[str, str]):
+        for route, name in routes.items():
+            if name not in profiles:
+                raise ValueError(f"Unknown read profile {name!r} for {route} reads; expected one of {sorted(profiles)}")
+        self.databases = {name: ProfiledDatabase(database, profile) for name, profile in profiles.items()}
+        self.routes = routes
+
+    def __call__(self, route: str) -> ProfiledDatabase:
+        return self.databases[self.routes.get(route, "strong")]
+
+    def profile(self, name: str) -> ProfiledDatabase:
+        return self.databases[name]
+
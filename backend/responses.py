@@ -0,0 +1,27 @@
+"""JSON responses rendered with orjson.
+
+FastJSONResponse is the app's default response class. Handlers that already
+hold plain documents (Mongo results projected without _id) return it
+directly, which skips FastAPI's jsonable_encoder pass; anything else still goes
+through jsonable_encoder first and is only rendered with orjson.
+"""
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def encode_fallback(obj: Any) -> Any:
+    """Types orjson does not know (pydantic models, ObjectId, Decimal, sets...)"""
+    return jsonable_encoder(obj)
+
+
+def dump_json(data: Any) -> bytes:
+    """Serialize a response payload to compact UTF-8 JSON bytes"""
+    return orjson.dumps(data, default=encode_fallback, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
@@ -0,0 +1,164 @@
+"""Load-test the API locally and compare the results against a stored baseline.
+
+The app runs in this process, either called directly through ASGI or served by
+uvicorn on a local port, against an in-memory MongoDB stand-in (mongomock-motor)
+or a throwaway database on a real MongoDB. The auth provider is faked, so the
+login flow works offline. Latency and throughput are reported per endpoint;
+peak RSS is reported once, as it covers this whole process, which hosts both
+the app and the clients.
+
+Usage (from the backend directory, after pip install -r requirements-dev.txt):
+    python scripts/benchmark.py [--mix default] [--users 20] [--duration 30]
+                                [--transport asgi|uvicorn] [--mongo-url mongodb://localhost:27017]
+                                [--save-baseline [NAME]] [--compare NAME]
+
+Baselines are stored in bench/baselines/<name>.json, named after the current
+commit by default. Typical use: run with --save-baseline on the base commit,
+then with --compare <that commit> on your change; the exit status is 1 when an
+endpoint regressed beyond --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+
+def configure_environment(args) -> None:
+    """Settings that server.py reads at import time"""
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+        os.environ["DB_NAME"] = f"labcel_bench_{uuid.uuid4().hex[:8]}"
+    else:
+        try:
+            import mongomock_motor
+        except ImportError:
+            sys.exit("In-memory mode needs mongomock-motor (pip install -r requirements-dev.txt), or pass --mongo-url")
+        import motor.motor_asyncio
+        motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+        os.environ["MONGO_URL"] = "mongodb://in-memory"
+        os.environ["DB_NAME"] = "labcel_bench"
+        # No GridFS, transactions or change streams in the stand-in
+        os.environ["IMAGE_STORE_BACKEND"] = "local"
+        os.environ["IMAGE_STORE_PATH"] = tempfile.mkdtemp(prefix="labcel_bench_images_")
+        os.environ["ORDER_TRANSACTIONS"] = "off"
+        os.environ["CATALOG_CHANGE_STREAM"] = "false"
+    if args.stats_mode:
+        os.environ["STATS_MODE"] = args.stats_mode
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main(args) -> int:
+    configure_environment(args)
+
+    import server
+    from bench.harness import LoadRunner, compare_to_baseline, format_report, load_baseline, save_baseline
+    from bench.scenarios import MIXES, fake_auth_transport, seed_database
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server.http_client = httpx.AsyncClient(transport=fake_auth_transport())
+
+    uvicorn_server = serve_task = None
+    if args.transport == "uvicorn":
+        import uvicorn
+        port = free_port()
+        uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning"))
+        serve_task = asyncio.create_task(uvicorn_server.serve())
+        while not uvicorn_server.started:
+            if serve_task.done():
+                return 1
+            await asyncio.sleep(0.05)
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            limits=httpx.Limits(max_connections=args.users),
+            timeout=60
+        )
+    else:
+        await server.app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app, raise_app_exceptions=False), base_url="http://bench", timeout=60)
+
+    try:
+        print(f"Seeding {args.orders} orders...", file=sys.stderr)
+        fixture = await seed_database(server, orders=args.orders, seed=args.seed)
+
+        async def setup(user):
+            user.state["fixture"] = fixture
+
+        mix = MIXES[args.mix]
+        if args.warmup:
+            await LoadRunner(client, mix, users=args.users, duration=args.warmup, seed=args.seed + 1, setup=setup).run()
+
+        print(f"Running mix '{args.mix}' with {args.users} users for {args.duration}s ({args.transport})...", file=sys.stderr)
+        report = await LoadRunner(client, mix, users=args.users, duration=args.duration, seed=args.seed, setup=setup).run()
+    finally:
+        await client.aclose()
+        if args.mongo_url:
+            await server.client.drop_database(os.environ["DB_NAME"])
+        if uvicorn_server is not None:
+            uvicorn_server.should_exit = True
+            await serve_task
+        else:
+            await server.app.router.shutdown()
+
+    print(format_report(report))
+    config = {
+        "mix": args.mix,
+        "users": args.users,
+        "duration": args.duration,
+        "transport": args.transport,
+        "mongo": "mongodb" if args.mongo_url else "memory",
+        "orders": args.orders,
+        "stats_mode": server.STATS_MODE,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps({"config": config, **report}, indent=2))
+
+    status = 0
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        differences = {key: (baseline["config"].get(key), value) for key, value in config.items() if baseline["config"].get(key) != value}
+        if differences:
+            print(f"Warning: configuration differs from the baseline: {differences}")
+        lines, regressions = compare_to_baseline(report, baseline, tolerance=args.tolerance)
+        print(f"\nCompared with baseline {args.compare} ({baseline.get('revision')}):")
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} endpoint(s) regressed")
+            status = 1
+    if args.save_baseline is not None:
+        path = save_baseline(report, config, args.save_baseline or None)
+        print(f"Baseline saved to {path}")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", default="default", choices=["default", "catalog", "login", "checkout", "admin"])
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unmeasured load first")
+    parser.add_argument("--transport", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--mongo-url", help="use a throwaway database on this MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--orders", type=int, default=2000, help="historical orders to seed")
+    parser.add_argument("--stats-mode", choices=["aggregate", "counters"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--save-baseline", nargs="?", const="", metavar="NAME", help="store the results (default name: current commit)")
+    parser.add_argument("--compare", metavar="NAME", help="baseline name or path to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95/throughput change")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,85 @@
+"""Compare the CPU cost of serializing an order list response.
+
+Renders a page of realistic order documents (items with image references and
+a status_history) the way FastAPI's default path does (jsonable_encoder +
+stdlib json), through jsonable_encoder + orjson (what the default response
+class gives handlers returning dicts) and straight through FastJSONResponse
+(what the hot handlers do).
+
+Usage (from the backend directory):
+    python scripts/benchmark_serialization.py [--orders 500] [--repeat 30]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from bench.scenarios import sample_order  # noqa: E402
+from responses import FastJSONResponse  # noqa: E402
+
+PRODUCTS = [
+    {"product_id": "prod_funda_normal", "name": "Funda Normal Personalizada", "price": 180.0},
+    {"product_id": "prod_funda_rudo", "name": "Funda Uso Rudo Personalizada", "price": 280.0},
+    {"product_id": "prod_funda_cartera", "name": "Funda Cartera Personalizada", "price": 350.0},
+]
+
+VARIANTS = {
+    "jsonable_encoder + json (FastAPI default)": lambda payload: JSONResponse(jsonable_encoder(payload)).body,
+    "jsonable_encoder + orjson": lambda payload: FastJSONResponse(jsonable_encoder(payload)).body,
+    "FastJSONResponse (orjson, no encoder)": lambda payload: FastJSONResponse(payload).body,
+}
+
+
+def build_payload(orders: int):
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    return [sample_order(rng, n, PRODUCTS, now - timedelta(minutes=17 * n)) for n in range(orders)]
+
+
+def measure(render, payload, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        body = render(payload)
+        timings.append(time.process_time() - started)
+    return timings, body
+
+
+def main(args) -> int:
+    payload = build_payload(args.orders)
+    results = {}
+    for name, render in VARIANTS.items():
+        render(payload)  # warm up
+        results[name] = measure(render, payload, args.repeat)
+
+    bodies = [json.loads(body) for _, body in results.values()]
+    if any(body != bodies[0] for body in bodies[1:]):
+        print("Las variantes no producen el mismo JSON")
+        return 1
+
+    reference = statistics.median(next(iter(results.values()))[0])
+    print(f"{args.orders} orders, {args.repeat} runs each, CPU time per response")
+    print(f"{'variant':<44}{'median ms':>11}{'min ms':>9}{'KB':>8}{'speedup':>9}")
+    for name, (timings, body) in results.items():
+        median = statistics.median(timings)
+        print(
+            f"{name:<44}{median * 1000:>11.2f}{min(timings) * 1000:>9.2f}"
+            f"{len(body) / 1024:>8.0f}{reference / median:>8.1f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=30)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,41 @@
+"""Explain the API's hot queries and fail if any of them scans a whole collection.
+
+Usage (from the backend directory):
+    python scripts/check_query_plans.py [--create-indexes]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+async def main(create_indexes: bool) -> int:
+    try:
+        if create_indexes:
+            await server.ensure_indexes()
+        report = await server.verify_query_plans()
+    finally:
+        server.client.close()
+
+    for entry in report:
+        status = "COLLSCAN" if entry["collscan"] else "ok"
+        sort = f" sort={entry['sort']}" if entry["sort"] else ""
+        print(f"[{status:>8}] {entry['collection']} {entry['query']}{sort} -> {' > '.join(entry['stages'])}")
+
+    failures = [entry for entry in report if entry["collscan"]]
+    if failures:
+        print(f"{len(failures)} consulta(s) sin índice")
+        return 1
+    print("Todas las consultas usan índices")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--create-indexes", action="store_true", help="create the declared indexes first")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.create_indexes)))
@@ -0,0 +1,28 @@
+"""One-time migration: store search_terms on existing orders for the admin search.
+
+Usage (from the backend directory):
+    python scripts/index_order_search.py [--batch-size 500]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+async def main(batch_size: int):
+    try:
+        indexed = await server.index_order_search_terms(batch_size=batch_size)
+        print(f"Pedidos indexados: {indexed}")
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
@@ -0,0 +1,34 @@
+"""One-time migration: convert timestamps stored as ISO strings to BSON dates.
+
+Covers orders (including status_history entries), users, sessions, products
+and uploaded images. The API reads both formats until this has run, so it
+can run while the API is serving; each update only applies if the stored
+strings are unchanged, so it is also safe to re-run.
+
+Usage (from the backend directory):
+    python scripts/migrate_dates.py [--batch-size 500]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+async def main(batch_size: int):
+    try:
+        results = await server.migrate_string_dates(batch_size=batch_size)
+        for collection, result in results.items():
+            print(f"{collection}: migrados {result['migrated']}, con errores: {result['failed']}")
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
@@ -0,0 +1,28 @@
+"""One-time migration: move inline data URL images in orders to the image store.
+
+Usage (from the backend directory):
+    python scripts/migrate_order_images.py [--batch-size 100]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+async def main(batch_size: int):
+    try:
+        result = await server.migrate_order_images(batch_size=batch_size)
+        print(f"Pedidos migrados: {result['migrated']}, con errores: {result['failed']}")
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size))
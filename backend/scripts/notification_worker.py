@@ -0,0 +1,47 @@
+"""Run the notification outbox workers outside the API process.
+
+Start the API with NOTIFICATION_WORKER=off and run one or more of these.
+Usage (from the backend directory):
+    python scripts/notification_worker.py [--concurrency 8] [--drain]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+from notifications import NotificationWorker  # noqa: E402
+
+
+async def main(concurrency: int, drain: bool):
+    worker = server.notification_worker
+    if concurrency:
+        worker = NotificationWorker(
+            server.db.notifications,
+            worker.adapters,
+            concurrency=concurrency,
+            batch_size=worker.batch_size,
+            max_attempts=worker.max_attempts
+        )
+    try:
+        if drain:
+            processed = await worker.drain()
+            logging.info(f"Notificaciones procesadas: {processed}")
+        else:
+            await worker.run()
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=0, help="deliveries in flight (default NOTIFICATION_CONCURRENCY)")
+    parser.add_argument("--drain", action="store_true", help="process everything due and exit")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.concurrency, args.drain))
+    except KeyboardInterrupt:
+        pass
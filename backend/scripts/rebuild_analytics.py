@@ -0,0 +1,32 @@
+"""Rebuild the daily sales rollups behind /api/admin/analytics.
+
+Without options, rebuilds the days touched by orders updated since the last
+run (the batch job ANALYTICS_MODE=batch runs periodically); --full recomputes
+every day, which is needed once before enabling analytics.
+
+Usage (from the backend directory):
+    python scripts/rebuild_analytics.py [--full]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+async def main(full: bool):
+    try:
+        result = await server.sales_rollups.run_batch(full=full)
+        print(f"Días recalculados: {result['days']}, marca de agua: {result['watermark'].isoformat()}")
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="recompute every day instead of those changed since the last run")
+    args = parser.parse_args()
+    asyncio.run(main(args.full))
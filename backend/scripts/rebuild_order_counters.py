@@ -0,0 +1,24 @@
+"""Recompute the materialized order counters used by STATS_MODE=counters.
+
+Usage (from the backend directory):
+    python scripts/rebuild_order_counters.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+async def main():
+    try:
+        totals = await server.rebuild_order_counters()
+        print(f"Pedidos: {totals['orders']}, ingresos: {totals['revenue']:.2f}, por estado: {totals['status']}")
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
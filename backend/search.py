@@ -0,0 +1,78 @@
+"""Search terms for the admin order search.
+
+Every order stores ``search_terms``: the lowercased, accent-free words of
+the customer's name and email, the email itself, phone and WhatsApp digits
+and the parts of the order id. A multikey index on the field turns each
+query word into an anchored-regex index range scan, which gives prefix
+matching ("jua" finds "Juan", "5512" finds "+52 55 1234 5678") without
+scanning orders. Because Mongo only ranges over prefixes, the tails that
+admins type on their own (last digits of a phone, the random code of an
+order id) are stored as extra terms.
+"""
+import re
+import unicodedata
+from typing import Dict, List
+
+MIN_TERM_LENGTH = 2
+# Suffixes of digit runs and order codes are stored down to this length
+MIN_SUFFIX_LENGTH = 4
+MAX_QUERY_TERMS = 5
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase without accents: "Peña" -> "pena" """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def suffixes(value: str) -> List[str]:
+    return [value[start:] for start in range(len(value) - MIN_SUFFIX_LENGTH + 1)] if len(value) > MIN_SUFFIX_LENGTH else [value]
+
+
+def order_search_terms(order: Dict) -> List[str]:
+    terms = set()
+    for field in ("customer_name", "customer_email"):
+        value = normalize(order.get(field) or "")
+        terms.update(_WORD.findall(value))
+    email = normalize(order.get("customer_email") or "").strip()
+    if email:
+        terms.add(email)
+    for field in ("customer_phone", "customer_whatsapp"):
+        digits = re.sub(r"\D", "", order.get(field) or "")
+        if digits:
+            terms.update(suffixes(digits))
+    order_id = normalize(order.get("order_id") or "")
+    if order_id:
+        terms.add(order_id)
+        parts = order_id.split("-")
+        terms.update(parts[1:])
+        terms.update(suffixes(parts[-1]))
+    return sorted(term for term in terms if len(term) >= MIN_TERM_LENGTH)
+
+
+def query_terms(q: str) -> List[str]:
+    """Words of a search box query, normalized like the stored terms.
+
+    An order id, email or phone typed whole stays one term; phone numbers
+    typed with spaces or dashes are joined into their digits.
+    """
+    text = normalize(q).strip()
+    if re.fullmatch(r"[\d\s()+.-]+", text):
+        digits = re.sub(r"\D", "", text)
+        return [digits] if len(digits) >= MIN_TERM_LENGTH else []
+    words = []
+    for word in text.split():
+        if "@" in word or re.fullmatch(r"ord-[a-z0-9-]*", word):
+            words.append(word)
+        else:
+            words.extend(_WORD.findall(word))
+    words = list(dict.fromkeys(words))[:MAX_QUERY_TERMS]
+    # Short words narrow a query but cannot carry one alone
+    return words if any(len(word) >= MIN_TERM_LENGTH for word in words) else []
+
+
+def prefix_filter(terms: List[str]) -> Dict:
+    """Query matching orders having a term starting with each of terms"""
+    return {"$and": [{"search_terms": {"$regex": f"^{re.escape(term)}"}} for term in terms]}
@@ -1,36 +1,241 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Request, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ExecutionTimeout, OperationFailure
 import os
+import asyncio
 import logging
 import base64
+import binascii
+import json
+import orjson
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import AsyncIterator, Awaitable, List, Optional, Dict, Any, Tuple, Union
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 import httpx
+from cache import TTLCache, CatalogCache, CachedBody, body_etag
+from compression import CompressionMiddleware
+from metrics import AppMetrics, MetricsMiddleware, MongoCommandTimer
+from responses import FastJSONResponse, dump_json
+from notifications import NotificationWorker, create_adapters
+from events import ADMIN_TOPIC, OrderEventBroker, Subscription, TooManySubscribers, order_topic
+from upstream import CircuitBreaker, CircuitOpenError, create_http_client
+from analytics import SalesRollups
+from idempotency import IdempotencyStore, IdempotencyInProgress, IdempotencyMismatch, fingerprint
+from read_profiles import ProfiledDatabase, ReadProfiles, build_profiles
+from search import order_search_terms, prefix_filter, query_terms
+from bulk_io import MEDIA_TYPES as EXPORT_MEDIA_TYPES, RecordTooLarge, decode_rows, encode_rows
+from image_store import create_image_store, sniff_image_type, ImageUpload, ImageTooLarge
+from image_derivatives import DerivativeCache, DerivativeError, DERIVATIVE_SIZES, DERIVATIVE_FORMATS
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Request latency/size and MongoDB timing, served on /metrics. Requests slower
+# than SLOW_REQUEST_MS (0 = off) are logged with their per-command DB breakdown
+metrics = AppMetrics()
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 0))
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+# Response compression: gzip/brotli for textual bodies of at least
+# COMPRESSION_MIN_SIZE bytes; images are already compressed and skipped
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+
+# MongoDB connection. Pool size and timeouts (milliseconds) set in the
+# environment override the URL's options; unset ones keep pymongo's defaults
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+MONGO_CLIENT_OPTIONS = {
+    option: int(os.environ[variable])
+    for option, variable in (
+        ("maxPoolSize", "MONGO_MAX_POOL_SIZE"),
+        ("minPoolSize", "MONGO_MIN_POOL_SIZE"),
+        ("maxIdleTimeMS", "MONGO_MAX_IDLE_TIME_MS"),
+        ("waitQueueTimeoutMS", "MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+        ("connectTimeoutMS", "MONGO_CONNECT_TIMEOUT_MS"),
+        ("serverSelectionTimeoutMS", "MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+        ("socketTimeoutMS", "MONGO_SOCKET_TIMEOUT_MS"),
+    )
+    if os.environ.get(variable)
+}
+# Timestamps are stored as BSON dates and read back as aware UTC datetimes
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[MongoCommandTimer(metrics)], **MONGO_CLIENT_OPTIONS)
 db = client[os.environ['DB_NAME']]
 
+# Read profiles of the read-heavy endpoints. "strong" reads majority-committed
+# data from the primary; "eventual" prefers secondaries at most
+# READ_MAX_STALENESS seconds behind (>= 90 when set) and gives up after
+# READ_EVENTUAL_MAX_TIME_MS; "reporting" reads like eventual with its own
+# READ_REPORTING_MAX_TIME_MS budget for the admin stats and analytics
+# aggregations. Each route uses the profile named in READ_PROFILE_<ROUTE>,
+# by default the one given below. For READ_YOUR_WRITES_SECONDS after a
+# catalog write or order event this worker saw, the affected reads go to the
+# primary instead.
+READ_ROUTES = {"catalog": "eventual", "tracking": "eventual", "notifications": "eventual", "analytics": "reporting"}
+read_profiles = ReadProfiles(
+    db,
+    build_profiles(
+        eventual_max_time_ms=int(os.environ.get("READ_EVENTUAL_MAX_TIME_MS", 5000)) or None,
+        eventual_max_staleness=int(os.environ["READ_MAX_STALENESS"]) if os.environ.get("READ_MAX_STALENESS") else None,
+        strong_max_time_ms=int(os.environ["READ_STRONG_MAX_TIME_MS"]) if os.environ.get("READ_STRONG_MAX_TIME_MS") else None,
+        reporting_max_time_ms=int(os.environ.get("READ_REPORTING_MAX_TIME_MS", 60000)) or None
+    ),
+    {route: os.environ.get(f"READ_PROFILE_{route.upper()}", default) for route, default in READ_ROUTES.items()}
+)
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", 10))
+
 #Environment configuration
 Environment = os.environ.get("ENVIRONMENT",'production')
 IS_DEVELOPMENT = Environment == 'development'
 
+# Session token -> user document cache for the auth hot path. Invalidation is
+# explicit in this worker; the TTL bounds staleness across workers.
+session_cache = TTLCache(
+    maxsize=int(os.environ.get("SESSION_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("SESSION_CACHE_TTL", 60))
+)
+
+# Admin notification recipients; invalidated when roles or admin contacts change
+admin_recipients_cache = TTLCache(maxsize=1, ttl=float(os.environ.get("ADMIN_RECIPIENTS_CACHE_TTL", 300)))
+
+# Serialized brand/model/product responses; writes invalidate them in this worker,
+# other workers via the optional change stream watcher or after the TTL
+catalog_cache = CatalogCache(ttl=float(os.environ.get("CATALOG_CACHE_TTL", 300)))
+CATALOG_COLLECTIONS = ("phone_brands", "phone_models", "products")
+CATALOG_CHANGE_STREAM = os.environ.get("CATALOG_CHANGE_STREAM", "false").lower() in ("1", "true", "yes")
+
+# Admin stats: "aggregate" computes them with one $facet pass over orders,
+# "counters" reads counters maintained on order writes (run
+# scripts/rebuild_order_counters.py before switching)
+STATS_MODE = os.environ.get("STATS_MODE", "aggregate")
+
+# Sales analytics rollups: "off" (default) leaves them to
+# scripts/rebuild_analytics.py, "inline" keeps them current on order writes,
+# "batch" rebuilds the days touched since the last run every
+# ANALYTICS_BATCH_INTERVAL seconds (0 leaves that to the script). Run
+# scripts/rebuild_analytics.py --full once before enabling either.
+ANALYTICS_MODE = os.environ.get("ANALYTICS_MODE", "off")
+ANALYTICS_BATCH_INTERVAL = float(os.environ.get("ANALYTICS_BATCH_INTERVAL", 300))
+ANALYTICS_MAX_DAYS = 800
+sales_rollups = SalesRollups(
+    db.orders, db.order_rollups, db.analytics_state, reader=read_profiles("analytics").order_rollups
+)
+
+# Notification outbox: handlers queue notifications, a worker pool delivers them.
+# NOTIFICATION_WORKER=inline runs the workers inside the API process, "off" leaves
+# them to scripts/notification_worker.py
+NOTIFICATION_WORKER = os.environ.get("NOTIFICATION_WORKER", "inline")
+notification_worker = NotificationWorker(
+    db.notifications,
+    create_adapters(os.environ.get("NOTIFICATION_ADAPTER", "log")),
+    concurrency=int(os.environ.get("NOTIFICATION_CONCURRENCY", 4)),
+    batch_size=int(os.environ.get("NOTIFICATION_BATCH_SIZE", 20)),
+    max_attempts=int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", 5))
+)
+
+# Order events pushed to viewers as server-sent events. ORDER_EVENTS_BACKEND=changestream
+# shares them between workers through db.order_events (needs a replica set).
+# Streams send a comment every SSE_HEARTBEAT seconds and end after
+# SSE_MAX_STREAM_SECONDS; clients reconnect with Last-Event-ID.
+ORDER_EVENTS_BACKEND = os.environ.get("ORDER_EVENTS_BACKEND", "memory")
+order_events = OrderEventBroker(
+    db.order_events if ORDER_EVENTS_BACKEND == "changestream" else None,
+    max_subscribers=int(os.environ.get("SSE_MAX_SUBSCRIBERS", 1000))
+)
+SSE_HEARTBEAT = float(os.environ.get("SSE_HEARTBEAT", 15))
+SSE_MAX_STREAM_SECONDS = float(os.environ.get("SSE_MAX_STREAM_SECONDS", 600))
+# Retry-After of the 503 refusing a stream when SSE_MAX_SUBSCRIBERS are open
+SSE_BUSY_RETRY_SECONDS = int(os.environ.get("SSE_BUSY_RETRY_SECONDS", 30))
+
+# Shared HTTP client for upstream calls (auth session exchange). Created lazily;
+# tests can replace it, e.g. with httpx.AsyncClient(transport=httpx.MockTransport(...))
+http_client: Optional[httpx.AsyncClient] = None
+auth_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get("AUTH_BREAKER_THRESHOLD", 5)),
+    reset_timeout=float(os.environ.get("AUTH_BREAKER_RESET", 30))
+)
+
+def get_http_client() -> httpx.AsyncClient:
+    """Application-lifetime HTTP client with connection pooling and timeouts"""
+    global http_client
+    if http_client is None:
+        http_client = create_http_client(
+            connect_timeout=float(os.environ.get("HTTP_CONNECT_TIMEOUT", 3)),
+            read_timeout=float(os.environ.get("HTTP_READ_TIMEOUT", 5))
+        )
+    return http_client
+
+# Stock reservations run in a multi-document transaction when the deployment
+# supports them ("auto"), otherwise with compensating updates ("off")
+ORDER_TRANSACTIONS = os.environ.get("ORDER_TRANSACTIONS", "auto")
+transactions_supported: Optional[bool] = None
+
+# Idempotency-Key responses for order creation and uploads are kept this long
+idempotency_store = IdempotencyStore(
+    db.idempotency_keys,
+    ttl=timedelta(hours=float(os.environ.get("IDEMPOTENCY_TTL_HOURS", 24)))
+)
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Order listing pagination
+ORDERS_PAGE_SIZE = int(os.environ.get("ORDERS_PAGE_SIZE", 50))
+ORDERS_MAX_PAGE_SIZE = 200
+
+# Bulk admin operations: orders per bulk status update, catalog import rows
+# written per bulk_write, and documents per cursor batch of catalog exports
+BULK_MAX_ORDERS = int(os.environ.get("BULK_MAX_ORDERS", 500))
+CATALOG_IMPORT_BATCH_SIZE = int(os.environ.get("CATALOG_IMPORT_BATCH_SIZE", 500))
+CATALOG_EXPORT_BATCH_SIZE = int(os.environ.get("CATALOG_EXPORT_BATCH_SIZE", 500))
+# Row errors listed in an import result; later ones are only counted
+CATALOG_IMPORT_MAX_ERRORS = 100
+# Orders per cursor batch of /admin/orders/export
+ORDERS_EXPORT_BATCH_SIZE = int(os.environ.get("ORDERS_EXPORT_BATCH_SIZE", 500))
+
+# Image storage: "gridfs" keeps blobs in MongoDB, "local" on disk (IMAGE_STORE_PATH)
+IMAGE_STORE_BACKEND = os.environ.get("IMAGE_STORE_BACKEND", "gridfs")
+image_store = create_image_store(db, IMAGE_STORE_BACKEND, os.environ.get("IMAGE_STORE_PATH"))
+MAX_IMAGE_SIZE = 5 * 1024 * 1024
+# Room for multipart boundaries and part headers around the image itself
+MAX_UPLOAD_OVERHEAD = 64 * 1024
+# Image ids never change content, so browsers and CDNs can cache them forever
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Public catalog listings change rarely; browsers reuse them briefly and then
+# revalidate with If-None-Match. The admin view (active_only=false) always revalidates.
+CATALOG_CACHE_CONTROL = os.environ.get("CATALOG_CACHE_CONTROL", "public, max-age=60, stale-while-revalidate=300")
+CATALOG_ADMIN_CACHE_CONTROL = "private, no-cache"
+# Order tracking must reflect status changes at once, so it is always
+# revalidated; an unchanged order costs a 304 instead of the full history
+TRACK_CACHE_CONTROL = os.environ.get("TRACK_CACHE_CONTROL", "public, no-cache")
+# Thumbnails/previews are rendered in a process pool (IMAGE_WORKERS processes)
+image_derivatives = DerivativeCache(
+    db.image_derivatives,
+    image_store,
+    workers=int(os.environ["IMAGE_WORKERS"]) if os.environ.get("IMAGE_WORKERS") else None
+)
+
 # Create the main app
-app = FastAPI(title="LABCEL San Antonio API")
+# Responses are rendered with orjson; hot handlers return FastJSONResponse
+# directly so plain Mongo documents skip jsonable_encoder
+app = FastAPI(title="LABCEL San Antonio API", default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+@app.exception_handler(ExecutionTimeout)
+async def query_timeout_handler(request: Request, exc: ExecutionTimeout):
+    """A read ran past its profile's maxTimeMS"""
+    return FastJSONResponse({"detail": "La consulta tardó demasiado, intenta de nuevo"}, status_code=503)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -94,10 +299,13 @@ class ProductCreate(BaseModel):
 class CartItem(BaseModel):
     product_id: str
     product_name: str
-    quantity: int
-    price: float
+    quantity: int = Field(ge=1)
+    price: float  # informative only, orders are priced from the products collection
     phone_brand: Optional[str] = None
     phone_model: Optional[str] = None
+    # Images are references to uploaded_images; the *_url fields are derived from the ids
+    custom_image_id: Optional[str] = None
+    preview_image_id: Optional[str] = None
     custom_image_url: Optional[str] = None
     preview_image_url: Optional[str] = None
 
@@ -128,14 +336,80 @@ class Order(BaseModel):
     status_history: List[Dict[str, Any]] = []
     design_approved: bool = False
     design_proposal_sent: bool = False
+    stock_reserved: bool = False
     admin_notes: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class OrderSummary(BaseModel):
+    """Order list row returned by GET /orders?view=summary"""
+    order_id: str
+    user_id: Optional[str] = None
+    customer_name: str
+    customer_email: str
+    customer_phone: str
+    customer_whatsapp: Optional[str] = None
+    payment_method: str
+    subtotal: float
+    total: float
+    status: str
+    design_approved: bool = False
+    design_proposal_sent: bool = False
+    item_count: int
+    created_at: datetime
+    updated_at: datetime
+
+class OrderTracking(BaseModel):
+    """Public view of an order returned by GET /orders/track/{order_id}"""
+    order_id: str
+    status: str
+    status_history: List[Dict[str, Any]] = []
+    created_at: datetime
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class OrderSearchFacets(BaseModel):
+    status: List[FacetCount]
+    month: List[FacetCount]
+
+class OrderSearchResult(BaseModel):
+    """Page of GET /admin/orders/search with facet counts for the whole match"""
+    results: List[OrderSummary]
+    total: int
+    next_cursor: Optional[str] = None
+    facets: OrderSearchFacets
+
 class OrderStatusUpdate(BaseModel):
     status: str
     notes: Optional[str] = None
 
+class BulkStatusUpdate(BaseModel):
+    order_ids: List[str] = Field(min_length=1, max_length=BULK_MAX_ORDERS)
+    status: str
+    notes: Optional[str] = None
+
+class BulkStatusResult(BaseModel):
+    """Outcome of POST /admin/orders/bulk-status, by order id"""
+    status: str
+    updated: List[str]
+    unchanged: List[str]  # already had the status
+    not_found: List[str]
+    conflicts: List[str]  # changed by another request meanwhile; retry them
+
+class CatalogImportError(BaseModel):
+    row: int
+    error: str
+
+class CatalogImportResult(BaseModel):
+    """Outcome of POST /admin/catalog/{collection}/import"""
+    rows: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[CatalogImportError]
+
 class Notification(BaseModel):
     notification_id: str = Field(default_factory=lambda: f"notif_{uuid.uuid4().hex[:8]}")
     order_id: str
@@ -143,8 +417,11 @@ class Notification(BaseModel):
     recipient_whatsapp: Optional[str] = None
     notification_type: str  # order_created, status_update, design_proposal
     message: str
-    status: str = "pending"  # pending, sent, failed
+    status: str = "pending"  # pending, processing, sent, failed (dead-lettered)
     channel: str  # email, whatsapp
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    last_error: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     sent_at: Optional[datetime] = None
 
@@ -163,38 +440,99 @@ class Stats(BaseModel):
     orders_today: int
     total_users: int
 
+class AnalyticsTotal(BaseModel):
+    """Sales figures of one key (product, brand, model...) over the whole range"""
+    key: str
+    label: str
+    orders: int
+    units: int
+    revenue: float
+    cancelled: int
+
+class AnalyticsPoint(AnalyticsTotal):
+    """Sales figures of one key in one day/week/month"""
+    period: date
+
+class Analytics(BaseModel):
+    granularity: str
+    dimension: str
+    start: date
+    end: date
+    series: List[AnalyticsPoint]
+    totals: List[AnalyticsTotal]
+
+# ==================== TIMESTAMPS ====================
+
+# Timestamps are written as BSON dates. Documents from before that change hold
+# ISO strings until scripts/migrate_dates.py converts them, so reads accept both.
+
+def stored_datetime(value: Any) -> datetime:
+    """A stored timestamp, date or legacy ISO string, as an aware datetime (naive ones were UTC)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+# strftime formats of the aggregation expression below, by prefix length
+_CREATED_AT_FORMATS = {10: "%Y-%m-%d", 7: "%Y-%m"}
+
+def created_at_prefix(length: int) -> Dict:
+    """Aggregation expression for the "YYYY-MM-DD" (10) or "YYYY-MM" (7) of created_at"""
+    # Strings sort before dates in BSON order, so only legacy strings are below the epoch
+    return {"$cond": [
+        {"$lt": ["$created_at", datetime(1970, 1, 1, tzinfo=timezone.utc)]},
+        {"$substrCP": ["$created_at", 0, length]},
+        {"$dateToString": {"format": _CREATED_AT_FORMATS[length], "date": "$created_at"}}
+    ]}
+
 # ==================== AUTH HELPERS ====================
 
 async def get_session_from_token(session_token: str) -> Optional[Dict]:
     """Get session data from token"""
+    # Expired sessions are filtered by the query (and evicted by the TTL index);
+    # only sessions with a legacy string expires_at are checked here
     session = await db.user_sessions.find_one(
-        {"session_token": session_token},
+        {
+            "session_token": session_token,
+            "$or": [
+                {"expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"expires_at": {"$type": "string"}}
+            ]
+        },
         {"_id": 0}
     )
-    if not session:
-        return None
-    
-    expires_at = session.get("expires_at")
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    if expires_at < datetime.now(timezone.utc):
+    if session and session_seconds_left(session) <= 0:
         return None
-    
     return session
 
-async def get_current_user(request: Request) -> Optional[Dict]:
-    """Get current user from session token in cookie or header"""
+def get_session_token(request: Request) -> Optional[str]:
+    """Session token from the cookie or the Authorization header"""
     session_token = request.cookies.get("session_token")
     if not session_token:
         auth_header = request.headers.get("Authorization")
         if auth_header and auth_header.startswith("Bearer "):
             session_token = auth_header.split(" ")[1]
+    return session_token
+
+def session_seconds_left(session: Dict) -> float:
+    """Seconds until the session expires"""
+    return (stored_datetime(session["expires_at"]) - datetime.now(timezone.utc)).total_seconds()
+
+def invalidate_user_cache(user_id: str) -> None:
+    """Drop cached data about a user after their document changed"""
+    session_cache.invalidate_where(lambda token, user: user["user_id"] == user_id)
+    admin_recipients_cache.clear()
+
+async def get_current_user(request: Request) -> Optional[Dict]:
+    """Get current user from session token in cookie or header"""
+    session_token = get_session_token(request)
     
     if not session_token:
         return None
     
+    user = session_cache.get(session_token)
+    if user is not None:
+        return dict(user)
+    
     session = await get_session_from_token(session_token)
     if not session:
         return None
@@ -203,6 +541,10 @@ async def get_current_user(request: Request) -> Optional[Dict]:
         {"user_id": session["user_id"]},
         {"_id": 0}
     )
+    if user:
+        # Never cache a session past its own expiry
+        session_cache.set(session_token, user, ttl=min(session_cache.ttl, session_seconds_left(session)))
+        user = dict(user)
     return user
 
 async def require_auth(request: Request) -> Dict:
@@ -221,71 +563,99 @@ async def require_admin(request: Request) -> Dict:
 
 # ==================== NOTIFICATION SERVICE ====================
 
-async def send_notification(
+def build_notifications(
     order_id: str,
     notification_type: str,
     message: str,
     recipient_email: Optional[str] = None,
     recipient_whatsapp: Optional[str] = None
-):
-    """Send notification via email and/or WhatsApp (mock for now)"""
+) -> List[Notification]:
+    """Notification records for one recipient, one per available channel"""
     notifications = []
     
     if recipient_email:
-        notif = Notification(
+        notifications.append(Notification(
             order_id=order_id,
             recipient_email=recipient_email,
             notification_type=notification_type,
             message=message,
-            channel="email",
-            status="pending"
-        )
-        
-        # TODO: Integrate with Resend when API key is available
-        # For now, mark as sent (simulated)
-        notif.status = "sent"
-        notif.sent_at = datetime.now(timezone.utc)
-        
-        await db.notifications.insert_one(notif.model_dump())
-        notifications.append(notif)
-        logger.info(f"Email notification queued for {recipient_email}")
+            channel="email"
+        ))
     
     if recipient_whatsapp:
-        notif = Notification(
+        notifications.append(Notification(
             order_id=order_id,
             recipient_whatsapp=recipient_whatsapp,
             notification_type=notification_type,
             message=message,
-            channel="whatsapp",
-            status="pending"
-        )
-        
-        # TODO: Integrate with Twilio when credentials are available
-        # For now, mark as sent (simulated)
-        notif.status = "sent"
-        notif.sent_at = datetime.now(timezone.utc)
-        
-        await db.notifications.insert_one(notif.model_dump())
-        notifications.append(notif)
-        logger.info(f"WhatsApp notification queued for {recipient_whatsapp}")
+            channel="whatsapp"
+        ))
     
     return notifications
 
+async def queue_notifications(notifications: List[Notification]) -> List[Notification]:
+    """Write notifications to the outbox in one round trip and wake the worker"""
+    if notifications:
+        await db.notifications.insert_many([notif.model_dump() for notif in notifications])
+        notification_worker.wake()
+    return notifications
+
+async def send_notification(
+    order_id: str,
+    notification_type: str,
+    message: str,
+    recipient_email: Optional[str] = None,
+    recipient_whatsapp: Optional[str] = None
+):
+    """Queue email and/or WhatsApp notifications in the outbox"""
+    return await queue_notifications(
+        build_notifications(order_id, notification_type, message, recipient_email, recipient_whatsapp)
+    )
+
+ORDER_STATUS_MESSAGES = {
+    "confirmado": "Tu pedido ha sido confirmado. Estamos preparando tu diseño.",
+    "en_proceso": "Tu pedido está en proceso de fabricación.",
+    "enviado": "¡Tu pedido ha sido enviado! Pronto lo recibirás.",
+    "entregado": "Tu pedido ha sido entregado. ¡Gracias por tu compra!",
+    "cancelado": "Tu pedido ha sido cancelado. Contáctanos si tienes dudas."
+}
+
+def status_update_notifications(order: Dict, status: str) -> List[Notification]:
+    """Customer notifications telling that an order moved to status"""
+    message = ORDER_STATUS_MESSAGES.get(status, f"Tu pedido ha sido actualizado: {status}")
+    return build_notifications(
+        order["order_id"],
+        "status_update",
+        f"Pedido #{order['order_id']}\n{message}",
+        order.get("customer_email"),
+        order.get("customer_whatsapp")
+    )
+
+async def get_admin_recipients() -> List[Dict]:
+    """Contact details of all admins, cached until a role or contact changes"""
+    admins = admin_recipients_cache.get("admins")
+    if admins is None:
+        admins = await db.users.find(
+            {"role": "admin"},
+            {"_id": 0, "user_id": 1, "email": 1, "whatsapp_number": 1}
+        ).to_list(100)
+        admin_recipients_cache.set("admins", admins)
+    return admins
+
 async def notify_admins(order: Dict, notification_type: str, message: str):
-    """Notify all admins about an order"""
-    admins = await db.users.find(
-        {"role": "admin"},
-        {"_id": 0}
-    ).to_list(100)
+    """Notify all admins about an order with a single outbox write"""
+    admins = await get_admin_recipients()
     
+    notifications = []
     for admin in admins:
-        await send_notification(
+        notifications.extend(build_notifications(
             order_id=order["order_id"],
             notification_type=notification_type,
             message=message,
             recipient_email=admin.get("email"),
             recipient_whatsapp=admin.get("whatsapp_number")
-        )
+        ))
+    return await queue_notifications(notifications)
 
 # ==================== AUTH ROUTES ====================
 
@@ -299,17 +669,30 @@ async def exchange_session(request: Request):
     if not session_id:
         raise HTTPException(status_code=400, detail="session_id requerido")
     
-    # Exchange session_id with Emergent Auth
-    async with httpx.AsyncClient() as http_client:
-        response = await http_client.get(
-            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-            headers={"X-Session-ID": session_id}
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=401, detail="Sesión inválida")
-        
-        auth_data = response.json()
+    # Exchange session_id with Emergent Auth over the shared, pooled client;
+    # fail fast while the circuit breaker considers the upstream down
+    try:
+        with auth_breaker.guard():
+            try:
+                response = await get_http_client().get(
+                    "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
+                    headers={"X-Session-ID": session_id}
+                )
+                auth_data = response.json() if response.status_code == 200 else None
+            except (httpx.HTTPError, ValueError) as e:
+                auth_breaker.record_failure()
+                logger.warning(f"Auth session exchange failed: {e!r}")
+                raise HTTPException(status_code=503, detail="Servicio de autenticación no disponible")
+            
+            if response.status_code >= 500:
+                auth_breaker.record_failure()
+                raise HTTPException(status_code=503, detail="Servicio de autenticación no disponible")
+            auth_breaker.record_success()
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Servicio de autenticación no disponible")
+    
+    if response.status_code != 200 or not isinstance(auth_data, dict):
+        raise HTTPException(status_code=401, detail="Sesión inválida")
     
     user_id = f"user_{uuid.uuid4().hex[:12]}"
     email = auth_data.get("email")
@@ -325,9 +708,10 @@ async def exchange_session(request: Request):
             {"$set": {
                 "name": auth_data.get("name"),
                 "picture": auth_data.get("picture"),
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": datetime.now(timezone.utc)
             }}
         )
+        invalidate_user_cache(user_id)
     else:
         # Create new user
         new_user = {
@@ -336,7 +720,7 @@ async def exchange_session(request: Request):
             "name": auth_data.get("name"),
             "picture": auth_data.get("picture"),
             "role": "customer",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         await db.users.insert_one(new_user)
     
@@ -347,8 +731,8 @@ async def exchange_session(request: Request):
     await db.user_sessions.insert_one({
         "user_id": user_id,
         "session_token": session_token,
-        "expires_at": expires_at.isoformat(),
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "expires_at": expires_at,
+        "created_at": datetime.now(timezone.utc)
     })
     
     # Get user data
@@ -361,7 +745,7 @@ async def exchange_session(request: Request):
     # cookie once according to environment. Previously the response was
     # overwritten and an always-secure cookie was forced, which prevents
     # the cookie from being set during local HTTP development.
-    response = JSONResponse(content=user_with_token)
+    response = FastJSONResponse(content=user_with_token)
 
     if IS_DEVELOPMENT:
         # Development: allow non-HTTPS, use lax samesite so browser accepts cookie
@@ -399,8 +783,9 @@ async def get_me(request: Request):
 @api_router.post("/auth/logout")
 async def logout(request: Request):
     """Logout user"""
-    session_token = request.cookies.get("session_token")
+    session_token = get_session_token(request)
     if session_token:
+        session_cache.invalidate(session_token)
         await db.user_sessions.delete_one({"session_token": session_token})
     
     response = JSONResponse(content={"message": "Sesión cerrada"})
@@ -409,12 +794,12 @@ async def logout(request: Request):
 
 # ==================== USER ROUTES ====================
 
-@api_router.get("/users", response_model=List[Dict])
+@api_router.get("/users", response_model=List[User])
 async def get_users(request: Request):
     """Get all users (admin only)"""
     await require_admin(request)
     users = await db.users.find({}, {"_id": 0}).to_list(1000)
-    return users
+    return FastJSONResponse(users)
 
 @api_router.put("/users/{user_id}")
 async def update_user(user_id: str, update: UserUpdate, request: Request):
@@ -425,7 +810,7 @@ async def update_user(user_id: str, update: UserUpdate, request: Request):
     if not update_data:
         raise HTTPException(status_code=400, detail="No hay datos para actualizar")
     
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
     result = await db.users.update_one(
         {"user_id": user_id},
@@ -435,6 +820,7 @@ async def update_user(user_id: str, update: UserUpdate, request: Request):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
+    invalidate_user_cache(user_id)
     user = await db.users.find_one({"user_id": user_id}, {"_id": 0})
     return user
 
@@ -450,66 +836,165 @@ async def update_user_role(user_id: str, request: Request):
     
     result = await db.users.update_one(
         {"user_id": user_id},
-        {"$set": {"role": new_role, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"role": new_role, "updated_at": datetime.now(timezone.utc)}}
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
+    invalidate_user_cache(user_id)
     return {"message": f"Rol actualizado a {new_role}"}
 
+# ==================== CATALOG CACHE ====================
+
+async def cached_catalog_response(
+    request: Request, collection: str, key: Any, loader, cache_control: str = CATALOG_CACHE_CONTROL
+) -> Response:
+    """Serve a catalog listing from the cache, loading and serializing it on a miss
+    
+    loader gets the database to read from (see catalog_reads).
+    """
+    cached = await cached_catalog_body(collection, key, loader)
+    return conditional_json_response(request, cached.body, cached.etag, cache_control)
+
+async def cached_catalog_body(collection: str, key: Any, loader) -> CachedBody:
+    """The serialized listing from the cache, loaded on a miss"""
+    cached = catalog_cache.get(collection, key)
+    if cached is None:
+        version = catalog_cache.version(collection)
+        cached = catalog_cache.set(collection, key, dump_json(await loader(catalog_reads(collection))), version)
+    return cached
+
+def catalog_reads(collection: str) -> ProfiledDatabase:
+    """Catalog read profile, or the primary while a recent write to collection may not have replicated"""
+    if catalog_cache.changed_within(collection, READ_YOUR_WRITES_SECONDS):
+        return read_profiles.profile("strong")
+    return read_profiles("catalog")
+
+async def find_one_confirmed(reads: ProfiledDatabase, collection: str, query: Dict, projection: Dict) -> Optional[Dict]:
+    """find_one through a read profile; a miss is checked on the primary, as
+    the document may be too new for a secondary"""
+    document = await reads[collection].find_one(query, projection)
+    if document is None and reads is not read_profiles.profile("strong"):
+        document = await read_profiles.profile("strong")[collection].find_one(query, projection)
+    return document
+
+def conditional_json_response(request: Request, body: bytes, etag: str, cache_control: str) -> Response:
+    """JSON body with validators, or 304 when the client already holds this version"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def stock_only_change(change: Dict) -> bool:
+    """Whether a change event only moved product stock, which cached listings leave out"""
+    update = change.get("updateDescription") or {}
+    return (
+        change.get("operationType") == "update"
+        and not update.get("removedFields")
+        and set(update.get("updatedFields", {})) <= {"stock"}
+    )
+
+async def watch_catalog_changes():
+    """Invalidate the catalog cache on writes made by any worker (needs a replica set)"""
+    pipeline = [{"$match": {"ns.coll": {"$in": list(CATALOG_COLLECTIONS)}}}]
+    delay = 1
+    while True:
+        try:
+            async with db.watch(pipeline) as stream:
+                # Writes may have happened while we were not listening
+                catalog_cache.clear()
+                delay = 1
+                async for change in stream:
+                    if not stock_only_change(change):
+                        catalog_cache.invalidate(change["ns"]["coll"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Catalog change stream interrupted, retrying in {delay}s: {e}")
+            catalog_cache.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
 # ==================== PHONE BRANDS & MODELS ====================
 
-@api_router.get("/phone-brands")
-async def get_phone_brands():
+@api_router.get("/phone-brands", response_model=List[PhoneBrand])
+async def get_phone_brands(request: Request):
     """Get all phone brands"""
-    brands = await db.phone_brands.find({}, {"_id": 0}).to_list(100)
-    return brands
+    async def load(reads):
+        return await reads.phone_brands.find({}, {"_id": 0}).to_list(100)
+    return await cached_catalog_response(request, "phone_brands", None, load)
 
 @api_router.post("/phone-brands")
 async def create_phone_brand(brand: PhoneBrand, request: Request):
     """Create phone brand (admin only)"""
     await require_admin(request)
     await db.phone_brands.insert_one(brand.model_dump())
+    catalog_cache.invalidate("phone_brands")
     return brand
 
-@api_router.get("/phone-models")
-async def get_phone_models(brand_id: Optional[str] = None):
+@api_router.get("/phone-models", response_model=List[PhoneModel])
+async def get_phone_models(request: Request, brand_id: Optional[str] = None):
     """Get phone models, optionally filtered by brand"""
     query = {}
     if brand_id:
         query["brand_id"] = brand_id
-    models = await db.phone_models.find(query, {"_id": 0}).to_list(500)
-    return models
+    
+    async def load(reads):
+        return await reads.phone_models.find(query, {"_id": 0}).to_list(500)
+    return await cached_catalog_response(request, "phone_models", brand_id, load)
 
 @api_router.post("/phone-models")
 async def create_phone_model(model: PhoneModel, request: Request):
     """Create phone model (admin only)"""
     await require_admin(request)
     await db.phone_models.insert_one(model.model_dump())
+    catalog_cache.invalidate("phone_models")
     return model
 
 # ==================== PRODUCT ROUTES ====================
 
-@api_router.get("/products")
-async def get_products(category: Optional[str] = None, active_only: bool = True):
-    """Get all products"""
+# Listings are cached per catalog version, and orders must not bump it: stock
+# changes with every order, so it is left out of them (see get_products)
+PRODUCT_LISTING_PROJECTION = {"_id": 0, "stock": 0}
+
+@api_router.get("/products", response_model=List[Product])
+async def get_products(request: Request, category: Optional[str] = None, active_only: bool = True):
+    """Get all products
+    
+    The public listing leaves stock out so orders do not invalidate it; the
+    admin view (active_only=false) includes the current stock.
+    """
     query = {}
     if active_only:
         query["is_active"] = True
     if category:
         query["category"] = category
     
-    products = await db.products.find(query, {"_id": 0}).to_list(500)
-    return products
+    async def load(reads):
+        return await reads.products.find(query, PRODUCT_LISTING_PROJECTION).to_list(500)
+    if active_only:
+        return await cached_catalog_response(request, "products", (category, active_only), load)
+    
+    # The admin view shows stock, read live and merged into the cached listing
+    cached = await cached_catalog_body("products", (category, active_only), load)
+    products = orjson.loads(cached.body)
+    stock = {
+        product["product_id"]: product.get("stock")
+        for product in await db.products.find(query, {"_id": 0, "product_id": 1, "stock": 1}).to_list(500)
+    }
+    for product in products:
+        product["stock"] = stock.get(product["product_id"])
+    body = dump_json(products)
+    return conditional_json_response(request, body, body_etag(body), CATALOG_ADMIN_CACHE_CONTROL)
 
-@api_router.get("/products/{product_id}")
+@api_router.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
     """Get single product"""
-    product = await db.products.find_one({"product_id": product_id}, {"_id": 0})
+    product = await find_one_confirmed(catalog_reads("products"), "products", {"product_id": product_id}, {"_id": 0})
     if not product:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    return product
+    return FastJSONResponse(product)
 
 @api_router.post("/products")
 async def create_product(product: ProductCreate, request: Request):
@@ -518,6 +1003,7 @@ async def create_product(product: ProductCreate, request: Request):
     
     new_product = Product(**product.model_dump())
     await db.products.insert_one(new_product.model_dump())
+    catalog_cache.invalidate("products")
     return new_product
 
 @api_router.put("/products/{product_id}")
@@ -526,7 +1012,7 @@ async def update_product(product_id: str, request: Request):
     await require_admin(request)
     body = await request.json()
     
-    body["updated_at"] = datetime.now(timezone.utc).isoformat()
+    body["updated_at"] = datetime.now(timezone.utc)
     
     result = await db.products.update_one(
         {"product_id": product_id},
@@ -536,6 +1022,7 @@ async def update_product(product_id: str, request: Request):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
+    catalog_cache.invalidate("products")
     product = await db.products.find_one({"product_id": product_id}, {"_id": 0})
     return product
 
@@ -551,23 +1038,472 @@ async def delete_product(product_id: str, request: Request):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     
+    catalog_cache.invalidate("products")
     return {"message": "Producto eliminado"}
 
+# ==================== CATALOG IMPORT & EXPORT ====================
+
+# Model validating the documents of each catalog collection and their id field
+CATALOG_MODELS: Dict[str, Tuple[type, str]] = {
+    "phone_brands": (PhoneBrand, "brand_id"),
+    "phone_models": (PhoneModel, "model_id"),
+    "products": (Product, "product_id"),
+}
+
+def catalog_model(collection: str) -> Tuple[type, str]:
+    if collection not in CATALOG_MODELS:
+        raise HTTPException(status_code=404, detail="Colección no encontrada")
+    return CATALOG_MODELS[collection]
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc'])) or 'fila'}: {item['msg']}" for item in error.errors())
+
+def catalog_upsert(document: BaseModel, id_field: str) -> UpdateOne:
+    """Upsert on the id field that only overwrites the fields the row gave"""
+    values = document.model_dump()
+    given = document.model_fields_set - {id_field}
+    update = {}
+    if given:
+        update["$set"] = {field: values[field] for field in given}
+    defaults = {field: value for field, value in values.items() if field not in given and field != id_field}
+    if defaults:
+        update["$setOnInsert"] = defaults
+    return UpdateOne({id_field: values[id_field]}, update, upsert=True)
+
+@api_router.get("/admin/catalog/{collection}/export")
+async def export_catalog(
+    collection: str,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """Stream phone_brands, phone_models or products as CSV or NDJSON (admin only)"""
+    await require_admin(request)
+    model, id_field = catalog_model(collection)
+    
+    cursor = db[collection].find({}, {"_id": 0}).sort(id_field, ASCENDING).batch_size(CATALOG_EXPORT_BATCH_SIZE)
+    return StreamingResponse(
+        encode_rows(cursor, format, list(model.model_fields)),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{collection}.{format}"',
+            "Cache-Control": "no-store"
+        }
+    )
+
+@api_router.post("/admin/catalog/{collection}/import", response_model=CatalogImportResult)
+async def import_catalog(
+    collection: str,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """Create or update catalog documents from a CSV or NDJSON body (admin only)
+    
+    The body is read as it streams in; every row is validated with the
+    collection's model and upserted on its id field, CATALOG_IMPORT_BATCH_SIZE
+    rows per bulk_write. Rows without an id create new documents, and only
+    the columns a row has are written over an existing document. Invalid rows
+    are skipped and reported with their row number (the CSV header is not
+    counted), so exports can be edited and imported back.
+    """
+    await require_admin(request)
+    model, id_field = catalog_model(collection)
+    
+    result = {"rows": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    batch: List[UpdateOne] = []
+    batch_rows: List[int] = []
+    
+    def fail(row: int, error: str):
+        result["failed"] += 1
+        if len(result["errors"]) < CATALOG_IMPORT_MAX_ERRORS:
+            result["errors"].append({"row": row, "error": error})
+    
+    async def flush():
+        try:
+            written = (await db[collection].bulk_write(batch, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            written = e.details
+            for write_error in written["writeErrors"]:
+                fail(batch_rows[write_error["index"]], write_error["errmsg"])
+        result["inserted"] += written["nUpserted"]
+        result["updated"] += written["nModified"]
+        batch.clear()
+        batch_rows.clear()
+    
+    try:
+        async for row, values in decode_rows(request.stream(), format):
+            result["rows"] += 1
+            if isinstance(values, ValueError):
+                fail(row, str(values))
+                continue
+            try:
+                document = model.model_validate(values)
+            except ValidationError as e:
+                fail(row, validation_message(e))
+                continue
+            batch.append(catalog_upsert(document, id_field))
+            batch_rows.append(row)
+            if len(batch) >= CATALOG_IMPORT_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+    except RecordTooLarge:
+        raise HTTPException(status_code=413, detail="Registro demasiado grande")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if result["inserted"] or result["updated"]:
+            catalog_cache.invalidate(collection)
+    
+    result["errors"].sort(key=lambda error: error["row"])
+    return result
+
+# ==================== IMAGE HELPERS ====================
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches etag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def image_url(image_id: str) -> str:
+    """Public URL path for an uploaded image"""
+    return f"/api/upload/image/{image_id}"
+
+async def migrate_legacy_image(image: Dict) -> Dict:
+    """Move an inline base64 image document into the image store"""
+    legacy = await db.uploaded_images.find_one({"image_id": image["image_id"]}, {"_id": 0, "data": 1})
+    try:
+        content = base64.b64decode(legacy.get("data") or "")
+    except binascii.Error:
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    
+    digest = await image_store.save(content)
+    await db.uploaded_images.update_one(
+        {"image_id": image["image_id"]},
+        {"$set": {"sha256": digest, "size": len(content)}, "$unset": {"data": ""}}
+    )
+    return {**image, "sha256": digest, "size": len(content)}
+
+def parse_data_url(data_url: str) -> tuple:
+    """Split a base64 data URL into (content_type, bytes)"""
+    header, _, payload = data_url.partition(",")
+    if not header.startswith("data:") or not header.endswith(";base64"):
+        raise ValueError("Not a base64 data URL")
+    content_type = header[len("data:"):-len(";base64")] or "application/octet-stream"
+    return content_type, base64.b64decode(payload)
+
+async def store_data_url(data_url: str, filename: Optional[str] = None) -> str:
+    """Move an inline data URL into the image store and return its image_id"""
+    _, content = parse_data_url(data_url)
+    content_type = sniff_image_type(content)
+    if not content_type or len(content) > MAX_IMAGE_SIZE:
+        raise ValueError("Not an acceptable image")
+    digest = await image_store.save(content)
+    image_id = f"img_{uuid.uuid4().hex[:12]}"
+    await db.uploaded_images.insert_one({
+        "image_id": image_id,
+        "filename": filename,
+        "content_type": content_type,
+        "sha256": digest,
+        "size": len(content),
+        "created_at": datetime.now(timezone.utc)
+    })
+    return image_id
+
+async def resolve_item_images(items: List[Dict]) -> List[Dict]:
+    """Replace inline data URLs and bare ids in cart items with image store references"""
+    # The preview usually is the same data URL as the custom image, store it once
+    stored: Dict[str, str] = {}
+    for item in items:
+        for kind in ("custom", "preview"):
+            id_key, url_key = f"{kind}_image_id", f"{kind}_image_url"
+            url = item.get(url_key)
+            if not item.get(id_key) and url:
+                if url.startswith("data:"):
+                    if url not in stored:
+                        stored[url] = await store_data_url(url, f"{kind}.img")
+                    item[id_key] = stored[url]
+                elif url.startswith("img_"):
+                    # Older clients sent the bare image_id in custom_image_url
+                    item[id_key] = url
+            if item.get(id_key):
+                item[url_key] = image_url(item[id_key])
+    return items
+
+# ==================== PRICING & STOCK ====================
+
+class InsufficientStock(Exception):
+    """A product does not have enough stock left for an order"""
+    def __init__(self, product_id: str):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+async def supports_transactions() -> bool:
+    """Whether the MongoDB deployment is a replica set or sharded cluster"""
+    global transactions_supported
+    if transactions_supported is None:
+        if ORDER_TRANSACTIONS == "off":
+            transactions_supported = False
+        else:
+            hello = await client.admin.command("hello")
+            transactions_supported = bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+    return transactions_supported
+
+async def price_order_items(items: List[Dict]) -> Dict[str, Dict]:
+    """Price items from the products collection with a single $in lookup"""
+    product_ids = list({item["product_id"] for item in items})
+    products = await db.products.find(
+        {"product_id": {"$in": product_ids}, "is_active": True},
+        {"_id": 0, "product_id": 1, "name": 1, "price": 1}
+    ).to_list(len(product_ids))
+    products_by_id = {product["product_id"]: product for product in products}
+    
+    for item in items:
+        product = products_by_id.get(item["product_id"])
+        if not product:
+            raise HTTPException(status_code=400, detail=f"Producto no disponible: {item['product_id']}")
+        item["price"] = product["price"]
+        item["product_name"] = product["name"]
+    return products_by_id
+
+def order_quantities(items: List[Dict]) -> Dict[str, int]:
+    """Total quantity per product across an order's items"""
+    quantities: Dict[str, int] = {}
+    for item in items:
+        quantities[item["product_id"]] = quantities.get(item["product_id"], 0) + item["quantity"]
+    return quantities
+
+async def release_stock(quantities: Dict[str, int], session=None):
+    """Give reserved units back to their products"""
+    if quantities:
+        await db.products.bulk_write([
+            UpdateOne({"product_id": product_id}, {"$inc": {"stock": quantity}})
+            for product_id, quantity in quantities.items()
+        ], ordered=False, session=session)
+
+async def reserve_stock(quantities: Dict[str, int], session=None):
+    """Take units from stock with conditional updates; never lets stock go negative.
+    
+    Outside a transaction, reservations already made are compensated when a
+    later product runs short.
+    """
+    reserved: Dict[str, int] = {}
+    # Always reserve in the same order so concurrent transactions conflict early
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        result = await db.products.update_one(
+            {"product_id": product_id, "stock": {"$gte": quantity}},
+            {"$inc": {"stock": -quantity}},
+            session=session
+        )
+        if result.modified_count == 0:
+            if session is None:
+                await release_stock(reserved)
+            raise InsufficientStock(product_id)
+        reserved[product_id] = quantity
+
+async def insert_order_reserving_stock(order_dict: Dict, quantities: Dict[str, int]):
+    """Reserve stock and insert the order atomically, or not at all"""
+    if await supports_transactions():
+        async def reserve_and_insert(session):
+            await reserve_stock(quantities, session=session)
+            await db.orders.insert_one(order_dict, session=session)
+        
+        async with await client.start_session() as session:
+            await session.with_transaction(reserve_and_insert)
+        return
+    
+    await reserve_stock(quantities)
+    try:
+        await db.orders.insert_one(order_dict)
+    except Exception:
+        await release_stock(quantities)
+        raise
+
+async def release_order_stock(order_id: str, items: List[Dict]):
+    """Return a cancelled order's units to stock exactly once"""
+    result = await db.orders.update_one(
+        {"order_id": order_id, "stock_reserved": True},
+        {"$set": {"stock_reserved": False}}
+    )
+    if result.modified_count:
+        await release_stock(order_quantities(items))
+
+# ==================== ORDER COUNTERS ====================
+
+def order_day(created_at: Union[datetime, str]) -> str:
+    """UTC calendar day (YYYY-MM-DD) of an order's created_at"""
+    return stored_datetime(created_at).astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+async def count_order_created(order: Dict):
+    """Add a new order to the materialized counters"""
+    if STATS_MODE != "counters":
+        return
+    revenue = order["total"] if order["status"] != "cancelado" else 0
+    await db.order_counters.bulk_write([
+        UpdateOne(
+            {"_id": "totals"},
+            {"$inc": {"orders": 1, "revenue": revenue, f"status.{order['status']}": 1}},
+            upsert=True
+        ),
+        UpdateOne(
+            {"_id": f"day:{order_day(order['created_at'])}"},
+            {"$inc": {"orders": 1, "revenue": revenue}},
+            upsert=True
+        ),
+    ], ordered=False)
+
+async def count_order_status_change(order: Dict, new_status: str):
+    """Move an order between status counters; order holds its previous status"""
+    if STATS_MODE != "counters":
+        return
+    updates = order_status_counter_updates(order, new_status)
+    if updates:
+        await db.order_counters.bulk_write(updates, ordered=False)
+
+def order_status_counter_updates(order: Dict, new_status: str) -> List[UpdateOne]:
+    """Counter increments moving an order from its current status to new_status"""
+    old_status = order.get("status")
+    if old_status == new_status:
+        return []
+    revenue = 0
+    if new_status == "cancelado":
+        revenue = -order.get("total", 0)
+    elif old_status == "cancelado":
+        revenue = order.get("total", 0)
+    
+    updates = [UpdateOne(
+        {"_id": "totals"},
+        {"$inc": {f"status.{old_status}": -1, f"status.{new_status}": 1, "revenue": revenue}},
+        upsert=True
+    )]
+    if revenue:
+        updates.append(UpdateOne(
+            {"_id": f"day:{order_day(order['created_at'])}"},
+            {"$inc": {"revenue": revenue}},
+            upsert=True
+        ))
+    return updates
+
+async def rebuild_order_counters() -> Dict:
+    """Recompute the materialized counters from the orders collection"""
+    revenue = {"$sum": {"$cond": [{"$ne": ["$status", "cancelado"]}, "$total", 0]}}
+    result = await db.orders.aggregate([
+        {"$facet": {
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}, "revenue": revenue}}],
+            "by_day": [{"$group": {
+                "_id": created_at_prefix(10),
+                "count": {"$sum": 1},
+                "revenue": revenue
+            }}]
+        }}
+    ]).to_list(1)
+    facets = result[0] if result else {"by_status": [], "by_day": []}
+    
+    totals = {
+        "_id": "totals",
+        "orders": sum(group["count"] for group in facets["by_status"]),
+        "revenue": sum(group["revenue"] for group in facets["by_status"]),
+        "status": {group["_id"]: group["count"] for group in facets["by_status"] if group["_id"]}
+    }
+    await db.order_counters.delete_many({})
+    await db.order_counters.insert_many([totals] + [
+        {"_id": f"day:{group['_id']}", "orders": group["count"], "revenue": group["revenue"]}
+        for group in facets["by_day"]
+    ])
+    return totals
+
+# ==================== IDEMPOTENCY ====================
+
+async def run_idempotent(request: Request, scope: str, owner: Optional[str], request_fingerprint: Optional[str], handler):
+    """Run handler once per Idempotency-Key; retries replay the stored response.
+    
+    Responses (including 4xx errors) are stored; unexpected failures release
+    the key so the client can retry.
+    """
+    key = request.headers.get("Idempotency-Key")
+    if not key:
+        return await handler()
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key inválida")
+    
+    record_id = IdempotencyStore.record_id(scope, owner, key)
+    try:
+        stored = await idempotency_store.begin(record_id, request_fingerprint)
+    except IdempotencyMismatch:
+        raise HTTPException(status_code=422, detail="Idempotency-Key ya usada con otra solicitud")
+    except IdempotencyInProgress:
+        raise HTTPException(status_code=409, detail="La solicitud original todavía está en proceso")
+    if stored is not None:
+        return JSONResponse(
+            status_code=stored["status_code"],
+            content=stored["body"],
+            headers={"Idempotent-Replayed": "true"}
+        )
+    
+    try:
+        result = await handler()
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await idempotency_store.abandon(record_id)
+        else:
+            await idempotency_store.complete(record_id, e.status_code, {"detail": e.detail})
+        raise
+    except BaseException:
+        await idempotency_store.abandon(record_id)
+        raise
+    await idempotency_store.complete(record_id, 200, jsonable_encoder(result))
+    return result
+
+async def after_commit(step: str, target: str, effect: Awaitable) -> None:
+    """Await a side effect of an order write that is already stored; failures are logged, not raised"""
+    try:
+        await effect
+    except Exception as e:
+        logger.exception(f"{step} failed for {target}: {e}")
+
 # ==================== ORDER ROUTES ====================
 
 @api_router.post("/orders")
-async def create_order(order_data: OrderCreate, background_tasks: BackgroundTasks, request: Request):
-    """Create new order"""
+async def create_order(order_data: OrderCreate, request: Request):
+    """Create new order; send an Idempotency-Key header to make retries safe"""
     user = await get_current_user(request)
+    request_fingerprint = fingerprint(json.dumps(order_data.model_dump(mode="json"), sort_keys=True).encode())
+    return await run_idempotent(
+        request,
+        "orders",
+        user["user_id"] if user else None,
+        request_fingerprint,
+        lambda: place_order(order_data, user)
+    )
+
+async def place_order(order_data: OrderCreate, user: Optional[Dict]) -> Dict:
+    """Price, store and announce a new order"""
+    # Orders only keep references to images, never the image data itself
+    try:
+        items = await resolve_item_images([item.model_dump() for item in order_data.items])
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Imagen inválida")
+    
+    image_ids = {item[key] for item in items for key in ("custom_image_id", "preview_image_id") if item.get(key)}
+    if image_ids:
+        found = await db.uploaded_images.count_documents({"image_id": {"$in": list(image_ids)}})
+        if found != len(image_ids):
+            raise HTTPException(status_code=400, detail="Imagen no encontrada")
+    
+    # Prices come from the catalog, never from the client
+    await price_order_items(items)
     
     # Calculate totals
-    subtotal = sum(item.price * item.quantity for item in order_data.items)
+    subtotal = sum(item["price"] * item["quantity"] for item in items)
     total = subtotal  # No shipping fee for now
     
     # Create order
     order = Order(
         user_id=user["user_id"] if user else None,
-        items=[item.model_dump() for item in order_data.items],
+        items=items,
         customer_name=order_data.customer_name,
         customer_email=order_data.customer_email,
         customer_phone=order_data.customer_phone,
@@ -577,42 +1513,130 @@ async def create_order(order_data: OrderCreate, background_tasks: BackgroundTask
         notes=order_data.notes,
         subtotal=subtotal,
         total=total,
+        stock_reserved=True,
         status_history=[{
             "status": "pendiente",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": datetime.now(timezone.utc),
             "notes": "Pedido creado"
         }]
     )
     
     order_dict = order.model_dump()
-    order_dict["created_at"] = order_dict["created_at"].isoformat()
-    order_dict["updated_at"] = order_dict["updated_at"].isoformat()
-    
-    await db.orders.insert_one(order_dict)
-    
-    # Notify admins in background
-    background_tasks.add_task(
-        notify_admins,
+    order_dict["search_terms"] = order_search_terms(order_dict)
+    
+    try:
+        await insert_order_reserving_stock(order_dict, order_quantities(items))
+    except InsufficientStock as e:
+        product_name = next(item["product_name"] for item in items if item["product_id"] == e.product_id)
+        raise HTTPException(status_code=409, detail=f"Stock insuficiente para {product_name}")
+    order_dict.pop("_id", None)
+    
+    # The order is stored: from here on a failure must not fail the request,
+    # or a retry with the same Idempotency-Key would place it a second time
+    await after_commit("order counters", f"order {order.order_id}", count_order_created(order_dict))
+    if ANALYTICS_MODE == "inline":
+        await sales_rollups.record_order(order_dict)
+    await after_commit("order event", f"order {order.order_id}", order_events.publish("order_created", order.order_id, order.status))
+    
+    # Queue notifications in the outbox; delivery happens in the notification worker
+    await after_commit("admin notifications", f"order {order.order_id}", notify_admins(
         order_dict,
         "order_created",
         f"Nuevo pedido #{order.order_id}\nCliente: {order.customer_name}\nTotal: ${total:.2f}\nProductos: {len(order_data.items)}"
-    )
+    ))
     
     # Notify customer
-    background_tasks.add_task(
-        send_notification,
+    await after_commit("customer notification", f"order {order.order_id}", send_notification(
         order.order_id,
         "order_created",
         f"¡Gracias por tu pedido #{order.order_id}!\nTotal: ${total:.2f}\nTe contactaremos pronto para confirmar tu diseño.",
         order.customer_email,
         order.customer_whatsapp
-    )
+    ))
     
     return {"order_id": order.order_id, "total": total, "status": order.status}
 
-@api_router.get("/orders")
-async def get_orders(request: Request, status: Optional[str] = None):
-    """Get orders (admin gets all, user gets their own)"""
+# Full orders as returned by the API; search_terms only serve the admin search index
+ORDER_PROJECTION = {"_id": 0, "search_terms": 0}
+
+# Orders as exported for accounting: without image references, data URLs
+# (orders not migrated yet still embed them) or search terms
+ORDER_EXPORT_PROJECTION = {
+    "_id": 0,
+    "search_terms": 0,
+    "design_proposal_image": 0,
+    "items.custom_image_id": 0,
+    "items.preview_image_id": 0,
+    "items.custom_image_url": 0,
+    "items.preview_image_url": 0,
+}
+ORDER_EXPORT_CSV_FIELDS = [
+    "order_id", "created_at", "updated_at", "status", "user_id",
+    "customer_name", "customer_email", "customer_phone", "customer_whatsapp", "shipping_address",
+    "payment_method", "item_count", "units", "items", "subtotal", "total", "notes", "admin_notes",
+]
+
+# Columns needed by order list views; items are reduced to their count
+ORDER_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "order_id": 1,
+    "user_id": 1,
+    "customer_name": 1,
+    "customer_email": 1,
+    "customer_phone": 1,
+    "customer_whatsapp": 1,
+    "payment_method": 1,
+    "subtotal": 1,
+    "total": 1,
+    "status": 1,
+    "design_approved": 1,
+    "design_proposal_sent": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "item_count": {"$size": {"$ifNull": ["$items", []]}}
+}
+
+def encode_order_cursor(order: Dict) -> str:
+    """Opaque keyset cursor pointing after the given order"""
+    created_at = order["created_at"]
+    legacy = isinstance(created_at, str)
+    raw = json.dumps([created_at if legacy else created_at.isoformat(), order["order_id"], legacy])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_order_cursor(cursor: str) -> Dict:
+    """Query matching the orders that come after the cursor (created_at, order_id desc)"""
+    try:
+        created_at, order_id, *legacy = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        legacy = bool(legacy and legacy[0])
+        if not legacy:
+            created_at = datetime.fromisoformat(created_at)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    after = [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "order_id": {"$lt": order_id}}
+    ]
+    if not legacy:
+        # Comparisons only match values of the same BSON type; unmigrated
+        # string dates sort after every date in descending order
+        after.append({"created_at": {"$type": "string"}})
+    return {"$or": after}
+
+@api_router.get("/orders", response_model=Union[List[Order], List[OrderSummary]])
+async def get_orders(
+    request: Request,
+    status: Optional[str] = None,
+    limit: int = Query(ORDERS_PAGE_SIZE, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    include_total: bool = True
+):
+    """Get a page of orders (admin gets all, user gets their own).
+    
+    Pages are keyset-paginated on (created_at, order_id); the cursor for the
+    next page is returned in X-Next-Cursor and the filtered count in
+    X-Total-Count unless include_total=false.
+    """
     user = await get_current_user(request)
     
     if not user:
@@ -625,15 +1649,176 @@ async def get_orders(request: Request, status: Optional[str] = None):
     if status:
         query["status"] = status
     
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(500)
-    return orders
+    page_query = {"$and": [query, decode_order_cursor(cursor)]} if cursor else query
+    sort = [("created_at", -1), ("order_id", -1)]
+    
+    # Fetch one extra document to know whether there is a next page
+    if view == "summary":
+        orders = await db.orders.aggregate([
+            {"$match": page_query},
+            {"$sort": dict(sort)},
+            {"$limit": limit + 1},
+            {"$project": ORDER_SUMMARY_PROJECTION}
+        ]).to_list(limit + 1)
+    else:
+        orders = await db.orders.find(page_query, ORDER_PROJECTION).sort(sort).limit(limit + 1).to_list(limit + 1)
+    
+    headers = {}
+    if len(orders) > limit:
+        orders = orders[:limit]
+        headers["X-Next-Cursor"] = encode_order_cursor(orders[-1])
+    if include_total:
+        headers["X-Total-Count"] = str(await db.orders.count_documents(query))
+    
+    return FastJSONResponse(orders, headers=headers)
+
+def created_at_range(start: Optional[date], end: Optional[date]) -> Dict:
+    """Query on created_at for the UTC days from start to end, both included"""
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="Rango de fechas inválido")
+    date_match = {}
+    string_match = {}
+    if start:
+        date_match["$gte"] = datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc)
+        string_match["$gte"] = start.isoformat()
+    if end:
+        date_match["$lt"] = datetime.combine(end + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        string_match["$lt"] = (end + timedelta(days=1)).isoformat()
+    if not date_match:
+        return {}
+    # Legacy ISO string dates compare as text, which orders them by day too
+    return {"$or": [{"created_at": date_match}, {"created_at": string_match}]}
+
+@api_router.get("/admin/orders/search", response_model=OrderSearchResult)
+async def search_orders(
+    request: Request,
+    q: str = Query(..., min_length=2, max_length=100),
+    status: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(ORDERS_PAGE_SIZE, ge=1, le=ORDERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Find orders by customer name, email, phone, WhatsApp or order id prefix (admin only)
+    
+    Every word of q must prefix-match a term of the order. Results are
+    order summaries, newest first and keyset-paginated like GET /orders. The
+    status facet counts ignore the status filter and the month facet ignores
+    the date range, so both show what picking another value would give.
+    """
+    await require_admin(request)
+    
+    terms = query_terms(q)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Búsqueda demasiado corta")
+    
+    status_match = {"status": status} if status else {}
+    date_match = created_at_range(start, end)
+    filters = {**status_match, **date_match}
+    page_match = {"$and": [filters, decode_order_cursor(cursor)]} if cursor else filters
+    
+    result = await db.orders.aggregate([
+        {"$match": prefix_filter(terms)},
+        {"$facet": {
+            "results": [
+                {"$match": page_match},
+                {"$sort": {"created_at": -1, "order_id": -1}},
+                {"$limit": limit + 1},
+                {"$project": ORDER_SUMMARY_PROJECTION}
+            ],
+            "total": [{"$match": filters}, {"$count": "count"}],
+            "status": [
+                {"$match": date_match},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+            ],
+            "month": [
+                {"$match": status_match},
+                {"$group": {"_id": created_at_prefix(7), "count": {"$sum": 1}}}
+            ]
+        }}
+    ]).to_list(1)
+    facets = result[0]
+    
+    orders = facets["results"]
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_order_cursor(orders[-1])
+    
+    return FastJSONResponse({
+        "results": orders,
+        "total": facets["total"][0]["count"] if facets["total"] else 0,
+        "next_cursor": next_cursor,
+        "facets": {
+            "status": sorted(({"value": group["_id"], "count": group["count"]} for group in facets["status"]), key=lambda facet: -facet["count"]),
+            "month": sorted(({"value": group["_id"], "count": group["count"]} for group in facets["month"]), key=lambda facet: facet["value"], reverse=True)
+        }
+    })
 
-@api_router.get("/orders/{order_id}")
+def order_item_summary(item: Dict) -> str:
+    """ "2 x Funda Uso Rudo (Apple iPhone 15) @ 280.0" """
+    phone = " ".join(filter(None, [item.get("phone_brand"), item.get("phone_model")]))
+    product = f"{item.get('product_name', '')} ({phone})" if phone else item.get("product_name", "")
+    return f"{item.get('quantity', 0)} x {product} @ {item.get('price', 0)}"
+
+def order_export_row(order: Dict) -> Dict:
+    """Flat CSV row of an order; items are summarized in one cell"""
+    items = order.get("items") or []
+    return {
+        **order,
+        "item_count": len(items),
+        "units": sum(item.get("quantity", 0) for item in items),
+        "items": "; ".join(order_item_summary(item) for item in items)
+    }
+
+@api_router.get("/admin/orders/export")
+async def export_orders(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|ndjson)$")
+):
+    """Stream the orders created between start and end (UTC days, inclusive) as CSV or NDJSON (admin only)
+    
+    Orders are read from a cursor ORDERS_EXPORT_BATCH_SIZE at a time, oldest
+    first, and written out as they arrive, so any range can be exported with
+    constant memory. NDJSON has one order document per line; CSV has one row
+    per order with its items summarized. Images are left out of both.
+    """
+    await require_admin(request)
+    
+    query = created_at_range(start, end)
+    if status:
+        query["status"] = status
+    cursor = db.orders.find(query, ORDER_EXPORT_PROJECTION).sort(
+        [("created_at", ASCENDING), ("order_id", ASCENDING)]
+    ).batch_size(ORDERS_EXPORT_BATCH_SIZE)
+    
+    if format == "csv":
+        async def rows():
+            async for order in cursor:
+                yield order_export_row(order)
+        body = encode_rows(rows(), format, ORDER_EXPORT_CSV_FIELDS)
+    else:
+        body = encode_rows(cursor, format)
+    
+    filename = f"pedidos_{start or 'inicio'}_{end or 'hoy'}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{format}"',
+            "Cache-Control": "no-store"
+        }
+    )
+
+@api_router.get("/orders/{order_id}", response_model=Order)
 async def get_order(order_id: str, request: Request):
     """Get single order"""
     user = await get_current_user(request)
     
-    order = await db.orders.find_one({"order_id": order_id}, {"_id": 0})
+    order = await db.orders.find_one({"order_id": order_id}, ORDER_PROJECTION)
     if not order:
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
     
@@ -642,69 +1827,214 @@ async def get_order(order_id: str, request: Request):
         if user.get("role") != "admin" and order.get("user_id") != user["user_id"]:
             raise HTTPException(status_code=403, detail="No tienes acceso a este pedido")
     
-    return order
+    return FastJSONResponse(order)
+
+def tracking_reads(order_id: str) -> ProfiledDatabase:
+    """Tracking read profile, or the primary right after an event of the order"""
+    if order_events.changed_within(order_id, READ_YOUR_WRITES_SECONDS):
+        return read_profiles.profile("strong")
+    return read_profiles("tracking")
 
-@api_router.get("/orders/track/{order_id}")
-async def track_order(order_id: str):
+@api_router.get("/orders/track/{order_id}", response_model=OrderTracking)
+async def track_order(order_id: str, request: Request):
     """Track order status (public endpoint)"""
-    order = await db.orders.find_one(
+    order = await find_one_confirmed(
+        tracking_reads(order_id),
+        "orders",
         {"order_id": order_id},
         {"_id": 0, "order_id": 1, "status": 1, "status_history": 1, "created_at": 1}
     )
     if not order:
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
-    return order
+    body = dump_json(order)
+    return conditional_json_response(request, body, body_etag(body), TRACK_CACHE_CONTROL)
+
+# ==================== ORDER EVENTS ====================
+
+def sse_message(event: Dict) -> bytes:
+    """One server-sent event; resync events carry no id so Last-Event-ID keeps pointing at real events"""
+    head = f"id: {event['id']}\n" if event.get("id") else ""
+    return f"{head}event: {event['type']}\ndata: ".encode() + dump_json(event) + b"\n\n"
+
+class EventStreamResponse(StreamingResponse):
+    """text/event-stream holding an order_events subscription until the response ends.
+    
+    The subscription is released here rather than in the body generator,
+    which never runs (nor runs its finally) if the client is gone before
+    the first byte is sent.
+    """
+    def __init__(self, subscription: Subscription, content: AsyncIterator[bytes]):
+        super().__init__(
+            content,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        self.subscription = subscription
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            order_events.unsubscribe(self.subscription)
+
+def event_stream_response(request: Request, topics: List[str]) -> EventStreamResponse:
+    """text/event-stream of the events of topics, resuming after Last-Event-ID"""
+    # Subscribe before answering: when the broker is full the client gets a
+    # 503 to back off from, not a 200 stream that ends at once and is retried
+    try:
+        subscription = order_events.subscribe(topics, request.headers.get("last-event-id"))
+    except TooManySubscribers:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiadas conexiones abiertas, intenta más tarde",
+            headers={"Retry-After": str(SSE_BUSY_RETRY_SECONDS)}
+        )
+    
+    async def stream():
+        deadline = asyncio.get_running_loop().time() + SSE_MAX_STREAM_SECONDS
+        yield b"retry: 3000\n\n"
+        async for event in subscription.events(SSE_HEARTBEAT):
+            yield sse_message(event) if event else b": ping\n\n"
+            if asyncio.get_running_loop().time() >= deadline:
+                break
+    
+    return EventStreamResponse(subscription, stream())
+
+@api_router.get("/orders/track/{order_id}/events")
+async def track_order_events(order_id: str, request: Request):
+    """Status changes of one order as server-sent events (public, like tracking)"""
+    if not await find_one_confirmed(tracking_reads(order_id), "orders", {"order_id": order_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    return event_stream_response(request, [order_topic(order_id)])
+
+@api_router.get("/admin/orders/events")
+async def admin_order_events(request: Request):
+    """Every order event as server-sent events (admin only)"""
+    await require_admin(request)
+    return event_stream_response(request, [ADMIN_TOPIC])
 
 @api_router.put("/orders/{order_id}/status")
-async def update_order_status(order_id: str, status_update: OrderStatusUpdate, background_tasks: BackgroundTasks, request: Request):
+async def update_order_status(order_id: str, status_update: OrderStatusUpdate, request: Request):
     """Update order status (admin only)"""
     await require_admin(request)
     
-    order = await db.orders.find_one({"order_id": order_id}, {"_id": 0})
-    if not order:
-        raise HTTPException(status_code=404, detail="Pedido no encontrado")
-    
     status_entry = {
         "status": status_update.status,
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": datetime.now(timezone.utc),
         "notes": status_update.notes or ""
     }
     
-    await db.orders.update_one(
+    # Returns the order as it was before the update, so counters see the real previous status
+    order = await db.orders.find_one_and_update(
         {"order_id": order_id},
         {
             "$set": {
                 "status": status_update.status,
-                "updated_at": datetime.now(timezone.utc).isoformat()
+                "updated_at": datetime.now(timezone.utc)
             },
             "$push": {"status_history": status_entry}
-        }
+        },
+        projection={"_id": 0, "status_history": 0},
+        return_document=ReturnDocument.BEFORE
     )
+    if not order:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
     
-    # Notify customer
-    status_messages = {
-        "confirmado": "Tu pedido ha sido confirmado. Estamos preparando tu diseño.",
-        "en_proceso": "Tu pedido está en proceso de fabricación.",
-        "enviado": "¡Tu pedido ha sido enviado! Pronto lo recibirás.",
-        "entregado": "Tu pedido ha sido entregado. ¡Gracias por tu compra!",
-        "cancelado": "Tu pedido ha sido cancelado. Contáctanos si tienes dudas."
-    }
+    # Stock first: release_order_stock only acts while stock_reserved is set,
+    # so if it fails the admin can cancel again and it is retried
+    if status_update.status == "cancelado":
+        await release_order_stock(order_id, order.get("items", []))
     
-    message = status_messages.get(status_update.status, f"Tu pedido ha sido actualizado: {status_update.status}")
+    # The status is stored: the remaining steps must not fail the request
+    await after_commit("order counters", f"order {order_id}", count_order_status_change(order, status_update.status))
+    if ANALYTICS_MODE == "inline":
+        await sales_rollups.record_status_change(order, status_update.status)
+    await after_commit("order event", f"order {order_id}", order_events.publish("status_changed", order_id, status_update.status))
     
-    background_tasks.add_task(
-        send_notification,
-        order_id,
-        "status_update",
-        f"Pedido #{order_id}\n{message}",
-        order.get("customer_email"),
-        order.get("customer_whatsapp")
-    )
+    # Notify customer
+    await after_commit("customer notification", f"order {order_id}", queue_notifications(status_update_notifications(order, status_update.status)))
     
     return {"message": "Estado actualizado", "status": status_update.status}
 
+@api_router.post("/admin/orders/bulk-status", response_model=BulkStatusResult)
+async def bulk_update_order_status(update: BulkStatusUpdate, request: Request):
+    """Move many orders to one status (admin only)
+    
+    The orders are read once and written with a single bulk_write; each
+    write only applies if the order still has the status it was read with,
+    so counters and rollups move from the right status. Orders changed in
+    between are returned as conflicts. Customer notifications for the whole
+    batch are queued with one outbox insert.
+    """
+    await require_admin(request)
+    
+    order_ids = list(dict.fromkeys(update.order_ids))
+    # BSON dates keep milliseconds; truncating lets the timestamp identify this batch below
+    now = datetime.now(timezone.utc)
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    status_entry = {"status": update.status, "timestamp": now, "notes": update.notes or ""}
+    
+    orders = await db.orders.find(
+        {"order_id": {"$in": order_ids}},
+        {"_id": 0, "status_history": 0, "search_terms": 0}
+    ).to_list(len(order_ids))
+    found = {order["order_id"] for order in orders}
+    changing = [order for order in orders if order["status"] != update.status]
+    
+    updated = []
+    if changing:
+        result = await db.orders.bulk_write([
+            UpdateOne(
+                {"order_id": order["order_id"], "status": order["status"]},
+                {"$set": {"status": update.status, "updated_at": now}, "$push": {"status_history": status_entry}}
+            )
+            for order in changing
+        ], ordered=False)
+        if result.modified_count == len(changing):
+            updated = changing
+        elif result.modified_count:
+            applied = await db.orders.distinct("order_id", {
+                "order_id": {"$in": [order["order_id"] for order in changing]},
+                "status_history": {"$elemMatch": {"status": update.status, "timestamp": now}}
+            })
+            updated = [order for order in changing if order["order_id"] in set(applied)]
+    
+    updated_ids = {order["order_id"] for order in updated}
+    
+    # Stock first, for every order now cancelled: release_order_stock only acts
+    # while stock_reserved is set, so orders left reserved by a failed run
+    # (reported as unchanged on the retry) are released too
+    if update.status == "cancelado":
+        for order in orders:
+            if order["order_id"] in updated_ids or order["status"] == update.status:
+                await after_commit("stock release", f"order {order['order_id']}", release_order_stock(order["order_id"], order.get("items", [])))
+    
+    # The batch is stored: the remaining steps must not fail the request
+    if updated:
+        batch = f"{len(updated)} orders moved to {update.status}"
+        if STATS_MODE == "counters":
+            await after_commit("order counters", batch, db.order_counters.bulk_write(
+                [op for order in updated for op in order_status_counter_updates(order, update.status)],
+                ordered=False
+            ))
+        if ANALYTICS_MODE == "inline":
+            await sales_rollups.record_status_changes(updated, update.status)
+        for order in updated:
+            await after_commit("order event", f"order {order['order_id']}", order_events.publish("status_changed", order["order_id"], update.status))
+        await after_commit("customer notifications", batch, queue_notifications([
+            notification for order in updated for notification in status_update_notifications(order, update.status)
+        ]))
+    
+    return {
+        "status": update.status,
+        "updated": [order_id for order_id in order_ids if order_id in updated_ids],
+        "unchanged": [order["order_id"] for order in orders if order["status"] == update.status],
+        "not_found": [order_id for order_id in order_ids if order_id not in found],
+        "conflicts": [order["order_id"] for order in changing if order["order_id"] not in updated_ids]
+    }
+
 @api_router.post("/orders/{order_id}/design-proposal")
-async def send_design_proposal(order_id: str, proposal: DesignProposal, background_tasks: BackgroundTasks, request: Request):
+async def send_design_proposal(order_id: str, proposal: DesignProposal, request: Request):
     """Send design proposal to customer (admin only)"""
     await require_admin(request)
     
@@ -718,15 +2048,15 @@ async def send_design_proposal(order_id: str, proposal: DesignProposal, backgrou
         {"$set": {
             "design_proposal_sent": True,
             "design_proposal_image": proposal.proposal_image_url,
-            "updated_at": datetime.now(timezone.utc).isoformat()
+            "updated_at": datetime.now(timezone.utc)
         }}
     )
+    await order_events.publish("design_proposal_sent", order_id, order["status"])
     
     message = f"Propuesta de diseño para tu pedido #{order_id}\n\n{proposal.message}\n\nResponde para aprobar o solicitar cambios."
     
     if proposal.send_via_email:
-        background_tasks.add_task(
-            send_notification,
+        await send_notification(
             order_id,
             "design_proposal",
             message,
@@ -735,8 +2065,7 @@ async def send_design_proposal(order_id: str, proposal: DesignProposal, backgrou
         )
     
     if proposal.send_via_whatsapp and order.get("customer_whatsapp"):
-        background_tasks.add_task(
-            send_notification,
+        await send_notification(
             order_id,
             "design_proposal",
             message,
@@ -751,114 +2080,562 @@ async def approve_design(order_id: str, request: Request):
     """Mark design as approved (admin only)"""
     await require_admin(request)
     
-    result = await db.orders.update_one(
+    order = await db.orders.find_one_and_update(
         {"order_id": order_id},
         {"$set": {
             "design_approved": True,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }}
+            "updated_at": datetime.now(timezone.utc)
+        }},
+        projection={"_id": 0, "status": 1}
     )
     
-    if result.matched_count == 0:
+    if not order:
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
     
+    await order_events.publish("design_approved", order_id, order["status"])
     return {"message": "Diseño aprobado"}
 
 # ==================== UPLOAD ROUTES ====================
 
-@api_router.post("/upload/image")
-async def upload_image(file: UploadFile = File(...)):
-    """Upload custom image for case design"""
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Solo se permiten imágenes")
-    
-    # Read file content
-    content = await file.read()
-    
-    # Check file size (max 5MB)
-    if len(content) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="La imagen no puede superar 5MB")
+async def receive_image_upload(request: Request) -> tuple:
+    """Stream the multipart "file" field into a bounded, hashed spool.
+    
+    The body is parsed chunk by chunk so at most one chunk is held in memory,
+    and the request is rejected with 413 as soon as it grows past the limit.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Se esperaba multipart/form-data")
+    
+    max_body = MAX_IMAGE_SIZE + MAX_UPLOAD_OVERHEAD
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body:
+        raise HTTPException(status_code=413, detail="La imagen no puede superar 5MB")
+    
+    upload = ImageUpload(MAX_IMAGE_SIZE)
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "in_file": False, "filename": None, "ended": False}
+    
+    def on_part_begin():
+        state["headers"] = {}
+        state["in_file"] = False
+    
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+    
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+    
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+    
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if disposition.get(b"name") == b"file" and state["filename"] is None:
+            state["in_file"] = True
+            state["filename"] = disposition.get(b"filename", b"").decode("utf-8", "replace")
+    
+    def on_part_data(data, start, end):
+        if state["in_file"]:
+            upload.write(data[start:end])
+    
+    def on_end():
+        state["ended"] = True
+    
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_end": on_end,
+    })
     
-    # Convert to base64 for storage
-    base64_content = base64.b64encode(content).decode('utf-8')
-    content_type = file.content_type
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body:
+                raise ImageTooLarge()
+            parser.write(chunk)
+        parser.finalize()
+        # finalize() accepts a body cut off before the closing boundary
+        if not state["ended"]:
+            raise MultipartParseError("Missing closing boundary")
+    except ImageTooLarge:
+        upload.close()
+        raise HTTPException(status_code=413, detail="La imagen no puede superar 5MB")
+    except MultipartParseError:
+        upload.close()
+        raise HTTPException(status_code=400, detail="Formulario inválido")
+    except Exception:
+        upload.close()
+        raise
+    
+    if state["filename"] is None or upload.size == 0:
+        upload.close()
+        raise HTTPException(status_code=400, detail="Archivo requerido")
+    
+    return upload, state["filename"]
+
+@api_router.post("/upload/image", openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["file"],
+            "properties": {"file": {"type": "string", "format": "binary"}}
+        }}}
+    }
+})
+async def upload_image(request: Request):
+    """Upload custom image for case design; send an Idempotency-Key header to make retries safe"""
+    user = await get_current_user(request)
+    return await run_idempotent(
+        request,
+        "upload_image",
+        user["user_id"] if user else None,
+        None,
+        lambda: store_uploaded_image(request)
+    )
+
+async def store_uploaded_image(request: Request) -> Dict:
+    """Receive, sniff and store one uploaded image"""
+    upload, filename = await receive_image_upload(request)
+    try:
+        # Trust the file's magic bytes, not the content type sent by the client
+        content_type = upload.content_type
+        if not content_type:
+            raise HTTPException(status_code=400, detail="Solo se permiten imágenes")
+        
+        # Store raw bytes once per SHA-256; identical uploads share the blob
+        digest = await image_store.save_upload(upload)
+    finally:
+        upload.close()
     
     # Generate unique ID
     image_id = f"img_{uuid.uuid4().hex[:12]}"
     
-    # Store in database
+    # Store metadata only, the bytes live in the image store
     await db.uploaded_images.insert_one({
         "image_id": image_id,
-        "filename": file.filename,
+        "filename": filename,
         "content_type": content_type,
-        "data": base64_content,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "sha256": digest,
+        "size": upload.size,
+        "created_at": datetime.now(timezone.utc)
     })
     
-    # Return data URL for immediate use
-    data_url = f"data:{content_type};base64,{base64_content}"
-    
-    return {"image_id": image_id, "url": data_url}
+    return {"image_id": image_id, "url": image_url(image_id)}
 
 @api_router.get("/upload/image/{image_id}")
-async def get_uploaded_image(image_id: str):
-    """Get uploaded image"""
-    image = await db.uploaded_images.find_one({"image_id": image_id}, {"_id": 0})
+async def get_uploaded_image(
+    image_id: str,
+    request: Request,
+    size: Optional[str] = None,
+    fmt: Optional[str] = Query(None, alias="format")
+):
+    """Stream uploaded image bytes, or a resized derivative with ?size=thumb|medium"""
+    if size == "original":
+        size = None
+    if size and size not in DERIVATIVE_SIZES:
+        raise HTTPException(status_code=400, detail="Tamaño de imagen inválido")
+    if fmt and fmt not in DERIVATIVE_FORMATS:
+        raise HTTPException(status_code=400, detail="Formato de imagen inválido")
+    
+    image = await db.uploaded_images.find_one({"image_id": image_id}, {"_id": 0, "data": 0})
     if not image:
         raise HTTPException(status_code=404, detail="Imagen no encontrada")
     
-    data_url = f"data:{image['content_type']};base64,{image['data']}"
-    return {"image_id": image_id, "url": data_url}
+    if not image.get("sha256"):
+        image = await migrate_legacy_image(image)
+    
+    headers = {
+        "Cache-Control": IMAGE_CACHE_CONTROL,
+        "X-Content-Type-Options": "nosniff"
+    }
+    if size:
+        # Serve WebP to browsers that accept it unless a format was requested
+        if not fmt:
+            fmt = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+            headers["Vary"] = "Accept"
+        headers["ETag"] = f'"{image["sha256"]}-{size}-{fmt}"'
+    else:
+        headers["ETag"] = f'"{image["sha256"]}"'
+    
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    if not await image_store.exists(image["sha256"]):
+        logger.error(f"Image blob missing for {image_id} ({image['sha256']})")
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    
+    if size:
+        try:
+            derivative = await image_derivatives.get(image["sha256"], size, fmt)
+        except DerivativeError as e:
+            logger.warning(f"Could not render {size} of {image_id}: {e}")
+            raise HTTPException(status_code=422, detail="No se pudo procesar la imagen")
+        digest, content_type, length = derivative["sha256"], derivative["content_type"], derivative["length"]
+    else:
+        digest, content_type, length = image["sha256"], image["content_type"], image["size"]
+    
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        image_store.stream(digest),
+        media_type=content_type,
+        headers=headers
+    )
 
 # ==================== ADMIN STATS ====================
 
-@api_router.get("/admin/stats")
+@api_router.get("/admin/stats", response_model=Stats)
 async def get_admin_stats(request: Request):
     """Get dashboard statistics (admin only)"""
     await require_admin(request)
     
-    # Get order counts
-    total_orders = await db.orders.count_documents({})
-    pending_orders = await db.orders.count_documents({"status": "pendiente"})
-    completed_orders = await db.orders.count_documents({"status": "entregado"})
-    
-    # Get today's orders
     today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    orders_today = await db.orders.count_documents({
-        "created_at": {"$gte": today_start.isoformat()}
-    })
+    reads = read_profiles("analytics")
+    
+    if STATS_MODE == "counters":
+        totals, today, total_users = await asyncio.gather(
+            reads.order_counters.find_one({"_id": "totals"}),
+            reads.order_counters.find_one({"_id": f"day:{order_day(today_start)}"}),
+            reads.users.estimated_document_count()
+        )
+        totals = totals or {}
+        by_status = totals.get("status", {})
+        return Stats(
+            total_orders=totals.get("orders", 0),
+            pending_orders=by_status.get("pendiente", 0),
+            completed_orders=by_status.get("entregado", 0),
+            total_revenue=totals.get("revenue", 0),
+            orders_today=(today or {}).get("orders", 0),
+            total_users=total_users
+        )
     
-    # Calculate total revenue
+    # One pass over orders for every order figure; users are counted concurrently
     pipeline = [
-        {"$match": {"status": {"$ne": "cancelado"}}},
-        {"$group": {"_id": None, "total": {"$sum": "$total"}}}
+        {"$facet": {
+            "by_status": [
+                {"$group": {"_id": "$status", "count": {"$sum": 1}, "revenue": {"$sum": "$total"}}}
+            ],
+            "today": [
+                {"$match": {"created_at": {"$gte": today_start}}},
+                {"$count": "count"}
+            ]
+        }}
     ]
-    revenue_result = await db.orders.aggregate(pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
-    
-    # Get user count
-    total_users = await db.users.count_documents({})
+    result, total_users = await asyncio.gather(
+        reads.orders.aggregate(pipeline).to_list(1),
+        reads.users.estimated_document_count()
+    )
+    facets = result[0] if result else {"by_status": [], "today": []}
+    by_status = {group["_id"]: group for group in facets["by_status"]}
     
     return Stats(
-        total_orders=total_orders,
-        pending_orders=pending_orders,
-        completed_orders=completed_orders,
-        total_revenue=total_revenue,
-        orders_today=orders_today,
+        total_orders=sum(group["count"] for group in facets["by_status"]),
+        pending_orders=by_status.get("pendiente", {}).get("count", 0),
+        completed_orders=by_status.get("entregado", {}).get("count", 0),
+        total_revenue=sum(group["revenue"] for status, group in by_status.items() if status != "cancelado"),
+        orders_today=facets["today"][0]["count"] if facets["today"] else 0,
         total_users=total_users
     )
 
-@api_router.get("/admin/notifications")
-async def get_notifications(request: Request, limit: int = 50):
-    """Get recent notifications (admin only)"""
+@api_router.get("/admin/analytics", response_model=Analytics)
+async def get_admin_analytics(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    dimension: str = Query("total", pattern="^(total|product|brand|model)$"),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+):
+    """Orders, units and revenue per period and product/brand/model from the daily rollups (admin only)
+
+    The range is inclusive, in UTC days, and defaults to the last 30 days.
+    limit keeps only the top keys by revenue.
+    """
+    await require_admin(request)
+
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="La fecha inicial es posterior a la final")
+    if (end - start).days >= ANALYTICS_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {ANALYTICS_MAX_DAYS} días")
+
+    result = await sales_rollups.query(start, end, granularity, dimension, limit)
+    return FastJSONResponse({"granularity": granularity, "dimension": dimension, "start": start, "end": end, **result})
+
+@api_router.get("/admin/notifications", response_model=List[Notification])
+async def get_notifications(request: Request, limit: int = 50, status: Optional[str] = None):
+    """Get recent notifications, optionally by outbox status (admin only)"""
     await require_admin(request)
     
-    notifications = await db.notifications.find(
-        {},
-        {"_id": 0}
+    query = {"status": status} if status else {}
+    notifications = await read_profiles("notifications").notifications.find(
+        query,
+        {"_id": 0, "lock_id": 0}
     ).sort("created_at", -1).to_list(limit)
     
-    return notifications
+    return FastJSONResponse(notifications)
+
+@api_router.post("/admin/notifications/{notification_id}/retry")
+async def retry_notification(notification_id: str, request: Request):
+    """Re-queue a dead-lettered notification (admin only)"""
+    await require_admin(request)
+    
+    result = await db.notifications.update_one(
+        {"notification_id": notification_id, "status": "failed"},
+        {"$set": {"status": "pending", "attempts": 0, "next_attempt_at": datetime.now(timezone.utc)}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Notificación fallida no encontrada")
+    
+    notification_worker.wake()
+    return {"message": "Notificación reenviada a la cola"}
+
+def cache_stats_by_name() -> Dict[str, Dict[str, Any]]:
+    """Stats of every in-process cache in this worker"""
+    return {
+        "sessions": session_cache.stats(),
+        "catalog": catalog_cache.stats(),
+        "admin_recipients": admin_recipients_cache.stats(),
+    }
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(request: Request):
+    """In-process cache hit/miss counters for this worker (admin only)"""
+    await require_admin(request)
+    return {**cache_stats_by_name(), "auth_breaker": auth_breaker.stats()}
+
+# ==================== DATABASE INDEXES ====================
+
+# Indexes backing every hot query; created idempotently on startup
+INDEXES: Dict[str, List[IndexModel]] = {
+    "user_sessions": [
+        IndexModel([("session_token", ASCENDING)], unique=True, name="session_token_unique"),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        # Mongo removes sessions once expires_at (a BSON date) is in the past
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+    "users": [
+        IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique"),
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "orders": [
+        IndexModel([("order_id", ASCENDING)], unique=True, name="order_id_unique"),
+        IndexModel([("created_at", DESCENDING), ("order_id", DESCENDING)], name="created_at_order_id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)], name="user_id_created_at"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)], name="status_created_at"),
+        # Admin search: every query word is an anchored-regex range scan on this multikey index
+        IndexModel([("search_terms", ASCENDING)], name="search_terms"),
+        # Batch analytics rollups find the orders changed since their watermark
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "products": [
+        IndexModel([("product_id", ASCENDING)], unique=True, name="product_id_unique"),
+        IndexModel([("is_active", ASCENDING), ("category", ASCENDING)], name="is_active_category"),
+    ],
+    "phone_brands": [
+        IndexModel([("brand_id", ASCENDING)], unique=True, name="brand_id_unique"),
+    ],
+    "phone_models": [
+        IndexModel([("model_id", ASCENDING)], unique=True, name="model_id_unique"),
+        IndexModel([("brand_id", ASCENDING)], name="brand_id"),
+    ],
+    "uploaded_images": [
+        IndexModel([("image_id", ASCENDING)], unique=True, name="image_id_unique"),
+        IndexModel([("sha256", ASCENDING)], name="sha256"),
+    ],
+    "image_derivatives": [
+        IndexModel([("source", ASCENDING), ("size", ASCENDING), ("format", ASCENDING)], unique=True, name="source_size_format_unique"),
+    ],
+    "notifications": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        IndexModel([("order_id", ASCENDING)], name="order_id"),
+        # Outbox claims: due pending notifications and expired processing leases
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="status_locked_until"),
+        IndexModel([("lock_id", ASCENDING)], sparse=True, name="lock_id"),
+    ],
+    "order_rollups": [
+        IndexModel([("dimension", ASCENDING), ("day", ASCENDING)], name="dimension_day"),
+        IndexModel([("day", ASCENDING)], name="day"),
+    ],
+    "order_events": [
+        # Only needed for Last-Event-ID replay shortly after publishing
+        IndexModel([("timestamp", ASCENDING)], expireAfterSeconds=86400, name="timestamp_ttl"),
+    ],
+    "idempotency_keys": [
+        # Keys are looked up by _id; Mongo drops them once expires_at is in the past
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+    ],
+}
+
+# Representative hot queries: (collection, filter, sort) checked with explain()
+HOT_QUERIES = [
+    ("user_sessions", {"session_token": "x"}, None),
+    ("users", {"user_id": "x"}, None),
+    ("users", {"email": "x"}, None),
+    ("users", {"role": "admin"}, None),
+    ("orders", {"order_id": "x"}, None),
+    ("orders", {}, [("created_at", -1), ("order_id", -1)]),
+    ("orders", {"user_id": "x"}, [("created_at", -1), ("order_id", -1)]),
+    ("orders", {"status": "pendiente"}, [("created_at", -1), ("order_id", -1)]),
+    ("orders", {"search_terms": {"$regex": "^x"}}, None),
+    ("orders", {"created_at": {"$gte": datetime(2000, 1, 1)}}, [("created_at", 1), ("order_id", 1)]),
+    ("products", {"product_id": "x"}, None),
+    ("products", {"is_active": True}, None),
+    ("phone_models", {"brand_id": "x"}, None),
+    ("uploaded_images", {"image_id": "x"}, None),
+    ("image_derivatives", {"source": "x", "size": "thumb", "format": "webp"}, None),
+    ("notifications", {}, [("created_at", -1)]),
+    ("order_rollups", {"dimension": "product", "day": {"$gte": datetime(2000, 1, 1)}}, None),
+    ("notifications", {"status": "pending", "next_attempt_at": {"$lte": datetime(2000, 1, 1)}}, [("next_attempt_at", 1)]),
+]
+
+async def ensure_indexes() -> Dict[str, List[str]]:
+    """Create the declared indexes; existing ones are left untouched"""
+    created = {}
+    for collection, indexes in INDEXES.items():
+        try:
+            created[collection] = await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicates blocking a unique index: keep serving, but make it visible
+            logger.error(f"Could not create indexes on {collection}: {e}")
+    return created
+
+def plan_stages(plan: Any) -> List[str]:
+    """Collect every stage name of an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+async def verify_query_plans() -> List[Dict]:
+    """Explain each hot query and report whether its winning plan is a COLLSCAN"""
+    report = []
+    for collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.limit(50).explain()
+        stages = plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "collection": collection,
+            "query": query,
+            "sort": sort,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages
+        })
+    return report
+
+# ==================== MIGRATIONS ====================
+
+async def migrate_order_images(batch_size: int = 100) -> Dict[str, int]:
+    """Move inline data URL images out of existing orders into the image store"""
+    query = {"$or": [
+        {"items.custom_image_url": {"$regex": "^(data:|img_)"}},
+        {"items.preview_image_url": {"$regex": "^(data:|img_)"}}
+    ]}
+    migrated = 0
+    failed = 0
+    cursor = db.orders.find(query, {"_id": 0, "order_id": 1, "items": 1}).batch_size(batch_size)
+    async for order in cursor:
+        try:
+            items = await resolve_item_images(order["items"])
+        except (ValueError, binascii.Error):
+            logger.warning(f"Could not migrate images of order {order['order_id']}")
+            failed += 1
+            continue
+        await db.orders.update_one({"order_id": order["order_id"]}, {"$set": {"items": items}})
+        migrated += 1
+    
+    logger.info(f"Order image migration done: {migrated} migrated, {failed} failed")
+    return {"migrated": migrated, "failed": failed}
+
+async def index_order_search_terms(batch_size: int = 500) -> int:
+    """Store search_terms on orders created before the admin search existed"""
+    fields = ["order_id", "customer_name", "customer_email", "customer_phone", "customer_whatsapp"]
+    cursor = db.orders.find({"search_terms": {"$exists": False}}, dict.fromkeys(fields, 1)).batch_size(batch_size)
+    indexed = 0
+    batch = []
+    async for order in cursor:
+        batch.append(UpdateOne({"_id": order["_id"]}, {"$set": {"search_terms": order_search_terms(order)}}))
+        if len(batch) >= batch_size:
+            indexed += (await db.orders.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        indexed += (await db.orders.bulk_write(batch, ordered=False)).modified_count
+    logger.info(f"Order search terms stored on {indexed} orders")
+    return indexed
+
+# Timestamps older versions stored as ISO strings; "a.b" is a field of each entry of array a
+STRING_DATE_FIELDS = {
+    "orders": ["created_at", "updated_at", "status_history.timestamp"],
+    "users": ["created_at", "updated_at"],
+    "user_sessions": ["created_at", "expires_at"],
+    "products": ["created_at", "updated_at"],
+    "uploaded_images": ["created_at"],
+}
+
+def string_date_update(document: Dict, fields: List[str]) -> Tuple[Dict, Dict]:
+    """(filter, update) converting the document's string timestamps to dates.
+
+    The filter pins the original strings (and array positions are only ever
+    appended to), so a concurrent write is never overwritten with older data.
+    """
+    query = {"_id": document["_id"]}
+    update = {}
+    for field in fields:
+        array, _, key = field.partition(".")
+        if not key:
+            if isinstance(document.get(field), str):
+                query[field] = document[field]
+                update[field] = stored_datetime(document[field])
+            continue
+        for index, entry in enumerate(document.get(array) or []):
+            if isinstance(entry.get(key), str):
+                update[f"{array}.{index}.{key}"] = stored_datetime(entry[key])
+    return query, {"$set": update}
+
+async def migrate_string_dates(batch_size: int = 500) -> Dict[str, Dict[str, int]]:
+    """Convert timestamps stored as ISO strings to BSON dates, in batched bulk writes"""
+    results = {}
+    for collection, fields in STRING_DATE_FIELDS.items():
+        query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        projection = {field.partition(".")[0]: 1 for field in fields}
+        migrated = 0
+        failed = 0
+        batch = []
+        cursor = db[collection].find(query, projection).batch_size(batch_size)
+        async for document in cursor:
+            try:
+                batch.append(UpdateOne(*string_date_update(document, fields)))
+            except ValueError:
+                logger.warning(f"Unparseable timestamp in {collection} {document['_id']}")
+                failed += 1
+                continue
+            if len(batch) >= batch_size:
+                migrated += (await db[collection].bulk_write(batch, ordered=False)).modified_count
+                batch = []
+        if batch:
+            migrated += (await db[collection].bulk_write(batch, ordered=False)).modified_count
+        results[collection] = {"migrated": migrated, "failed": failed}
+        logger.info(f"Date migration of {collection} done: {migrated} migrated, {failed} failed")
+    return results
 
 # ==================== SEED DATA ====================
 
@@ -932,13 +2709,16 @@ async def seed_data():
     ]
     
     for product in products:
-        product["created_at"] = datetime.now(timezone.utc).isoformat()
+        product["created_at"] = datetime.now(timezone.utc)
         await db.products.update_one(
             {"product_id": product["product_id"]},
             {"$set": product},
             upsert=True
         )
     
+    for collection in CATALOG_COLLECTIONS:
+        catalog_cache.invalidate(collection)
+    
     return {"message": "Datos iniciales creados correctamente"}
 
 # ==================== HEALTH CHECK ====================
@@ -948,6 +2728,30 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Metrics in Prometheus text format"""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="No autenticado")
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+metrics.add_gauge(
+    "labcel_cache_entries", "Entries held by each in-process cache", ("cache",),
+    lambda: {(name, ): stats["size"] for name, stats in cache_stats_by_name().items()}
+)
+metrics.add_gauge(
+    "labcel_cache_lookups", "Cache lookups since startup by result", ("cache", "result"),
+    lambda: {
+        key: value
+        for name, stats in cache_stats_by_name().items()
+        for key, value in (((name, "hit"), stats["hits"]), ((name, "miss"), stats["misses"]))
+    }
+)
+metrics.add_gauge(
+    "labcel_auth_breaker_open", "1 while the auth circuit breaker rejects calls", (),
+    lambda: {(): 0 if auth_breaker.state == "closed" else 1}
+)
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -963,8 +2767,43 @@ app.add_middleware(
     ],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Idempotent-Replayed", "Retry-After"],
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
 )
 
+# Outermost, so the timings include every other middleware
+app.add_middleware(MetricsMiddleware, metrics=metrics, slow_request_ms=SLOW_REQUEST_MS, logger=logger)
+
+background_workers: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def create_db_indexes():
+    await ensure_indexes()
+
+@app.on_event("startup")
+async def start_background_workers():
+    if CATALOG_CHANGE_STREAM:
+        background_workers.append(asyncio.create_task(watch_catalog_changes()))
+    if NOTIFICATION_WORKER == "inline":
+        background_workers.append(notification_worker.start())
+    if ANALYTICS_MODE == "batch" and ANALYTICS_BATCH_INTERVAL > 0:
+        background_workers.append(asyncio.create_task(sales_rollups.run(ANALYTICS_BATCH_INTERVAL)))
+    if ORDER_EVENTS_BACKEND == "changestream":
+        background_workers.append(asyncio.create_task(order_events.watch()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    order_events.close_all()
+    for task in background_workers:
+        task.cancel()
+    await asyncio.gather(*background_workers, return_exceptions=True)
+    image_derivatives.shutdown()
+    if http_client is not None:
+        await http_client.aclose()
     client.close()
@@ -0,0 +1,90 @@
+"""Shared HTTP client and circuit breaker for calls to upstream services."""
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import httpx
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is known to be failing"""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated upstream failures.
+
+    closed: calls go through; failure_threshold consecutive failures open it.
+    open: calls are rejected until reset_timeout has passed.
+    half-open: a single trial call decides between closing and re-opening.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_in_flight):
+            raise CircuitOpenError("Upstream circuit is open")
+        if state == "half-open":
+            self._trial_in_flight = True
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """before_call, then make sure the guarded block cannot keep a half-open trial in flight.
+
+        The block records success or failure itself. If it ends without doing
+        so (cancelled, or an error on our side), the trial is released so the
+        next call can be the trial instead of every call being rejected.
+        """
+        self.before_call()
+        trial = self._trial_in_flight
+        try:
+            yield
+        finally:
+            if trial:
+                self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+
+def create_http_client(
+    connect_timeout: float = 3.0,
+    read_timeout: float = 5.0,
+    max_connections: int = 50,
+    max_keepalive: int = 20,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> httpx.AsyncClient:
+    """Application-wide AsyncClient with pooling, keep-alive and explicit timeouts"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=30.0,
+        ),
+        transport=transport,
+    )
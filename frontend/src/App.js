@@ -27,6 +27,18 @@ import ProtectedRoute from "./components/ProtectedRoute";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 export const API = `${BACKEND_URL}/api`;
 
+// Resolve API-relative asset paths (e.g. uploaded images) against the backend.
+// Uploaded images can be requested as a resized derivative: size = 'thumb' | 'medium'
+export const assetUrl = (url, size) => {
+  if (!url || !url.startsWith('/api/')) return url;
+  const resolved = `${BACKEND_URL}${url}`;
+  return size && url.startsWith('/api/upload/image/') ? `${resolved}?size=${size}` : resolved;
+};
+
+// Idempotency-Key for POSTs that may be retried; randomUUID needs a secure context
+export const newIdempotencyKey = () =>
+  window.crypto?.randomUUID?.() || `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
 // Create axios instance with credentials
 export const apiClient = axios.create({
   baseURL: API,
@@ -41,6 +53,67 @@ apiClient.interceptors.request.use((config) => {
   }
   return config;
 });
+
+// Subscribe to a server-sent event stream under /api. Uses fetch rather than
+// EventSource so the Authorization header can be sent; reconnects with
+// Last-Event-ID after drops. onEvent(type, data) gets each event, including
+// 'resync' when events were missed and the caller should refetch.
+// Returns a function that closes the stream.
+export const subscribeToEvents = (path, onEvent) => {
+  const controller = new AbortController();
+  let lastEventId = null;
+  let retry = 3000;
+
+  const readStream = async (body) => {
+    const reader = body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) return;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let type = 'message';
+        let data = '';
+        for (const line of block.split('\n')) {
+          if (line.startsWith('id:')) lastEventId = line.slice(3).trim();
+          else if (line.startsWith('event:')) type = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+          else if (line.startsWith('retry:')) retry = Number(line.slice(6)) || retry;
+        }
+        if (data) onEvent(type, JSON.parse(data));
+      }
+    }
+  };
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      let wait = null;
+      try {
+        const headers = { Accept: 'text/event-stream' };
+        const token = sessionStorage.getItem('session_token');
+        if (token) headers.Authorization = `Bearer ${token}`;
+        if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+        const response = await fetch(`${API}${path}`, { headers, credentials: 'include', signal: controller.signal });
+        // Not found / not allowed will not fix itself by retrying
+        if (response.status >= 400 && response.status < 500) return;
+        // A busy server says how long to back off before the next attempt
+        const retryAfter = Number(response.headers.get('Retry-After'));
+        if (retryAfter > 0) wait = retryAfter * 1000;
+        if (response.ok && response.body) await readStream(response.body);
+      } catch (error) {
+        if (controller.signal.aborted) return;
+      }
+      await new Promise((resolve) => setTimeout(resolve, wait ?? retry));
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+};
 // Cart context
 import { CartProvider } from "./context/CartContext";
 import { AuthProvider } from "./context/AuthContext";
@@ -18,7 +18,7 @@ export function CartProvider({ children }) {
       const existingIndex = prev.findIndex(
         i => i.product_id === item.product_id && 
              i.phone_model === item.phone_model &&
-             i.custom_image_url === item.custom_image_url
+             i.custom_image_id === item.custom_image_id
       );
 
       if (existingIndex >= 0) {
@@ -1,5 +1,6 @@
 import { Link, useNavigate } from 'react-router-dom';
 import { useCart } from '../context/CartContext';
+import { assetUrl } from '../App';
 import { Button } from '../components/ui/button';
 import { Trash2, Plus, Minus, ShoppingBag, ArrowRight, Image as ImageIcon } from 'lucide-react';
 
@@ -47,7 +48,7 @@ export default function Cart() {
                 <div className="w-24 h-24 bg-[#1E1E2E] rounded-lg overflow-hidden flex-shrink-0 border border-[#00FF88]/20">
                   {item.preview_image_url ? (
                     <img 
-                      src={item.preview_image_url} 
+                      src={assetUrl(item.preview_image_url, 'thumb')} 
                       alt="Preview" 
                       className="w-full h-full object-cover"
                     />
@@ -1,6 +1,6 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { apiClient } from '../App';
+import { apiClient, assetUrl, newIdempotencyKey } from '../App';
 import { useCart } from '../context/CartContext';
 import { useAuth } from '../context/AuthContext';
 import { Button } from '../components/ui/button';
@@ -19,6 +19,8 @@ export default function Checkout() {
   const [loading, setLoading] = useState(false);
   const [orderComplete, setOrderComplete] = useState(false);
   const [orderId, setOrderId] = useState('');
+  // Same key for every retry of this checkout, so a lost response never creates a second order
+  const idempotencyKey = useRef(newIdempotencyKey());
   
   const [formData, setFormData] = useState({
     customer_name: user?.name || '',
@@ -54,10 +56,14 @@ export default function Checkout() {
           price: item.price,
           phone_brand: item.phone_brand,
           phone_model: item.phone_model,
+          custom_image_id: item.custom_image_id,
+          preview_image_id: item.preview_image_id,
           custom_image_url: item.custom_image_url,
           preview_image_url: item.preview_image_url
         })),
         ...formData
+      }, {
+        headers: { 'Idempotency-Key': idempotencyKey.current }
       });
 
       setOrderId(response.data.order_id);
@@ -66,6 +72,8 @@ export default function Checkout() {
       toast.success('¡Pedido creado exitosamente!');
     } catch (error) {
       console.error('Order error:', error);
+      // The server answered, so the next attempt is a new request (the form may change)
+      if (error.response) idempotencyKey.current = newIdempotencyKey();
       toast.error(error.response?.data?.detail || 'Error al crear el pedido');
     } finally {
       setLoading(false);
@@ -308,7 +316,7 @@ export default function Checkout() {
                     <div className="w-16 h-16 bg-[#1E1E2E] rounded-lg overflow-hidden flex-shrink-0 border border-[#00FF88]/20">
                       {item.preview_image_url && (
                         <img 
-                          src={item.preview_image_url} 
+                          src={assetUrl(item.preview_image_url, 'thumb')} 
                           alt="Preview" 
                           className="w-full h-full object-cover"
                         />
@@ -1,6 +1,6 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { apiClient } from '../App';
+import { apiClient, assetUrl, newIdempotencyKey } from '../App';
 import { useCart } from '../context/CartContext';
 import { Button } from '../components/ui/button';
 import { Label } from '../components/ui/label';
@@ -208,7 +208,7 @@ export default function Customizer() {
   const [selectedBrand, setSelectedBrand] = useState('');
   const [selectedModel, setSelectedModel] = useState('');
   const [customImage, setCustomImage] = useState(null);
-  const [customImageUrl, setCustomImageUrl] = useState('');
+  const [customImageId, setCustomImageId] = useState('');
   
   const [imagePosition, setImagePosition] = useState({ x: 50, y: 50 });
   const [imageScale, setImageScale] = useState([100]);
@@ -297,12 +297,18 @@ export default function Customizer() {
       const formData = new FormData();
       formData.append('file', file);
       
-      const response = await apiClient.post('/upload/image', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
+      // Retry once on network errors; the key makes the server store the image only once
+      const idempotencyKey = newIdempotencyKey();
+      const upload = () => apiClient.post('/upload/image', formData, {
+        headers: { 'Content-Type': 'multipart/form-data', 'Idempotency-Key': idempotencyKey }
+      });
+      const response = await upload().catch((error) => {
+        if (error.response) throw error;
+        return upload();
       });
       
       setCustomImage(response.data.url);
-      setCustomImageUrl(response.data.image_id);
+      setCustomImageId(response.data.image_id);
       toast.success('Imagen cargada correctamente');
     } catch (error) {
       console.error('Upload error:', error);
@@ -337,7 +343,8 @@ export default function Customizer() {
       price: selectedProduct.price,
       phone_brand: brandName,
       phone_model: modelName,
-      custom_image_url: customImageUrl,
+      custom_image_id: customImageId || null,
+      preview_image_id: customImageId || null,
       preview_image_url: customImage
     });
 
@@ -385,7 +392,7 @@ export default function Customizer() {
                       <div 
                         className="absolute inset-0"
                         style={{
-                          backgroundImage: `url(${customImage})`,
+                          backgroundImage: `url(${assetUrl(customImage, 'medium')})`,
                           backgroundSize: `${imageScale[0]}%`,
                           backgroundPosition: `${imagePosition.x}% ${imagePosition.y}%`,
                           backgroundRepeat: 'no-repeat',
@@ -18,6 +18,8 @@ const statusConfig = {
 export default function MyOrders() {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchOrders();
@@ -25,8 +27,9 @@ export default function MyOrders() {
 
   const fetchOrders = async () => {
     try {
-      const response = await apiClient.get('/orders');
+      const response = await apiClient.get('/orders', { params: { include_total: false } });
       setOrders(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error:', error);
       toast.error('Error al cargar pedidos');
@@ -35,6 +38,21 @@ export default function MyOrders() {
     }
   };
 
+  // Orders come in pages; older ones are fetched with the cursor of the last page
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await apiClient.get('/orders', { params: { cursor: nextCursor, include_total: false } });
+      setOrders(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      toast.error('Error al cargar pedidos');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -119,6 +137,14 @@ export default function MyOrders() {
           );
         })}
       </div>
+
+      {nextCursor && (
+        <div className="flex justify-center mt-8">
+          <Button variant="outline" onClick={loadMoreOrders} disabled={loadingMore} data-testid="load-more-orders">
+            {loadingMore ? 'Cargando...' : 'Cargar más'}
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
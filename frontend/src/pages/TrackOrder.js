@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { apiClient } from '../App';
+import { apiClient, subscribeToEvents } from '../App';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Package, Search, CheckCircle2, Clock, Truck, Home, XCircle, AlertCircle, Sparkles } from 'lucide-react';
@@ -77,6 +77,23 @@ export default function TrackOrder() {
     }
   };
 
+  // Live updates instead of re-fetching: refresh the order whenever it changes
+  const trackedId = order?.order_id;
+  useEffect(() => {
+    if (!trackedId) return undefined;
+    return subscribeToEvents(`/orders/track/${trackedId}/events`, async (type, event) => {
+      try {
+        const response = await apiClient.get(`/orders/track/${trackedId}`);
+        setOrder(response.data);
+        if (type === 'status_changed') {
+          toast.info(`Tu pedido ahora está: ${statusConfig[event.status]?.label || event.status}`);
+        }
+      } catch (err) {
+        // Keep showing the last known state; the next event retries
+      }
+    });
+  }, [trackedId]);
+
   const handleSearch = (e) => {
     e.preventDefault();
     if (orderId.trim()) {
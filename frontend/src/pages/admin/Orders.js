@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from 'react';
-import { apiClient } from '../../App';
+import { apiClient, assetUrl, subscribeToEvents } from '../../App';
 import AdminLayout from '../../components/AdminLayout';
 import { Button } from '../../components/ui/button';
 import { Input } from '../../components/ui/input';
@@ -53,6 +53,9 @@ export default function AdminOrders() {
   const [detailsOpen, setDetailsOpen] = useState(false);
   const [proposalOpen, setProposalOpen] = useState(false);
   const [filterStatus, setFilterStatus] = useState('all');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalOrders, setTotalOrders] = useState(0);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   const [statusUpdate, setStatusUpdate] = useState({ status: '', notes: '' });
   const [proposal, setProposal] = useState({ 
@@ -64,9 +67,12 @@ export default function AdminOrders() {
 
   const fetchOrders = useCallback(async () => {
     try {
-      const url = filterStatus === 'all' ? '/orders' : `/orders?status=${filterStatus}`;
-      const response = await apiClient.get(url);
+      const params = { view: 'summary' };
+      if (filterStatus !== 'all') params.status = filterStatus;
+      const response = await apiClient.get('/orders', { params });
       setOrders(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      setTotalOrders(Number(response.headers['x-total-count'] || response.data.length));
     } catch (error) {
       toast.error('Error al cargar pedidos');
     } finally {
@@ -74,14 +80,50 @@ export default function AdminOrders() {
     }
   }, [filterStatus]);
 
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const params = { view: 'summary', cursor: nextCursor, include_total: false };
+      if (filterStatus !== 'all') params.status = filterStatus;
+      const response = await apiClient.get('/orders', { params });
+      setOrders(prev => [...prev, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      toast.error('Error al cargar pedidos');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchOrders();
   }, [fetchOrders]);
 
-  const handleViewDetails = (order) => {
-    setSelectedOrder(order);
-    setStatusUpdate({ status: order.status, notes: '' });
-    setDetailsOpen(true);
+  // Live admin feed: patch rows in place, reload the first page for new orders
+  useEffect(() => subscribeToEvents('/admin/orders/events', (type, event) => {
+    if (type === 'order_created' || type === 'resync') {
+      fetchOrders();
+      return;
+    }
+    const changes = { status: event.status };
+    if (type === 'design_approved') changes.design_approved = true;
+    if (type === 'design_proposal_sent') changes.design_proposal_sent = true;
+    setOrders(prev => prev
+      .map(order => (order.order_id === event.order_id ? { ...order, ...changes } : order))
+      .filter(order => filterStatus === 'all' || order.status === filterStatus));
+  }), [fetchOrders, filterStatus]);
+
+  const handleViewDetails = async (order) => {
+    // The list only carries summaries; load the full order for the dialog
+    try {
+      const response = await apiClient.get(`/orders/${order.order_id}`);
+      setSelectedOrder(response.data);
+      setStatusUpdate({ status: response.data.status, notes: '' });
+      setDetailsOpen(true);
+    } catch (error) {
+      toast.error('Error al cargar el pedido');
+    }
   };
 
   const handleUpdateStatus = async () => {
@@ -185,7 +227,7 @@ export default function AdminOrders() {
                         <p className="font-medium">{order.customer_name}</p>
                         <p className="text-sm text-gray-500">{order.customer_email}</p>
                       </TableCell>
-                      <TableCell>{order.items?.length || 0}</TableCell>
+                      <TableCell>{order.item_count ?? order.items?.length ?? 0}</TableCell>
                       <TableCell className="mono font-medium text-[#00C853]">
                         ${order.total?.toFixed(2)}
                       </TableCell>
@@ -212,6 +254,14 @@ export default function AdminOrders() {
                 })}
               </TableBody>
             </Table>
+            <div className="flex items-center justify-between px-4 py-3 border-t text-sm text-gray-500">
+              <span>Mostrando {orders.length} de {totalOrders}</span>
+              {nextCursor && (
+                <Button variant="outline" size="sm" onClick={loadMoreOrders} disabled={loadingMore}>
+                  {loadingMore ? 'Cargando...' : 'Cargar más'}
+                </Button>
+              )}
+            </div>
           </div>
         )}
       </div>
@@ -271,7 +321,7 @@ export default function AdminOrders() {
                     <div key={i} className="flex gap-4 p-3 bg-gray-50 rounded-lg">
                       {item.preview_image_url && (
                         <div className="w-16 h-16 bg-gray-200 rounded overflow-hidden">
-                          <img src={item.preview_image_url} alt="" className="w-full h-full object-cover" />
+                          <img src={assetUrl(item.preview_image_url, 'thumb')} alt="" className="w-full h-full object-cover" />
                         </div>
                       )}
                       <div className="flex-1">
@@ -283,7 +333,7 @@ export default function AdminOrders() {
                       </div>
                       {item.custom_image_url && (
                         <Button variant="outline" size="sm" asChild>
-                          <a href={item.preview_image_url} download target="_blank" rel="noopener noreferrer">
+                          <a href={assetUrl(item.custom_image_url)} download target="_blank" rel="noopener noreferrer">
                             <Download className="h-4 w-4 mr-1" />
                             Imagen
                           </a>
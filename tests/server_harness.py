@@ -0,0 +1,83 @@
+"""Run the FastAPI app in-process against a throwaway MongoDB database.
+
+Tests importing this need the MongoDB given by MONGO_URL (default
+mongodb://localhost:27017) and mark themselves with requires_mongo, which
+skips them when it is not reachable.
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import httpx
+import pymongo
+import pytest
+from motor import motor_asyncio
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+os.environ["MONGO_URL"] = MONGO_URL
+os.environ.setdefault("DB_NAME", "labcel_test")
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+
+def mongo_available() -> bool:
+    try:
+        pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except pymongo.errors.PyMongoError:
+        return False
+
+
+requires_mongo = pytest.mark.skipif(not mongo_available(), reason=f"MongoDB not reachable at {MONGO_URL}")
+
+
+def bind_database(database) -> None:
+    """Point the app and everything built on its database at database"""
+    server.db = database
+    server.read_profiles = server.ReadProfiles(database, server.build_profiles(), dict(server.read_profiles.routes))
+    server.sales_rollups = server.SalesRollups(
+        database.orders, database.order_rollups, database.analytics_state,
+        reader=server.read_profiles("analytics").order_rollups
+    )
+    server.idempotency_store = server.IdempotencyStore(database.idempotency_keys)
+    server.notification_worker.collection = database.notifications
+    server.image_store = server.create_image_store(database, "gridfs")
+    server.image_derivatives = server.DerivativeCache(database.image_derivatives, server.image_store)
+    server.session_cache.clear()
+    server.catalog_cache.clear()
+    server.admin_recipients_cache.clear()
+
+
+def run_with_database(test, transactions: str = "auto"):
+    """Run an async test(api) against a fresh database bound to this event loop"""
+    async def runner():
+        db_name = f"labcel_test_{uuid.uuid4().hex[:8]}"
+        server.client = motor_asyncio.AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+        bind_database(server.client[db_name])
+        server.ORDER_TRANSACTIONS = transactions
+        server.transactions_supported = None
+        try:
+            await server.ensure_indexes()
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as api:
+                await test(api)
+        finally:
+            await server.client.drop_database(db_name)
+            server.client.close()
+
+    asyncio.run(runner())
+
+
+async def add_admin(token: str = "admin-token") -> dict:
+    """Create an admin with a live session; returns the auth headers"""
+    await server.db.users.insert_one({"user_id": "user_admin", "email": "admin@example.com", "name": "Admin", "role": "admin"})
+    await server.db.user_sessions.insert_one({
+        "user_id": "user_admin",
+        "session_token": token,
+        "expires_at": server.datetime.now(server.timezone.utc) + server.timedelta(days=1),
+    })
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,59 @@
+"""notify_admins: one outbox write fanning an order notification out to every admin.
+
+Run in-process through tests.server_harness; skipped when no MongoDB is reachable.
+"""
+from tests.server_harness import requires_mongo, run_with_database, server
+
+pytestmark = requires_mongo
+
+ORDER = {"order_id": "ORD-20240501-ABC123"}
+
+
+def count_outbox_writes(monkeypatch) -> list:
+    """Spy on insert_many of the collection class; returns the sizes of the batches written"""
+    writes = []
+    collection_class = type(server.db.notifications)
+    insert_many = collection_class.insert_many
+
+    def spy(self, documents, *args, **kwargs):
+        if self.name == "notifications":
+            writes.append(len(documents))
+        return insert_many(self, documents, *args, **kwargs)
+
+    monkeypatch.setattr(collection_class, "insert_many", spy)
+    return writes
+
+
+def test_every_admin_gets_the_order_in_a_single_outbox_write(monkeypatch):
+    async def scenario(api):
+        await server.db.users.insert_many([
+            {"user_id": "user_admin_1", "email": "ana@example.com", "name": "Ana", "role": "admin"},
+            {"user_id": "user_admin_2", "email": "luis@example.com", "name": "Luis", "role": "admin"},
+            {"user_id": "user_admin_3", "email": "eva@example.com", "name": "Eva", "role": "admin", "whatsapp_number": "5551112222"},
+            {"user_id": "user_1", "email": "cliente@example.com", "name": "Cliente", "role": "user"},
+        ])
+        writes = count_outbox_writes(monkeypatch)
+
+        queued = await server.notify_admins(ORDER, "order_created", "Nuevo pedido")
+
+        assert writes == [4] and len(queued) == 4
+        outbox = await server.db.notifications.find({"order_id": ORDER["order_id"]}).to_list(None)
+        assert sorted(n["recipient_email"] or n["recipient_whatsapp"] for n in outbox) == [
+            "5551112222", "ana@example.com", "eva@example.com", "luis@example.com"
+        ]
+        assert {n["notification_type"] for n in outbox} == {"order_created"}
+
+    run_with_database(scenario)
+
+
+def test_no_admins_means_no_outbox_write(monkeypatch):
+    async def scenario(api):
+        await server.db.users.insert_one({"user_id": "user_1", "email": "cliente@example.com", "name": "Cliente", "role": "user"})
+        writes = count_outbox_writes(monkeypatch)
+
+        assert await server.notify_admins(ORDER, "order_created", "Nuevo pedido") == []
+
+        assert writes == []
+        assert await server.db.notifications.count_documents({}) == 0
+
+    run_with_database(scenario)
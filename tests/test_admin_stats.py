@@ -0,0 +1,76 @@
+"""GET /api/admin/stats from the materialized counters (STATS_MODE=counters) against the $facet over orders.
+
+Run in-process through tests.server_harness; skipped when no MongoDB is reachable.
+"""
+import pytest
+
+from tests.server_harness import add_admin, requires_mongo, run_with_database, server
+
+pytestmark = requires_mongo
+
+CUSTOMER = {
+    "customer_name": "Cliente Prueba",
+    "customer_email": "cliente@example.com",
+    "customer_phone": "5550000000",
+    "shipping_address": "Calle 1, San Antonio",
+    "payment_method": "recoger_tienda",
+}
+
+
+async def stats_in(api, headers, mode: str) -> dict:
+    server.STATS_MODE = mode
+    response = await api.get("/api/admin/stats", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_counters_match_the_aggregate_after_order_writes(monkeypatch):
+    monkeypatch.setattr(server, "STATS_MODE", "counters")
+
+    async def scenario(api):
+        headers = await add_admin()
+        await server.db.products.insert_one({
+            "product_id": "prod_1", "name": "Funda", "description": "", "price": 180.0,
+            "category": "funda", "is_active": True, "stock": 50,
+        })
+
+        order_ids = []
+        for quantity in (1, 2, 3, 1, 2, 1):
+            response = await api.post("/api/orders", json={
+                "items": [{"product_id": "prod_1", "product_name": "x", "quantity": quantity, "price": 0.01}],
+                **CUSTOMER,
+            })
+            assert response.status_code == 200
+            order_ids.append(response.json()["order_id"])
+
+        async def set_status(order_id: str, status: str):
+            response = await api.put(f"/api/orders/{order_id}/status", json={"status": status}, headers=headers)
+            assert response.status_code == 200
+
+        await set_status(order_ids[0], "confirmado")
+        await set_status(order_ids[0], "entregado")
+        await set_status(order_ids[1], "cancelado")
+        # A repeated cancellation and a cancelled order brought back must not drift the counters
+        await set_status(order_ids[1], "cancelado")
+        await set_status(order_ids[2], "cancelado")
+        await set_status(order_ids[2], "pendiente")
+        response = await api.post("/api/admin/orders/bulk-status", json={
+            "order_ids": [order_ids[3], order_ids[4], order_ids[1]], "status": "cancelado"
+        }, headers=headers)
+        assert response.status_code == 200
+        response = await api.post("/api/admin/orders/bulk-status", json={
+            "order_ids": [order_ids[5], order_ids[2]], "status": "entregado"
+        }, headers=headers)
+        assert response.status_code == 200
+
+        counters = await stats_in(api, headers, "counters")
+        aggregate = await stats_in(api, headers, "aggregate")
+
+        assert counters == {**aggregate, "total_revenue": pytest.approx(aggregate["total_revenue"])}
+        assert aggregate["total_orders"] == 6
+        assert aggregate["completed_orders"] == 3
+        assert aggregate["pending_orders"] == 0
+        assert aggregate["orders_today"] == 6
+        assert aggregate["total_revenue"] == pytest.approx(180.0 * (1 + 3 + 1))
+
+    run_with_database(scenario)
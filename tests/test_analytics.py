@@ -0,0 +1,65 @@
+"""Rollup rows an order contributes, and how status changes move them."""
+import asyncio
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from analytics import SalesRollups, day_start, order_rows, period_start  # noqa: E402
+
+ORDER = {
+    "status": "pendiente",
+    "total": 640.0,
+    "items": [
+        {"product_id": "prod_funda_normal", "product_name": "Funda Normal", "quantity": 2, "price": 180.0,
+         "phone_brand": "Apple", "phone_model": "iPhone 15"},
+        {"product_id": "prod_funda_rudo", "product_name": "Funda Uso Rudo", "quantity": 1, "price": 280.0,
+         "phone_brand": "Apple", "phone_model": "iPhone 14"},
+    ],
+}
+
+
+def test_an_order_counts_once_per_key_with_item_revenue():
+    rows = order_rows(ORDER)
+
+    assert rows[("total", "")] == {"label": "Total", "orders": 1, "units": 3, "revenue": 640.0, "cancelled": 0}
+    assert rows[("brand", "Apple")] == {"label": "Apple", "orders": 1, "units": 3, "revenue": 640.0, "cancelled": 0}
+    assert rows[("product", "prod_funda_normal")]["revenue"] == 360.0
+    assert rows[("model", "Apple|iPhone 14")]["label"] == "Apple iPhone 14"
+
+
+def test_cancelled_orders_keep_their_count_but_not_their_revenue():
+    rows = order_rows(ORDER, "cancelado")
+
+    assert all(row["revenue"] == 0 and row["cancelled"] == 1 and row["orders"] == 1 for row in rows.values())
+    assert rows.keys() == order_rows(ORDER).keys()
+
+
+def test_period_start():
+    assert period_start(date(2024, 5, 16), "day") == date(2024, 5, 16)
+    assert period_start(date(2024, 5, 16), "week") == date(2024, 5, 13)
+    assert period_start(date(2024, 5, 16), "month") == date(2024, 5, 1)
+
+
+def test_day_start_reads_legacy_string_timestamps():
+    midnight = datetime(2024, 5, 16, tzinfo=timezone.utc)
+
+    assert day_start("2024-05-16T23:59:59.5+00:00") == midnight
+    assert day_start("2024-05-16T12:00:00") == midnight
+    assert day_start(datetime(2024, 5, 15, 20, 0, tzinfo=timezone.utc).astimezone()) == datetime(2024, 5, 15, tzinfo=timezone.utc)
+
+
+class FailingRollups:
+    async def bulk_write(self, operations, ordered=True):
+        raise RuntimeError("rollups unavailable")
+
+
+def test_inline_rollup_failures_are_logged_not_raised(caplog):
+    rollups = SalesRollups(None, FailingRollups(), None)
+    order = {**ORDER, "order_id": "ORD-1", "created_at": datetime(2024, 5, 16, tzinfo=timezone.utc)}
+
+    asyncio.run(rollups.record_order(order))
+    asyncio.run(rollups.record_status_change({**order, "created_at": "not a date"}, "cancelado"))
+
+    assert len([record for record in caplog.records if record.levelname == "ERROR"]) == 2
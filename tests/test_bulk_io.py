@@ -0,0 +1,67 @@
+"""CSV/NDJSON encoding of exports and record splitting of streamed imports."""
+import asyncio
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from bulk_io import decode_rows, encode_rows  # noqa: E402
+
+PRODUCTS = [
+    {"product_id": "prod_1", "name": 'Funda "Rudo", negra', "description": "Dos\nlíneas", "price": 280.0,
+     "is_active": True, "base_image_url": None, "created_at": datetime(2024, 5, 16, 12, 0, tzinfo=timezone.utc)},
+    {"product_id": "prod_2", "name": "Mica", "description": "Cristal", "price": 99.5,
+     "is_active": False, "base_image_url": "/api/upload/image/img_1", "created_at": datetime(2024, 5, 17, tzinfo=timezone.utc)},
+]
+FIELDS = ["product_id", "name", "description", "price", "is_active", "base_image_url", "created_at"]
+
+
+async def documents(items):
+    for item in items:
+        yield item
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def round_trip(fmt, chunk_size):
+    async def run():
+        body = b"".join([chunk async for chunk in encode_rows(documents(PRODUCTS), fmt, FIELDS)])
+        return [row async for row in decode_rows(chunked(body, chunk_size), fmt)]
+    return asyncio.run(run())
+
+
+def test_csv_round_trip_survives_quotes_newlines_and_split_characters():
+    # 3-byte chunks split "í" and quoted cells across reads
+    rows = round_trip("csv", 3)
+
+    assert [number for number, _ in rows] == [1, 2]
+    first, second = rows[0][1], rows[1][1]
+    assert first["name"] == 'Funda "Rudo", negra'
+    assert first["description"] == "Dos\nlíneas"
+    assert first["is_active"] == "true" and first["created_at"] == "2024-05-16T12:00:00+00:00"
+    # Empty cells are left out so model defaults apply
+    assert "base_image_url" not in first
+    assert second["price"] == "99.5"
+
+
+def test_ndjson_round_trip_keeps_json_types():
+    rows = round_trip("ndjson", 7)
+
+    assert rows[1][1]["is_active"] is False
+    assert rows[0][1]["base_image_url"] is None
+    assert rows[0][1]["price"] == 280.0
+
+
+def test_bad_records_are_reported_in_place():
+    async def run():
+        body = b'{"name": "ok"}\n[1]\n{bad\n\n{"name": "last"}'
+        return [row async for row in decode_rows(chunked(body, 4), "ndjson")]
+    rows = asyncio.run(run())
+
+    assert [number for number, _ in rows] == [1, 2, 3, 4]
+    assert isinstance(rows[1][1], ValueError) and isinstance(rows[2][1], ValueError)
+    assert rows[3][1] == {"name": "last"}
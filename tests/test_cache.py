@@ -0,0 +1,117 @@
+"""In-process caches: LRU/TTL eviction, catalog versions, and ETag revalidation of catalog listings."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import cache  # noqa: E402
+from cache import CatalogCache, TTLCache, body_etag  # noqa: E402
+from tests.server_harness import add_admin, requires_mongo, run_with_database, server  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    lru = TTLCache(maxsize=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1  # "b" is now the least recently used
+
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+    assert len(lru) == 2
+    assert lru.stats()["hits"] == 3 and lru.stats()["misses"] == 1
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    ttl = TTLCache(ttl=10)
+    ttl.set("short", 1, ttl=1)
+    ttl.set("long", 2)
+    ttl.set("never", 3, ttl=0)
+
+    clock.now += 5
+
+    assert ttl.get("short") is None
+    assert ttl.get("long") == 2
+    assert ttl.get("never") is None
+    clock.now += 5
+    assert ttl.get("long") is None and len(ttl) == 0
+
+
+def test_invalidation_bumps_the_version_and_drops_only_that_collection():
+    catalog = CatalogCache()
+    version = catalog.version("products")
+    catalog.set("products", None, b"[1]", version)
+    catalog.set("phone_brands", None, b"[2]", catalog.version("phone_brands"))
+
+    catalog.invalidate("products")
+
+    assert catalog.version("products") == version + 1
+    assert catalog.get("products", None) is None
+    assert catalog.get("phone_brands", None).body == b"[2]"
+    assert catalog.changed_within("products", 10)
+    assert not catalog.changed_within("phone_brands", 10)
+
+
+def test_a_listing_loaded_before_a_write_is_not_cached_after_it():
+    catalog = CatalogCache()
+    version = catalog.version("products")
+    catalog.invalidate("products")  # a write lands while the listing loads
+
+    returned = catalog.set("products", None, b"[stale]", version)
+
+    assert returned.etag == body_etag(b"[stale]")
+    assert catalog.get("products", None) is None
+
+
+def test_clear_bumps_every_version():
+    catalog = CatalogCache()
+    versions = {name: catalog.version(name) for name in ("products", "phone_models")}
+    catalog.set("products", None, b"[]", versions["products"])
+
+    catalog.clear()
+
+    assert all(catalog.version(name) == version + 1 for name, version in versions.items())
+    assert catalog.get("products", None) is None
+    assert catalog.changed_within("phone_models", 10)
+
+
+def test_etags_follow_the_body():
+    assert body_etag(b"[1]") == body_etag(b"[1]")
+    assert body_etag(b"[1]") != body_etag(b"[2]")
+    assert body_etag(b"[1]").startswith('"') and body_etag(b"[1]").endswith('"')
+
+
+@requires_mongo
+def test_catalog_listings_revalidate_with_etags():
+    async def scenario(api):
+        headers = await add_admin()
+        first = await api.get("/api/phone-brands")
+        etag = first.headers["ETag"]
+
+        assert first.status_code == 200
+        for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+            revalidated = await api.get("/api/phone-brands", headers={"If-None-Match": if_none_match})
+            assert revalidated.status_code == 304 and revalidated.headers["ETag"] == etag
+        assert (await api.get("/api/phone-brands", headers={"If-None-Match": '"other"'})).status_code == 200
+
+        version = server.catalog_cache.version("phone_brands")
+        created = await api.post("/api/phone-brands", json={"brand_id": "brand_x", "name": "Marca X"}, headers=headers)
+        assert created.status_code == 200
+        assert server.catalog_cache.version("phone_brands") == version + 1
+
+        changed = await api.get("/api/phone-brands", headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["ETag"] != etag
+        assert [brand["name"] for brand in changed.json()] == ["Marca X"]
+
+    run_with_database(scenario)
@@ -0,0 +1,87 @@
+"""Negotiated compression: JSON bodies are compressed, images and small bodies are not."""
+import asyncio
+import gzip
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from compression import CompressionMiddleware, choose_encoding  # noqa: E402
+
+brotli = pytest.importorskip("brotli")
+
+BODY = b'{"items": [' + b",".join(b'{"name": "Funda Normal Personalizada"}' for _ in range(200)) + b"]}"
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/json")
+    async def json_body():
+        return Response(BODY, media_type="application/json", headers={"ETag": '"abc"'})
+
+    @app.get("/small")
+    async def small_body():
+        return Response(b'{"ok": true}', media_type="application/json")
+
+    @app.get("/image")
+    async def image_body():
+        return Response(BODY, media_type="image/webp")
+
+    @app.get("/stream")
+    async def stream_body():
+        async def chunks():
+            for start in range(0, len(BODY), 1000):
+                yield BODY[start:start + 1000]
+        return StreamingResponse(chunks(), media_type="text/csv")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+    return app
+
+
+def fetch(path, accept_encoding):
+    return asyncio.run(fetch_raw(path, accept_encoding))
+
+
+async def fetch_raw(path, accept_encoding):
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # Read the raw bytes; httpx would otherwise decode them
+        async with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+            return response, b"".join([chunk async for chunk in response.aiter_raw()])
+
+
+def test_choose_encoding_honours_quality_values():
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+    assert choose_encoding("br;q=0, gzip;q=0") is None
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("") is None
+
+
+def test_compresses_json_and_streams_but_not_images_or_small_bodies():
+    response, raw = fetch("/json", "br, gzip")
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"abc"'
+    assert int(response.headers["content-length"]) == len(raw) < len(BODY)
+    assert brotli.decompress(raw) == BODY
+
+    response, raw = fetch("/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == BODY
+
+    for path in ("/image", "/small"):
+        response, raw = fetch(path, "gzip, br")
+        assert "content-encoding" not in response.headers
+        assert len(raw) == int(response.headers["content-length"])
+
+    response, raw = fetch("/json", "identity")
+    assert "content-encoding" not in response.headers
+    assert raw == BODY
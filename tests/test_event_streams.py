@@ -0,0 +1,62 @@
+"""Server-sent event endpoints: holding and releasing order_events subscriptions.
+
+The endpoint test runs in-process through tests.server_harness and is skipped
+when no MongoDB is reachable.
+"""
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from tests.server_harness import add_admin, requires_mongo, run_with_database, server
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = server.OrderEventBroker(max_subscribers=1)
+    monkeypatch.setattr(server, "order_events", broker)
+    monkeypatch.setattr(server, "SSE_HEARTBEAT", 0.01)
+    monkeypatch.setattr(server, "SSE_MAX_STREAM_SECONDS", 0)
+    return broker
+
+
+@requires_mongo
+def test_a_full_broker_refuses_streams_with_a_503_to_back_off_from(broker):
+    async def scenario(api):
+        headers = await add_admin()
+        held = broker.subscribe([server.ADMIN_TOPIC])
+
+        refused = await api.get("/api/admin/orders/events", headers=headers)
+
+        assert refused.status_code == 503
+        assert refused.headers["retry-after"] == str(server.SSE_BUSY_RETRY_SECONDS)
+        assert broker.count == 1
+
+        broker.unsubscribe(held)
+        response = await api.get("/api/admin/orders/events", headers=headers)
+
+        assert response.status_code == 200
+        assert response.text == "retry: 3000\n\n: ping\n\n"
+        assert broker.count == 0 and not broker.subscribers
+
+    run_with_database(scenario)
+
+
+def test_the_subscription_is_released_when_the_client_leaves_before_the_first_byte(broker):
+    async def receive():
+        await asyncio.sleep(60)
+
+    async def send(message):
+        raise OSError("client went away")
+
+    async def scenario():
+        request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+        response = server.event_stream_response(request, [server.ADMIN_TOPIC])
+        assert broker.count == 1
+
+        with pytest.raises(Exception):
+            await response({"type": "http"}, receive, send)
+
+        assert broker.count == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,81 @@
+"""Order event broker: topic routing, Last-Event-ID replay and slow subscribers."""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from events import ADMIN_TOPIC, OrderEventBroker, order_topic  # noqa: E402
+
+
+async def collect(subscription, count):
+    events = []
+    async for event in subscription.events(heartbeat=0.01):
+        if event is not None:
+            events.append(event)
+        if len(events) == count:
+            break
+    return events
+
+
+def test_events_reach_their_order_and_the_admin_feed():
+    async def scenario():
+        broker = OrderEventBroker()
+        order = broker.subscribe([order_topic("ORD-1")])
+        other = broker.subscribe([order_topic("ORD-2")])
+        admin = broker.subscribe([ADMIN_TOPIC])
+        await broker.publish("order_created", "ORD-1", "pendiente")
+        await broker.publish("status_changed", "ORD-2", "confirmado")
+        await broker.publish("status_changed", "ORD-1", "confirmado")
+
+        assert [e["status"] for e in await collect(order, 2)] == ["pendiente", "confirmado"]
+        assert [e["order_id"] for e in await collect(other, 1)] == ["ORD-2"]
+        assert [e["order_id"] for e in await collect(admin, 3)] == ["ORD-1", "ORD-2", "ORD-1"]
+
+        for subscription in (order, other, admin):
+            broker.unsubscribe(subscription)
+        assert broker.count == 0 and not broker.subscribers
+
+    asyncio.run(scenario())
+
+
+def test_reconnects_replay_missed_events_or_ask_for_a_resync():
+    async def scenario():
+        broker = OrderEventBroker(history=2)
+        first = await broker.publish("order_created", "ORD-1", "pendiente")
+        second = await broker.publish("status_changed", "ORD-1", "confirmado")
+        await broker.publish("status_changed", "ORD-1", "en_proceso")
+
+        resumed = broker.subscribe([order_topic("ORD-1")], last_event_id=second["id"])
+        assert [e["status"] for e in await collect(resumed, 1)] == ["en_proceso"]
+
+        forgotten = broker.subscribe([order_topic("ORD-1")], last_event_id=first["id"])
+        assert [e["type"] for e in await collect(forgotten, 1)] == ["resync"]
+
+    asyncio.run(scenario())
+
+
+def test_a_subscriber_that_falls_behind_is_closed_with_a_resync():
+    async def scenario():
+        broker = OrderEventBroker(queue_size=3)
+        slow = broker.subscribe([ADMIN_TOPIC])
+        for n in range(5):
+            await broker.publish("status_changed", f"ORD-{n}", "confirmado")
+
+        events = [event async for event in slow.events(heartbeat=0.01)]
+        assert [event["type"] for event in events] == ["resync"]
+
+    asyncio.run(scenario())
+
+
+def test_recent_events_mark_their_order_as_changed():
+    async def scenario():
+        broker = OrderEventBroker()
+        await broker.publish("status_changed", "ORD-1", "enviado")
+        await broker.publish("order_created", "ORD-2", "pendiente")
+
+        assert broker.changed_within("ORD-1", 10)
+        assert not broker.changed_within("ORD-3", 10)
+        assert not broker.changed_within("ORD-1", 0)
+
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+"""Shared renders of image derivatives when the requests waiting on them go away."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from image_derivatives import DerivativeCache  # noqa: E402
+from image_store import LocalImageStore  # noqa: E402
+
+
+class BlockingRenders(DerivativeCache):
+    """The first render blocks until cancelled; later ones finish at once"""
+
+    def __init__(self, store):
+        super().__init__(mongomock_motor.AsyncMongoMockClient().labcel_test.image_derivatives, store)
+        self.renders = 0
+
+    async def _render(self, digest, size, fmt):
+        self.renders += 1
+        if self.renders == 1:
+            await asyncio.sleep(60)
+        return {"source": digest, "size": size, "format": fmt, "sha256": "derived"}
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_waiters_render_themselves_when_the_first_request_is_cancelled(tmp_path):
+    cache = BlockingRenders(LocalImageStore(tmp_path))
+
+    async def scenario():
+        first = asyncio.create_task(cache.get("abc", "thumb", "webp"))
+        await settle()
+        second = asyncio.create_task(cache.get("abc", "thumb", "webp"))
+        await settle()
+
+        first.cancel()
+        record = await asyncio.wait_for(second, timeout=5)
+
+        assert first.cancelled()
+        assert record["sha256"] == "derived"
+        assert cache.renders == 2
+        assert cache._pending == {}
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_render(tmp_path):
+    cache = BlockingRenders(LocalImageStore(tmp_path))
+
+    async def slow_render(digest, size, fmt):
+        await asyncio.sleep(0.05)
+        return {"source": digest, "size": size, "format": fmt, "sha256": "derived"}
+    cache._render = slow_render
+
+    async def scenario():
+        first = asyncio.create_task(cache.get("abc", "thumb", "webp"))
+        await settle()
+        waiter = asyncio.create_task(cache.get("abc", "thumb", "webp"))
+        await settle()
+
+        waiter.cancel()
+        record = await asyncio.wait_for(first, timeout=5)
+
+        assert waiter.cancelled()
+        assert record["sha256"] == "derived"
+
+    asyncio.run(scenario())
@@ -0,0 +1,57 @@
+"""server.migrate_order_images (scripts/migrate_order_images.py): inline data URLs in orders to the image store.
+
+Run in-process through tests.server_harness; skipped when no MongoDB is reachable.
+"""
+import base64
+
+from tests.server_harness import requires_mongo, run_with_database, server
+
+pytestmark = requires_mongo
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 256
+PNG_URL = "data:image/png;base64," + base64.b64encode(PNG).decode()
+
+
+def order_with(order_id: str, **item) -> dict:
+    return {
+        "order_id": order_id,
+        "items": [{"product_id": "prod_1", "product_name": "Funda", "quantity": 1, "price": 180.0, **item}],
+        "total": 180.0,
+        "status": "pendiente",
+    }
+
+
+async def items_of(order_id: str) -> list:
+    return (await server.db.orders.find_one({"order_id": order_id}))["items"]
+
+
+def test_inline_images_move_to_the_store_once_and_bad_ones_do_not_stop_the_run():
+    async def scenario(api):
+        await server.db.orders.insert_many([
+            order_with("order_broken", custom_image_url="data:image/png;base64,abc"),
+            order_with("order_inline", custom_image_url=PNG_URL, preview_image_url=PNG_URL),
+            order_with("order_done", custom_image_id="img_done", custom_image_url=server.image_url("img_done")),
+            order_with("order_bare_id", custom_image_url="img_legacy"),
+        ])
+
+        assert await server.migrate_order_images(batch_size=1) == {"migrated": 2, "failed": 1}
+
+        [inline] = await items_of("order_inline")
+        # The preview repeats the custom image: stored once, referenced twice
+        assert inline["custom_image_id"] == inline["preview_image_id"]
+        assert inline["custom_image_url"] == server.image_url(inline["custom_image_id"])
+        assert (await api.get(inline["custom_image_url"])).content == PNG
+        [bare] = await items_of("order_bare_id")
+        assert bare["custom_image_id"] == "img_legacy"
+        assert bare["custom_image_url"] == server.image_url("img_legacy")
+        [done] = await items_of("order_done")
+        assert done == order_with("order_done", custom_image_id="img_done", custom_image_url=server.image_url("img_done"))["items"][0]
+        [broken] = await items_of("order_broken")
+        assert broken["custom_image_url"] == "data:image/png;base64,abc"
+
+        # Migrated orders are left alone on a second run; the broken one is reported again
+        assert await server.migrate_order_images() == {"migrated": 0, "failed": 1}
+        assert await items_of("order_inline") == [inline]
+        assert await server.db.uploaded_images.count_documents({}) == 1
+
+    run_with_database(scenario)
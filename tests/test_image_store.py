@@ -0,0 +1,130 @@
+"""Content-addressed image stores: local filesystem, and GridFS when MongoDB is reachable."""
+import asyncio
+import functools
+import io
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pymongo
+import pytest
+from motor import motor_asyncio
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from image_store import (  # noqa: E402
+    CHUNK_SIZE, GridFSImageStore, ImageNotFound, ImageStore, ImageUpload, LocalImageStore, sha256_hex
+)
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 2048  # spans several chunks
+
+
+@functools.lru_cache(maxsize=None)
+def mongo_available() -> bool:
+    try:
+        pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except pymongo.errors.PyMongoError:
+        return False
+
+
+def with_local_store(tmp_path):
+    def run(test):
+        asyncio.run(test(LocalImageStore(tmp_path / "images")))
+    return run
+
+
+def with_gridfs_store(_tmp_path):
+    if not mongo_available():
+        pytest.skip(f"MongoDB not reachable at {MONGO_URL}")
+
+    def run(test):
+        async def runner():
+            client = motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+            db_name = f"labcel_test_{uuid.uuid4().hex[:8]}"
+            try:
+                await test(GridFSImageStore(client[db_name]))
+            finally:
+                await client.drop_database(db_name)
+                client.close()
+        asyncio.run(runner())
+    return run
+
+
+STORES = pytest.mark.parametrize("with_store", [with_local_store, with_gridfs_store], ids=["local", "gridfs"])
+
+
+def test_image_store_is_abstract():
+    with pytest.raises(TypeError):
+        ImageStore()
+
+
+@STORES
+def test_round_trip_streams_the_stored_bytes(with_store, tmp_path):
+    async def test(store):
+        digest = await store.save(PNG)
+
+        assert digest == sha256_hex(PNG)
+        assert await store.exists(digest)
+        chunks = [chunk async for chunk in store.stream(digest)]
+        assert len(chunks) > 1 and all(len(chunk) <= CHUNK_SIZE for chunk in chunks)
+        assert b"".join(chunks) == PNG
+
+    with_store(tmp_path)(test)
+
+
+@STORES
+def test_identical_images_are_stored_once(with_store, tmp_path):
+    async def test(store):
+        writes = []
+        write_file = store.write_file
+
+        async def counting_write_file(digest, source):
+            writes.append(digest)
+            await write_file(digest, source)
+        store.write_file = counting_write_file
+
+        upload = ImageUpload(max_size=len(PNG))
+        upload.write(PNG)
+        try:
+            first = await store.save(PNG)
+            second = await store.save_upload(upload)
+        finally:
+            upload.close()
+
+        assert first == second
+        assert writes == [first]
+        assert await store.read(first) == PNG
+
+    with_store(tmp_path)(test)
+
+
+@STORES
+def test_missing_digests(with_store, tmp_path):
+    async def test(store):
+        missing = sha256_hex(b"never stored")
+
+        assert not await store.exists(missing)
+        with pytest.raises(ImageNotFound):
+            await store.read(missing)
+        await store.delete(missing)
+
+        digest = await store.save(PNG)
+        await store.delete(digest)
+        assert not await store.exists(digest)
+
+    with_store(tmp_path)(test)
+
+
+def test_concurrent_writes_of_the_same_blob_leave_one_complete_file(tmp_path):
+    store = LocalImageStore(tmp_path)
+    digest = sha256_hex(PNG)
+
+    async def test():
+        await asyncio.gather(*(store.write_file(digest, io.BytesIO(PNG)) for _ in range(4)))
+        assert await store.read(digest) == PNG
+
+    asyncio.run(test())
+    assert [path.name for path in tmp_path.rglob("*") if path.is_file()] == [digest]
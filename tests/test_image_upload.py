@@ -0,0 +1,95 @@
+"""POST /api/upload/image: streamed size limit, magic-byte sniffing and malformed bodies.
+
+Run in-process through tests.server_harness; skipped when no MongoDB is reachable.
+"""
+import pytest
+
+from tests.server_harness import requires_mongo, run_with_database, server
+
+pytestmark = requires_mongo
+
+BOUNDARY = "labcel-boundary"
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 1024
+HEADERS = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+
+def multipart(data: bytes, filename: str = "funda.png", content_type: str = "image/png", closed: bool = True) -> bytes:
+    body = (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + b"\r\n"
+    return body + (f"--{BOUNDARY}--\r\n".encode() if closed else b"")
+
+
+def test_images_are_stored_by_content_not_by_declared_type():
+    async def scenario(api):
+        response = await api.post("/api/upload/image", content=multipart(PNG, content_type="application/octet-stream"), headers=HEADERS)
+
+        assert response.status_code == 200
+        image = await server.db.uploaded_images.find_one({"image_id": response.json()["image_id"]})
+        assert image["content_type"] == "image/png" and image["size"] == len(PNG)
+        served = await api.get(response.json()["url"])
+        assert served.content == PNG
+
+    run_with_database(scenario)
+
+
+@pytest.mark.parametrize("data, content_type", [
+    (b"<?php echo 'hola'; ?>", "image/png"),
+    (b"%PDF-1.7\n" + b"\x00" * 100, "image/jpeg"),
+    (b"GIF8", "image/gif"),
+])
+def test_files_that_are_not_images_are_rejected(data, content_type):
+    async def scenario(api):
+        response = await api.post("/api/upload/image", content=multipart(data, content_type=content_type), headers=HEADERS)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Solo se permiten imágenes"
+        assert await server.db.uploaded_images.count_documents({}) == 0
+
+    run_with_database(scenario)
+
+
+def test_oversized_uploads_are_rejected_while_streaming(monkeypatch):
+    monkeypatch.setattr(server, "MAX_IMAGE_SIZE", 64 * 1024)
+    monkeypatch.setattr(server, "MAX_UPLOAD_OVERHEAD", 1024)
+    chunk = b"\x00" * 16 * 1024
+    sent = []
+
+    async def body():
+        yield multipart(PNG)[:-len(f"\r\n--{BOUNDARY}--\r\n")]
+        # Far more than the limit, without a Content-Length to check up front
+        for _ in range(1000):
+            sent.append(len(chunk))
+            yield chunk
+
+    async def scenario(api):
+        response = await api.post("/api/upload/image", content=body(), headers=HEADERS)
+
+        assert response.status_code == 413
+        assert sum(sent) < 128 * 1024
+        declared = await api.post(
+            "/api/upload/image", content=multipart(b"\x00" * 128 * 1024), headers=HEADERS
+        )
+        assert declared.status_code == 413
+        assert await server.db.uploaded_images.count_documents({}) == 0
+
+    run_with_database(scenario)
+
+
+@pytest.mark.parametrize("content, headers, detail", [
+    (multipart(PNG, closed=False), HEADERS, "Formulario inválido"),
+    (multipart(PNG)[:40], HEADERS, "Formulario inválido"),
+    (PNG, {"Content-Type": "image/png"}, "Se esperaba multipart/form-data"),
+    (multipart(PNG).replace(b'name="file"', b'name="other"'), HEADERS, "Archivo requerido"),
+    (multipart(b""), HEADERS, "Archivo requerido"),
+])
+def test_malformed_uploads_are_rejected(content, headers, detail):
+    async def scenario(api):
+        response = await api.post("/api/upload/image", content=content, headers=headers)
+
+        assert response.status_code == 400
+        assert response.json()["detail"] == detail
+        assert await server.db.uploaded_images.count_documents({}) == 0
+
+    run_with_database(scenario)
@@ -0,0 +1,63 @@
+"""Prometheus rendering and per-request MongoDB attribution in backend/metrics.py."""
+import asyncio
+import contextvars
+import sys
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import metrics  # noqa: E402
+
+
+def command_event(request_id: int, command: dict, micros: int):
+    return types.SimpleNamespace(
+        command=command,
+        command_name=next(iter(command)),
+        request_id=request_id,
+        connection_id=("localhost", 27017),
+        duration_micros=micros,
+    )
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/api/products")
+
+    lines = list(histogram.render())
+
+    assert 'latency_seconds_bucket{route="/api/products",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/api/products",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/api/products",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/api/products"} 4' in lines
+
+
+def test_commands_run_in_executor_threads_are_attributed_to_the_request():
+    app_metrics = metrics.AppMetrics()
+    timer = metrics.MongoCommandTimer(app_metrics)
+
+    async def handler():
+        # Motor runs pymongo in executor threads with a copy of the caller's context
+        def run_commands():
+            for request_id, command in enumerate([{"find": "user_sessions"}, {"find": "users"}]):
+                event = command_event(request_id, command, 2000)
+                timer.started(event)
+                timer.succeeded(event)
+        context = contextvars.copy_context()
+        await asyncio.get_running_loop().run_in_executor(None, context.run, run_commands)
+
+    async def scenario():
+        stats = metrics.RequestDbStats()
+        token = metrics.request_db_stats.set(stats)
+        try:
+            await handler()
+        finally:
+            metrics.request_db_stats.reset(token)
+        return stats
+
+    stats = asyncio.run(scenario())
+
+    assert stats.round_trips == 2
+    assert stats.breakdown() == "find user_sessions 2.0ms, find users 2.0ms"
+    assert 'labcel_mongo_command_duration_seconds_count{command="find",collection="users"} 1' in app_metrics.render()
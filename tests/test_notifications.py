@@ -0,0 +1,145 @@
+"""Outbox delivery by NotificationWorker, on an in-memory collection (mongomock-motor)."""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from notifications import ChannelAdapter, FakeAdapter, NotificationWorker  # noqa: E402
+
+
+def outbox():
+    return mongomock_motor.AsyncMongoMockClient(tz_aware=True).labcel_test.notifications
+
+
+def pending(notification_id: str, channel: str = "email") -> dict:
+    return {
+        "notification_id": notification_id,
+        "channel": channel,
+        "recipient_email": "cliente@example.com",
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": datetime.now(timezone.utc) - timedelta(seconds=1),
+    }
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_channel_adapters_must_implement_send():
+    with pytest.raises(TypeError):
+        ChannelAdapter()
+
+
+def test_failed_deliveries_back_off_then_succeed():
+    async def scenario():
+        collection = outbox()
+        adapter = FakeAdapter(fail_times=1)
+        worker = NotificationWorker(collection, {"email": adapter}, base_delay=10)
+        await collection.insert_one(pending("notif_1"))
+
+        assert await worker.drain() == 1
+        retry = await collection.find_one({"notification_id": "notif_1"})
+        assert retry["status"] == "pending" and retry["attempts"] == 1
+        delay = (retry["next_attempt_at"] - datetime.now(timezone.utc)).total_seconds()
+        # base_delay with +-20% jitter
+        assert 7 < delay <= 12
+        assert "lock_id" not in retry
+
+        # Not due yet, then due
+        assert await worker.drain() == 0
+        await collection.update_one({"notification_id": "notif_1"}, {"$set": {"next_attempt_at": datetime.now(timezone.utc)}})
+        assert await worker.drain() == 1
+        sent = await collection.find_one({"notification_id": "notif_1"})
+        assert sent["status"] == "sent" and sent["attempts"] == 2
+        assert [notification["notification_id"] for notification in adapter.sent] == ["notif_1"]
+
+    run(scenario())
+
+
+def test_backoff_doubles_up_to_max_delay():
+    worker = NotificationWorker(None, {}, base_delay=5, max_delay=60)
+
+    assert 4 <= worker.backoff(1) <= 6
+    assert 16 <= worker.backoff(3) <= 24
+    assert 48 <= worker.backoff(10) <= 72
+
+
+def test_notifications_are_dead_lettered_after_max_attempts():
+    async def scenario():
+        collection = outbox()
+        worker = NotificationWorker(collection, {"email": FakeAdapter(fail_times=10)}, max_attempts=3, base_delay=0)
+        await collection.insert_one(pending("notif_1"))
+
+        for _ in range(3):
+            await collection.update_many({"status": "pending"}, {"$set": {"next_attempt_at": datetime.now(timezone.utc)}})
+            await worker.drain()
+
+        failed = await collection.find_one({"notification_id": "notif_1"})
+        assert failed["status"] == "failed" and failed["attempts"] == 3
+        assert failed["last_error"] == "simulated failure 3"
+        assert await worker.drain() == 0
+
+    run(scenario())
+
+
+def test_permanent_failures_and_unknown_channels_are_dead_lettered_at_once():
+    async def scenario():
+        collection = outbox()
+        worker = NotificationWorker(collection, {"email": FakeAdapter(fail_times=1, permanent=True)})
+        await collection.insert_many([pending("notif_1"), pending("notif_2", channel="sms")])
+
+        await worker.drain()
+
+        statuses = {doc["notification_id"]: (doc["status"], doc["attempts"]) async for doc in collection.find()}
+        assert statuses == {"notif_1": ("failed", 1), "notif_2": ("failed", 1)}
+
+    run(scenario())
+
+
+def test_expired_leases_are_reclaimed_and_the_stale_result_is_ignored():
+    async def scenario():
+        collection = outbox()
+        crashed = NotificationWorker(collection, {"email": FakeAdapter(fail_times=1)}, lease=60)
+        adapter = FakeAdapter()
+        other = NotificationWorker(collection, {"email": adapter}, lease=60)
+        await collection.insert_one(pending("notif_1"))
+
+        claimed = await crashed.claim()
+        assert [doc["notification_id"] for doc in claimed] == ["notif_1"]
+        # Leased: nobody else may take it
+        assert await other.claim() == []
+
+        await collection.update_one({"notification_id": "notif_1"}, {"$set": {"locked_until": datetime.now(timezone.utc)}})
+        assert await other.drain() == 1
+        assert len(adapter.sent) == 1
+
+        # The first worker finishing late (with a failure) must not undo the delivery
+        await crashed.deliver(claimed[0])
+        delivered = await collection.find_one({"notification_id": "notif_1"})
+        assert delivered["status"] == "sent" and delivered["attempts"] == 2
+        assert await other.drain() == 0
+        assert len(adapter.sent) == 1
+
+    run(scenario())
+
+
+def test_concurrent_workers_claim_each_notification_once():
+    async def scenario():
+        collection = outbox()
+        adapter = FakeAdapter()
+        workers = [NotificationWorker(collection, {"email": adapter}, batch_size=5) for _ in range(3)]
+        await collection.insert_many([pending(f"notif_{i}") for i in range(20)])
+
+        await asyncio.gather(*(worker.drain() for worker in workers))
+
+        assert sorted(notification["notification_id"] for notification in adapter.sent) == sorted(f"notif_{i}" for i in range(20))
+        assert await collection.count_documents({"status": "sent"}) == 20
+
+    run(scenario())
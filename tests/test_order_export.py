@@ -0,0 +1,107 @@
+"""GET /api/admin/orders/export: what leaves the server in each format, and the date range.
+
+Run in-process through tests.server_harness; skipped when no MongoDB is reachable.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from tests.server_harness import add_admin, requires_mongo, run_with_database, server
+
+pytestmark = requires_mongo
+
+IMAGE_FIELDS = {"custom_image_id", "preview_image_id", "custom_image_url", "preview_image_url"}
+
+
+def stored_order(order_id: str, created_at, status: str = "pendiente") -> dict:
+    return {
+        "order_id": order_id,
+        "user_id": "user_1",
+        "items": [{
+            "product_id": "prod_1", "product_name": "Funda", "quantity": 2, "price": 180.0,
+            "custom_image_id": "img_1", "custom_image_url": "/api/upload/image/img_1",
+            "preview_image_id": "img_1", "preview_image_url": "/api/upload/image/img_1",
+        }],
+        "subtotal": 360.0,
+        "total": 360.0,
+        "status": status,
+        "customer_name": "Cliente",
+        "customer_email": "cliente@example.com",
+        "customer_phone": "5550000000",
+        "shipping_address": "Calle 1",
+        "payment_method": "recoger_tienda",
+        "design_proposal_image": "data:image/png;base64,iVBORw0KGgo=",
+        "search_terms": ["cliente", "5550000000"],
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+async def add_orders():
+    await server.db.orders.insert_many([
+        stored_order("order_0430", datetime(2024, 4, 30, 23, 59, tzinfo=timezone.utc)),
+        stored_order("order_0501", datetime(2024, 5, 1, 0, 0, tzinfo=timezone.utc)),
+        # Written before dates were stored as BSON dates
+        stored_order("order_0502", "2024-05-02T15:30:00+00:00", status="entregado"),
+        stored_order("order_0503", datetime(2024, 5, 3, 23, 59, 59, tzinfo=timezone.utc)),
+        stored_order("order_0504", datetime(2024, 5, 4, 0, 0, tzinfo=timezone.utc)),
+    ])
+
+
+def test_ndjson_export_leaves_out_images_and_search_terms():
+    async def scenario(api):
+        headers = await add_admin()
+        await add_orders()
+
+        response = await api.get("/api/admin/orders/export", params={"format": "ndjson"}, headers=headers)
+
+        assert response.status_code == 200
+        orders = [json.loads(line) for line in response.text.splitlines()]
+        # Oldest first; legacy string dates sort before every BSON date
+        assert [order["order_id"] for order in orders] == ["order_0502", "order_0430", "order_0501", "order_0503", "order_0504"]
+        for order in orders:
+            assert not {"_id", "search_terms", "design_proposal_image"} & order.keys()
+            assert not IMAGE_FIELDS & order["items"][0].keys()
+            assert order["items"][0]["quantity"] == 2
+
+    run_with_database(scenario)
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({}, ["order_0502", "order_0430", "order_0501", "order_0503", "order_0504"]),
+    ({"start": "2024-05-01", "end": "2024-05-03"}, ["order_0502", "order_0501", "order_0503"]),
+    ({"start": "2024-05-02"}, ["order_0502", "order_0503", "order_0504"]),
+    ({"end": "2024-04-30"}, ["order_0430"]),
+    ({"start": "2024-05-01", "end": "2024-05-03", "status": "entregado"}, ["order_0502"]),
+])
+def test_csv_export_has_the_declared_columns_and_one_row_per_order_in_range(params, expected):
+    async def scenario(api):
+        headers = await add_admin()
+        await add_orders()
+
+        response = await api.get("/api/admin/orders/export", params=params, headers=headers)
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        header, *rows = list(csv.reader(io.StringIO(response.text)))
+        assert header == server.ORDER_EXPORT_CSV_FIELDS
+        assert [row[0] for row in rows] == expected
+        row = dict(zip(header, rows[0]))
+        assert (row["item_count"], row["units"]) == ("1", "2")
+        assert "img_1" not in response.text and "iVBORw0KGgo" not in response.text
+
+    run_with_database(scenario)
+
+
+def test_export_rejects_a_range_that_ends_before_it_starts():
+    async def scenario(api):
+        headers = await add_admin()
+
+        response = await api.get("/api/admin/orders/export", params={"start": "2024-05-03", "end": "2024-05-01"}, headers=headers)
+
+        assert response.status_code == 400
+
+    run_with_database(scenario)
@@ -0,0 +1,237 @@
+"""Concurrency tests for server-side pricing and stock reservation on POST /api/orders.
+
+They run the FastAPI app in-process through tests.server_harness and are skipped
+when no MongoDB is reachable.
+"""
+import asyncio
+
+import pytest
+
+from tests.server_harness import add_admin, requires_mongo, run_with_database, server
+
+pytestmark = requires_mongo
+
+CUSTOMER = {
+    "customer_name": "Cliente Prueba",
+    "customer_email": "cliente@example.com",
+    "customer_phone": "5550000000",
+    "shipping_address": "Calle 1, San Antonio",
+    "payment_method": "recoger_tienda",
+}
+
+
+def order_payload(*items):
+    return {
+        "items": [
+            {"product_id": product_id, "product_name": "x", "quantity": quantity, "price": 0.01}
+            for product_id, quantity in items
+        ],
+        **CUSTOMER,
+    }
+
+
+async def add_product(product_id: str, price: float, stock: int):
+    await server.db.products.insert_one({
+        "product_id": product_id,
+        "name": f"Funda {product_id}",
+        "description": "",
+        "price": price,
+        "category": "funda",
+        "is_active": True,
+        "stock": stock,
+    })
+
+
+async def stock_of(product_id: str) -> int:
+    product = await server.db.products.find_one({"product_id": product_id})
+    return product["stock"]
+
+
+@pytest.mark.parametrize("transactions", ["auto", "off"])
+def test_concurrent_checkouts_never_oversell(transactions):
+    async def scenario(api):
+        await add_product("prod_flash", price=180.0, stock=25)
+
+        responses = await asyncio.gather(*(
+            api.post("/api/orders", json=order_payload(("prod_flash", 1))) for _ in range(150)
+        ))
+
+        statuses = [response.status_code for response in responses]
+        assert statuses.count(200) == 25
+        assert statuses.count(409) == 125
+        assert await stock_of("prod_flash") == 0
+        assert await server.db.orders.count_documents({}) == 25
+
+    run_with_database(scenario, transactions)
+
+
+@pytest.mark.parametrize("transactions", ["auto", "off"])
+def test_multi_product_orders_are_all_or_nothing(transactions):
+    async def scenario(api):
+        await add_product("prod_a", price=180.0, stock=100)
+        await add_product("prod_b", price=280.0, stock=10)
+
+        responses = await asyncio.gather(*(
+            api.post("/api/orders", json=order_payload(("prod_a", 1), ("prod_b", 1))) for _ in range(40)
+        ))
+
+        assert [response.status_code for response in responses].count(200) == 10
+        # Reservations of prod_a for rejected orders were rolled back or compensated
+        assert await stock_of("prod_a") == 90
+        assert await stock_of("prod_b") == 0
+
+    run_with_database(scenario, transactions)
+
+
+def test_orders_are_priced_server_side_and_cancellation_releases_stock():
+    async def scenario(api):
+        await add_product("prod_funda", price=180.0, stock=10)
+        await server.db.users.insert_one({"user_id": "user_admin", "email": "admin@example.com", "name": "Admin", "role": "admin"})
+        await server.db.user_sessions.insert_one({
+            "user_id": "user_admin",
+            "session_token": "admin-token",
+            "expires_at": server.datetime.now(server.timezone.utc) + server.timedelta(days=1),
+        })
+
+        response = await api.post("/api/orders", json=order_payload(("prod_funda", 3)))
+        assert response.status_code == 200
+        assert response.json()["total"] == 540.0
+        order_id = response.json()["order_id"]
+        assert await stock_of("prod_funda") == 7
+
+        headers = {"Authorization": "Bearer admin-token"}
+        await asyncio.gather(*(
+            api.put(f"/api/orders/{order_id}/status", json={"status": "cancelado"}, headers=headers)
+            for _ in range(5)
+        ))
+        assert await stock_of("prod_funda") == 10
+
+    run_with_database(scenario)
+
+
+def test_retries_with_the_same_idempotency_key_create_one_order():
+    async def scenario(api):
+        await add_product("prod_retry", price=180.0, stock=10)
+        headers = {"Idempotency-Key": "checkout-1"}
+
+        responses = [
+            await api.post("/api/orders", json=order_payload(("prod_retry", 2)), headers=headers)
+            for _ in range(3)
+        ]
+
+        assert [response.status_code for response in responses] == [200, 200, 200]
+        assert len({response.json()["order_id"] for response in responses}) == 1
+        assert responses[-1].headers["Idempotent-Replayed"] == "true"
+        assert await server.db.orders.count_documents({}) == 1
+        assert await server.db.notifications.count_documents({"notification_type": "order_created"}) == 1
+        assert await stock_of("prod_retry") == 8
+
+        reused = await api.post("/api/orders", json=order_payload(("prod_retry", 5)), headers=headers)
+        assert reused.status_code == 422
+
+    run_with_database(scenario)
+
+
+def test_a_failed_step_after_the_insert_does_not_let_a_retry_order_again(monkeypatch):
+    async def publish_fails(*args):
+        raise RuntimeError("event bus down")
+
+    monkeypatch.setattr(server.order_events, "publish", publish_fails)
+
+    async def scenario(api):
+        await add_product("prod_after", price=180.0, stock=10)
+        headers = {"Idempotency-Key": "checkout-after-commit"}
+
+        first = await api.post("/api/orders", json=order_payload(("prod_after", 1)), headers=headers)
+        retry = await api.post("/api/orders", json=order_payload(("prod_after", 1)), headers=headers)
+
+        assert first.status_code == 200
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert retry.json()["order_id"] == first.json()["order_id"]
+        assert await server.db.orders.count_documents({}) == 1
+        assert await stock_of("prod_after") == 9
+
+    run_with_database(scenario)
+
+
+def test_orders_leave_the_cached_product_listing_alone():
+    async def scenario(api):
+        headers = await add_admin()
+        await add_product("prod_listed", price=180.0, stock=10)
+        listing = await api.get("/api/products")
+        version = server.catalog_cache.version("products")
+
+        await api.post("/api/orders", json=order_payload(("prod_listed", 3)))
+
+        assert "stock" not in listing.json()[0]
+        assert server.catalog_cache.version("products") == version
+        revalidated = await api.get("/api/products", headers={"If-None-Match": listing.headers["ETag"]})
+        assert revalidated.status_code == 304
+        admin_listing = await api.get("/api/products", params={"active_only": "false"}, headers=headers)
+        assert admin_listing.json()[0]["stock"] == 7
+
+    run_with_database(scenario)
+
+
+def test_cancelling_returns_stock_even_when_later_steps_fail(monkeypatch):
+    async def counters_fail(*args):
+        raise RuntimeError("counters unavailable")
+
+    monkeypatch.setattr(server, "count_order_status_change", counters_fail)
+
+    async def scenario(api):
+        headers = await add_admin()
+        await add_product("prod_cancel", price=180.0, stock=10)
+        order_id = (await api.post("/api/orders", json=order_payload(("prod_cancel", 4)))).json()["order_id"]
+
+        response = await api.put(f"/api/orders/{order_id}/status", json={"status": "cancelado"}, headers=headers)
+
+        assert response.status_code == 200
+        assert await stock_of("prod_cancel") == 10
+
+    run_with_database(scenario)
+
+
+
+def test_cancelling_again_returns_stock_a_failed_cancellation_kept():
+    async def scenario(api):
+        headers = await add_admin()
+        await add_product("prod_recancel", price=180.0, stock=10)
+        order_id = (await api.post("/api/orders", json=order_payload(("prod_recancel", 4)))).json()["order_id"]
+        # Left by a cancellation that failed after saving the status
+        await server.db.orders.update_one({"order_id": order_id}, {"$set": {"status": "cancelado"}})
+
+        response = await api.put(f"/api/orders/{order_id}/status", json={"status": "cancelado"}, headers=headers)
+
+        assert response.status_code == 200
+        assert await stock_of("prod_recancel") == 10
+
+    run_with_database(scenario)
+
+
+def test_bulk_cancellations_release_every_order_when_later_steps_fail(monkeypatch):
+    async def publish_fails(*args):
+        raise RuntimeError("event bus down")
+
+    async def scenario(api):
+        headers = await add_admin()
+        await add_product("prod_bulk", price=100.0, stock=10)
+        order_ids = [
+            (await api.post("/api/orders", json=order_payload(("prod_bulk", 2)))).json()["order_id"]
+            for _ in range(3)
+        ]
+        # One was cancelled by an earlier run that failed before releasing its stock
+        await server.db.orders.update_one({"order_id": order_ids[0]}, {"$set": {"status": "cancelado"}})
+        monkeypatch.setattr(server.order_events, "publish", publish_fails)
+
+        response = await api.post(
+            "/api/admin/orders/bulk-status", json={"order_ids": order_ids, "status": "cancelado"}, headers=headers
+        )
+
+        assert response.status_code == 200
+        assert response.json()["updated"] == order_ids[1:]
+        assert response.json()["unchanged"] == order_ids[:1]
+        assert await stock_of("prod_bulk") == 10
+        assert await server.db.notifications.count_documents({"notification_type": "status_update"}) > 0
+
+    run_with_database(scenario)
@@ -0,0 +1,50 @@
+"""Declared indexes and the COLLSCAN check behind scripts/check_query_plans.py.
+
+The plan checks run in-process through tests.server_harness and are skipped
+when no MongoDB is reachable.
+"""
+from tests.server_harness import requires_mongo, run_with_database, server
+
+
+def test_plan_stages_walks_nested_and_slot_based_plans():
+    plan = {
+        "queryPlan": {
+            "stage": "LIMIT",
+            "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "order_id_1"}},
+        },
+        "slotBasedPlan": {"stages": "..."},
+    }
+    merge = {"stage": "SORT_MERGE", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]}
+
+    assert server.plan_stages(plan) == ["LIMIT", "FETCH", "IXSCAN"]
+    assert server.plan_stages(merge) == ["SORT_MERGE", "IXSCAN", "COLLSCAN"]
+
+
+@requires_mongo
+def test_every_hot_query_uses_an_index():
+    async def scenario(api):
+        report = await server.verify_query_plans()
+
+        assert len(report) == len(server.HOT_QUERIES)
+        assert [entry for entry in report if entry["collscan"]] == []
+        # Creating them again is a no-op
+        assert await server.ensure_indexes()
+
+    run_with_database(scenario)
+
+
+@requires_mongo
+def test_queries_without_an_index_are_reported(monkeypatch):
+    unindexed = ("orders", {"customer_name": "Cliente"}, None)
+    monkeypatch.setattr(server, "HOT_QUERIES", server.HOT_QUERIES + [unindexed])
+
+    async def scenario(api):
+        await server.db.orders.insert_many([{"order_id": f"order_{i}", "customer_name": "Cliente"} for i in range(3)])
+
+        report = await server.verify_query_plans()
+
+        flagged = [(entry["collection"], entry["query"]) for entry in report if entry["collscan"]]
+        assert flagged == [("orders", {"customer_name": "Cliente"})]
+        assert "COLLSCAN" in report[-1]["stages"]
+
+    run_with_database(scenario)
@@ -0,0 +1,79 @@
+"""Read profiles: route mapping and the maxTimeMS budget added to reads."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from read_profiles import ProfiledCollection, ReadProfiles, build_profiles  # noqa: E402
+
+# Never contacted: building databases and collections does not connect
+DATABASE = AsyncIOMotorClient("mongodb://localhost:1", connect=False).labcel_test
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.calls = []
+
+    async def find_one(self, *args, **kwargs):
+        self.calls.append(("find_one", kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        self.calls.append(("aggregate", kwargs))
+
+    async def count_documents(self, filter, **kwargs):
+        self.calls.append(("count_documents", kwargs))
+
+
+def test_routes_read_with_their_profile_and_unknown_routes_read_strong():
+    profiles = ReadProfiles(DATABASE, build_profiles(eventual_max_time_ms=2000, eventual_max_staleness=90), {"catalog": "eventual"})
+
+    catalog = profiles("catalog").products
+    assert catalog.read_preference.mongos_mode == "secondaryPreferred"
+    assert catalog.read_preference.max_staleness == 90
+    assert catalog.read_concern.level == "local"
+    assert profiles("orders").products.read_preference.mongos_mode == "primary"
+    assert profiles("catalog").products is catalog
+
+
+def test_strong_reads_majority_committed_data_from_the_primary():
+    profiles = ReadProfiles(DATABASE, build_profiles(), {})
+
+    strong = profiles.profile("strong").orders
+    assert strong.read_preference.mongos_mode == "primary"
+    assert strong.read_concern.level == "majority"
+
+
+def test_reporting_reads_have_their_own_budget():
+    profiles = build_profiles(eventual_max_time_ms=5000, reporting_max_time_ms=60000)
+
+    assert profiles["eventual"].max_time_ms == 5000
+    assert profiles["reporting"].max_time_ms == 60000
+    assert profiles["reporting"].read_preference == profiles["eventual"].read_preference
+
+
+def test_unknown_profiles_are_rejected():
+    with pytest.raises(ValueError):
+        ReadProfiles(DATABASE, build_profiles(), {"catalog": "fast"})
+
+
+def test_reads_carry_max_time_ms_unless_given():
+    recording = RecordingCollection()
+    collection = ProfiledCollection(recording, 1500)
+
+    async def reads():
+        await collection.find_one({"a": 1})
+        await collection.find_one({"a": 1}, max_time_ms=10)
+        collection.aggregate([])
+        await collection.count_documents({})
+    asyncio.run(reads())
+
+    assert recording.calls == [
+        ("find_one", {"max_time_ms": 1500}),
+        ("find_one", {"max_time_ms": 10}),
+        ("aggregate", {"maxTimeMS": 1500}),
+        ("count_documents", {"maxTimeMS": 1500}),
+    ]
@@ -0,0 +1,34 @@
+"""FastJSONResponse must render the same JSON as FastAPI's default path."""
+import json
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import BaseModel  # noqa: E402
+
+from responses import FastJSONResponse  # noqa: E402
+
+
+class Item(BaseModel):
+    product_id: str
+    quantity: int
+
+
+def test_matches_the_default_encoder_for_documents_and_models():
+    document = {
+        "order_id": "ORD-20240101-ABC123",
+        "customer_name": "José Peña",
+        "created_at": datetime(2024, 1, 1, 12, 30, 5, 120000, tzinfo=timezone.utc),
+        "status_history": [{"status": "pendiente", "timestamp": "2024-01-01T12:30:05+00:00", "notes": None}],
+        "items": [Item(product_id="prod_funda_normal", quantity=2)],
+        "total": 360.0,
+    }
+
+    body = FastJSONResponse(document).body
+
+    assert json.loads(body) == json.loads(JSONResponse(jsonable_encoder(document)).body)
+    assert "José Peña".encode("utf-8") in body
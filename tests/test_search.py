@@ -0,0 +1,39 @@
+"""Search terms stored on orders and the words extracted from admin queries."""
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from search import order_search_terms, query_terms  # noqa: E402
+
+ORDER = {
+    "order_id": "ORD-20240516-A1B2C3",
+    "customer_name": "José Peña",
+    "customer_email": "Jose.Pena@Example.com",
+    "customer_phone": "+52 55 1234 5678",
+    "customer_whatsapp": None,
+}
+
+
+def matches(order, q):
+    """Every query word prefixes some stored term, as the Mongo query requires"""
+    terms = order_search_terms(order)
+    return all(any(re.match(re.escape(word), term) for term in terms) for word in query_terms(q))
+
+
+def test_prefixes_of_names_emails_phones_and_order_ids_match():
+    for q in ("jose", "pen", "Peña", "jose.pena@ex", "example", "5512", "55 1234 5678", "5678", "ord-2024", "a1b2", "b2c3", "20240516"):
+        assert matches(ORDER, q), q
+
+
+def test_every_word_must_match():
+    assert matches(ORDER, "jose pena")
+    assert not matches(ORDER, "jose garcia")
+    assert not matches(ORDER, "1234 9999")
+    assert query_terms("cliente 1") == ["cliente", "1"]
+
+
+def test_short_or_empty_queries_have_no_terms():
+    assert query_terms("a") == []
+    assert query_terms("  ") == []
@@ -0,0 +1,78 @@
+"""Circuit breaker states, and the half-open trial when it does not finish normally."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from upstream import CircuitBreaker, CircuitOpenError  # noqa: E402
+
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+    return breaker
+
+
+def test_failures_open_and_a_successful_trial_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.reset_timeout = 0
+    with breaker.guard():
+        breaker.record_success()
+    assert breaker.stats() == {"state": "closed", "failures": 0}
+
+
+def test_only_one_half_open_trial_runs_at_a_time():
+    breaker = half_open_breaker()
+
+    with breaker.guard():
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_failure()
+
+
+def test_a_cancelled_trial_lets_the_next_call_through():
+    breaker = half_open_breaker()
+
+    async def scenario():
+        async def trial():
+            with breaker.guard():
+                await asyncio.sleep(60)
+                breaker.record_success()
+
+        task = asyncio.create_task(trial())
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+    assert breaker.state == "half-open"
+    with breaker.guard():
+        breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_an_error_on_our_side_releases_the_trial():
+    breaker = half_open_breaker()
+
+    with pytest.raises(KeyError):
+        with breaker.guard():
+            raise KeyError("session_token")
+
+    with breaker.guard():
+        breaker.record_success()
+    assert breaker.state == "closed"